@@ -0,0 +1,5 @@
+"""Benchmarks, run from the repository root with e.g. `python -m benchmarks.bench_diff`.
+
+The same environment variables as the bot are required, as the config is imported,
+apart from by bench_diff.
+"""
@@ -0,0 +1,105 @@
+"""Compares the schedule embed diff against the string based one it replaced.
+
+Unlike the other benchmarks this one doesn't need any environment variables, the
+embeds are loaded from schedule_embeds.json (the schedule embeds for
+tests.launch_data, before and after its date and description change) and the diff
+module is loaded on its own, as the rest of the embeds package imports the config.
+"""
+
+import copy
+import importlib.util
+import json
+import pathlib
+import timeit
+
+_HERE = pathlib.Path(__file__).parent
+
+_spec = importlib.util.spec_from_file_location(
+    "schedule_diff", _HERE.parent / "spacexlaunchbot" / "embeds" / "diff.py"
+)
+assert _spec is not None and _spec.loader is not None
+diff = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(diff)
+
+
+def legacy_diff_schedule_embed_dicts(old_embed: dict, new_embed: dict) -> str:
+    """The implementation before the structural diff, kept as a baseline."""
+    diffs = []
+
+    if old_embed.get("title", "") != new_embed["title"]:
+        diffs += ["title"]
+
+    if old_embed.get("description", "") != new_embed.get("description", ""):
+        diffs += ["description"]
+
+    if old_embed.get("thumbnail", None) != new_embed.get("thumbnail", None):
+        diffs += ["thumbnail"]
+
+    if old_embed.get("image", None) != new_embed.get("image", None):
+        diffs += ["image"]
+
+    old_embed_fields = {
+        field["name"]: field["value"] for field in old_embed.get("fields", [])
+    }
+
+    new_embed_fields = new_embed.get("fields", [])
+
+    launch_vehicle = ""
+    for field in new_embed_fields:
+        if field["name"] == "Launch Vehicle":
+            launch_vehicle = field["value"]
+
+    for field in new_embed_fields:
+        name = field["name"]
+
+        if launch_vehicle == "Falcon Heavy rocket" and field["name"] == "Core Info":
+            continue
+
+        if name in old_embed_fields:
+            if old_embed_fields[name] != field["value"]:
+                diffs += [name]
+        else:
+            diffs += [name]
+
+    if len(diffs) == 0:
+        return ""
+    if len(diffs) == 1:
+        return f"Changed: {diffs[0]}"
+    return f"Changed: {diffs[0]} + {len(diffs) - 1} more"
+
+
+def _embed_dicts() -> dict[str, tuple[dict, dict]]:
+    embeds = json.loads((_HERE / "schedule_embeds.json").read_text())
+    before, after = embeds["before"], embeds["after"]
+    return {
+        # The old embed is always loaded from the database, so is never the same
+        # object as the new one.
+        "unchanged": (copy.deepcopy(before), before),
+        "changed": (before, after),
+        "from empty": ({}, after),
+    }
+
+
+def _best_of(func, number: int, repeat: int = 5) -> float:
+    # The fastest run is the one least affected by anything else on the machine.
+    return min(timeit.repeat(func, number=number, repeat=repeat))
+
+
+def main(number: int = 100_000) -> None:
+    print(f"{'case':<12} {'legacy':>10} {'structural':>12}  (us per diff)")
+    for case, (old, new) in _embed_dicts().items():
+        legacy = _best_of(
+            lambda o=old, n=new: legacy_diff_schedule_embed_dicts(o, n), number
+        )
+        structural = _best_of(
+            lambda o=old, n=new: diff.diff_schedule_embed_dicts(o, n).summary(),
+            number,
+        )
+        print(
+            f"{case:<12} {legacy / number * 1e6:>10.2f} "
+            f"{structural / number * 1e6:>12.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""Measures delivering notifications to many channels, using a fake Discord.
+
+For example, to see how the fan-out copes with a slow and unreliable Discord:
+
+    python -m benchmarks.bench_fanout --latency 0.05 --forbidden-rate 0.01 \
+        --rate-limit-rate 0.01 --retry-after 0.5
+
+The global rate limit is lifted by default, so that the overhead of the fan-out
+itself is what gets measured. Pass --global-rate-limit to measure with one. The CPU
+time taken per request includes building it, like discord.py would.
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+
+from spacexlaunchbot import config
+from spacexlaunchbot.discordclient import SpaceXLaunchBotClient
+from spacexlaunchbot.embeds import cached_launch_embed, cached_schedule_embed
+from spacexlaunchbot.fanout import Fanout, FanoutStats
+from spacexlaunchbot.notifications import NotificationType
+from tests.launch_data import launch_info
+
+from .fake_discord import (
+    FakeChannel,
+    FakeDataStore,
+    FakeHTTP,
+    FakeTransport,
+    fake_subscriptions,
+)
+
+
+class _RecordingFanout(Fanout):
+    """Keeps the stats of the last run, which deliver_notification only logs."""
+
+    last_stats: FanoutStats | None = None
+
+    async def run(self, targets, deliver) -> FanoutStats:
+        self.last_stats = await super().run(targets, deliver)
+        return self.last_stats
+
+
+def _client(
+    subscription_count: int, transport: FakeTransport, args: argparse.Namespace
+) -> SpaceXLaunchBotClient:
+    client = SpaceXLaunchBotClient()
+    client.fanout = _RecordingFanout(args.concurrency, args.global_rate_limit)
+    client.cluster = None
+    client.ds = FakeDataStore(fake_subscriptions(subscription_count))
+    client.http = FakeHTTP(transport)  # type: ignore[assignment]
+    channels = {
+        channel_id: FakeChannel(channel_id) for channel_id in client.ds.subscriptions
+    }
+    client.get_channel = channels.get  # type: ignore[method-assign]
+    return client
+
+
+async def _run(
+    subscription_count: int, notification_type: NotificationType, args
+) -> str:
+    transport = FakeTransport(
+        latency=args.latency,
+        jitter=args.jitter,
+        forbidden_rate=args.forbidden_rate,
+        http_error_rate=args.http_error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        retry_after=args.retry_after,
+    )
+    client = _client(subscription_count, transport, args)
+    assert isinstance(client.fanout, _RecordingFanout)
+
+    info = launch_info()
+    if notification_type == NotificationType.launch:
+        embed, _ = cached_launch_embed(info)
+    else:
+        embed, _ = cached_schedule_embed(info)
+
+    start = time.perf_counter()
+    cpu_start = time.process_time()
+    await client.send_notification(embed, notification_type)
+    elapsed = time.perf_counter() - start
+    cpu_per_request = (time.process_time() - cpu_start) / transport.requests
+    await asyncio.gather(*client.background_tasks)
+    stats = client.fanout.last_stats
+    assert stats is not None
+
+    return (
+        f"{notification_type.name:<9} {subscription_count:>7} {elapsed:>8.2f}s "
+        f"{stats.throughput:>9.0f}/s {stats.percentile(50) * 1e3:>8.2f} "
+        f"{stats.percentile(95) * 1e3:>8.2f} {stats.percentile(99) * 1e3:>8.2f} "
+        f"{stats.delivered:>8} {stats.failed:>7} {transport.requests:>8} "
+        f"{transport.rate_limited:>6} {cpu_per_request * 1e6:>10.1f} "
+        f"{transport.body_bytes / transport.requests:>7.0f}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000]
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=config.NOTIF_FANOUT_CONCURRENCY
+    )
+    parser.add_argument("--global-rate-limit", type=float, default=1e9)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--forbidden-rate", type=float, default=0.0)
+    parser.add_argument("--http-error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=float, default=0.0)
+    args = parser.parse_args()
+    # The failed sends are expected, don't log every one of them.
+    logging.basicConfig(level=logging.ERROR)
+
+    print(
+        f"{'type':<9} {'subs':>7} {'elapsed':>9} {'throughput':>11} {'p50 ms':>8} "
+        f"{'p95 ms':>8} {'p99 ms':>8} {'sent':>8} {'failed':>7} {'requests':>8} "
+        f"{'429s':>6} {'cpu us/req':>10} {'bytes':>7}"
+    )
+    for size in args.sizes:
+        for notification_type in (NotificationType.schedule, NotificationType.launch):
+            print(asyncio.run(_run(size, notification_type, args)))
+
+
+if __name__ == "__main__":
+    main()
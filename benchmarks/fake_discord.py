@@ -0,0 +1,128 @@
+"""An in-memory stand in for the parts of Discord that notifications are sent with."""
+
+import asyncio
+import random
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+from typing import Iterable, Sequence
+
+import discord
+import aiohttp
+from discord.http import Route
+
+from spacexlaunchbot.notifications import NotificationType
+from spacexlaunchbot.storage import Delivery, SubscriptionOptions
+
+
+@dataclass
+class FakeTransport:
+    """Simulates the time and failures of sending a message to Discord.
+
+    Each request takes `latency` seconds, plus up to `jitter`. A request fails with
+    Forbidden or HTTPException at the given rates, and at `rate_limit_rate` is told
+    to retry after `retry_after` seconds, which like discord.py is waited out and
+    then retried.
+    """
+
+    # pylint: disable=too-many-instance-attributes
+
+    latency: float = 0.0
+    jitter: float = 0.0
+    forbidden_rate: float = 0.0
+    http_error_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+    retry_after: float = 0.0
+    seed: int = 0
+
+    requests: int = 0
+    # Size of the request bodies that were sent.
+    body_bytes: int = 0
+    rate_limited: int = 0
+    forbidden: int = 0
+    http_errors: int = 0
+    _random: random.Random = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        self._random = random.Random(self.seed)
+
+    async def request(self) -> None:
+        while True:
+            self.requests += 1
+            await asyncio.sleep(self.latency + self._random.random() * self.jitter)
+            if self._random.random() >= self.rate_limit_rate:
+                break
+            self.rate_limited += 1
+            await asyncio.sleep(self.retry_after)
+
+        roll = self._random.random()
+        if roll < self.forbidden_rate:
+            self.forbidden += 1
+            raise discord.Forbidden(
+                SimpleNamespace(status=403, reason="Forbidden"), "Missing Access"
+            )
+        if roll < self.forbidden_rate + self.http_error_rate:
+            self.http_errors += 1
+            raise discord.HTTPException(
+                SimpleNamespace(status=500, reason="Internal Server Error"), "Oops"
+            )
+
+
+class FakeHTTP:  # pylint: disable=too-few-public-methods
+    """Stands in for discord.py's HTTPClient, for apis.channels.send_message."""
+
+    def __init__(self, transport: FakeTransport):
+        self.transport = transport
+
+    async def request(self, _: Route, *, data: aiohttp.BytesPayload) -> None:
+        self.transport.body_bytes += data.size
+        await self.transport.request()
+
+
+class FakeChannel:  # pylint: disable=too-few-public-methods
+    def __init__(self, channel_id: int):
+        self.id = channel_id  # pylint: disable=invalid-name
+
+
+class FakeDataStore:
+    """Just enough of DataStore for delivering notifications."""
+
+    def __init__(self, subscriptions: dict[int, SubscriptionOptions]):
+        self.subscriptions = subscriptions
+        self.notifications = 0
+        # How many delivery results were written to the outbox, and in how many
+        # batches.
+        self.delivery_updates = 0
+        self.delivery_batches = 0
+
+    async def get_subbed_channels(
+        self, _: NotificationType
+    ) -> dict[int, SubscriptionOptions]:
+        return self.subscriptions
+
+    async def remove_subbed_channels(self, channel_ids: Iterable[str]) -> int:
+        return len(list(channel_ids))
+
+    async def add_notification(
+        self, _: NotificationType, __: dict, ___: Sequence[tuple[int, int, str]]
+    ) -> int:
+        self.notifications += 1
+        return self.notifications
+
+    async def set_send_failures(self, counts: dict[int, int]) -> None:
+        pass
+
+    async def update_deliveries(self, deliveries: Iterable[Delivery]) -> None:
+        self.delivery_updates += len(list(deliveries))
+        self.delivery_batches += 1
+
+
+def fake_subscriptions(count: int) -> dict[int, SubscriptionOptions]:
+    """Subscriptions to all notifications, half of them with launch mentions."""
+    return {
+        channel_id: SubscriptionOptions(
+            NotificationType.all,
+            "<@&123456789012345678>" if channel_id % 2 else "",
+            channel_id,
+        )
+        for channel_id in range(1, count + 1)
+    }
@@ -38,7 +38,7 @@ class AdminSpaceXLaunchBotClient(SpaceXLaunchBotClient):
         if interaction.user.id != config.BOT_OWNER_ID:
             logging.warning("command called by non owner, doing nothing")
             return
-        self.ds.set_notification_task_vars(False, {})
+        await self.ds.set_notification_task_vars(False, {})
         await interaction.response.send_message(
             "Reset using `set_notification_task_vars(False, {})`"
         )
@@ -51,7 +51,7 @@ class AdminSpaceXLaunchBotClient(SpaceXLaunchBotClient):
             logging.warning("command called by non owner, doing nothing")
             return
         next_launch_dict = await ll2.get_launch_dict(launch)
-        launch_embed = embeds.create_launch_embed(next_launch_dict)
+        launch_embed, _ = embeds.cached_launch_embed(next_launch_dict)
         await interaction.response.send_message(embed=launch_embed)
 
     async def command_trigger_launch_notification(
@@ -62,6 +62,6 @@ class AdminSpaceXLaunchBotClient(SpaceXLaunchBotClient):
             logging.warning("command called by non owner, doing nothing")
             return
         next_launch_dict = await ll2.get_launch_dict(launch)
-        launch_embed = embeds.create_launch_embed(next_launch_dict)
+        launch_embed, _ = embeds.cached_launch_embed(next_launch_dict)
         await interaction.response.send_message("on it's way")
         await self.send_notification(launch_embed, NotificationType.launch)
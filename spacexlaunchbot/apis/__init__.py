@@ -1,3 +1,3 @@
 """So "import apis; apis.file" can be used instead of having to "import file from apis"
 """
-from . import bot_lists, ll2
+from . import bot_lists, channels, ll2, webhooks
@@ -1,26 +1,142 @@
+"""Reports the guild count to bot list websites.
+
+Counts are debounced, a post is made BOT_LIST_POST_DELAY seconds after the first
+report so that a burst of guild joins or removes (or starting up) results in one post
+with the latest count. Each list is only posted to when its count has changed, all
+lists are posted to at the same time using one session, and a list that responds
+with a 429 is left alone until its Retry-After (or a growing backoff) has passed.
+"""
+
+import asyncio
 import logging
-from typing import Dict
+import time
+from typing import Dict, Union
 
 import aiohttp
 
 from .. import config
 
+# Waits after a failed post before trying again, doubling up to the max.
+_BACKOFF_START = 60
+
+# The latest count reported, waiting to be posted.
+_PENDING_COUNT: Union[int, None] = None
+_LAST_POSTED: Dict[str, int] = {}
+# By url, when a list can next be posted to and how long it was last told to wait.
+_RETRY_AT: Dict[str, float] = {}
+_BACKOFF: Dict[str, float] = {}
+
+_FLUSH_TASK: Union[asyncio.Task, None] = None
+
+# Shared by every request, see _get_session.
+_SESSION: Union[aiohttp.ClientSession, None] = None
+
+
+def _get_session() -> aiohttp.ClientSession:
+    """Get the session used for every request, creating it if required."""
+    global _SESSION  # pylint: disable=global-statement
+    if _SESSION is None or _SESSION.closed:
+        _SESSION = aiohttp.ClientSession()
+    return _SESSION
+
+
+async def close_session() -> None:
+    """Stop any pending post and close the shared session, for shutting down."""
+    if _FLUSH_TASK is not None:
+        _FLUSH_TASK.cancel()
+    if _SESSION is not None:
+        await _SESSION.close()
+
+
+def _back_off(url: str, retry_after: Union[str, None]) -> None:
+    try:
+        wait = float(retry_after)  # type: ignore[arg-type]
+    except (TypeError, ValueError):
+        wait = min(
+            _BACKOFF.get(url, _BACKOFF_START / 2) * 2, config.BOT_LIST_MAX_BACKOFF
+        )
+    _BACKOFF[url] = wait
+    _RETRY_AT[url] = time.monotonic() + wait
+    logging.warning(f"Backing off posting to {url} for {wait:.0f}s")
+
 
 async def _post_count_to_bot_list(bl_data: Dict[str, str], guild_count: int) -> None:
-    async with aiohttp.ClientSession() as session:
-        await session.post(
-            bl_data["url"],
+    url = bl_data["url"]
+    try:
+        async with _get_session().post(
+            url,
             json={bl_data["guild_count_parameter"]: guild_count},
             headers={
                 "Authorization": bl_data["token"],
                 "Content-Type": "application/json",
             },
-        )
+        ) as response:
+            if response.status == 429:
+                _back_off(url, response.headers.get("Retry-After"))
+                return
+            if response.status >= 400:
+                logging.warning(f"Posting to {url} failed with {response.status}")
+    except (aiohttp.ClientError, asyncio.TimeoutError):
+        logging.warning(f"Posting to {url} failed", exc_info=True)
+        _back_off(url, None)
+        return
+    # Other errors are most likely not going to be fixed by trying again.
+    _LAST_POSTED[url] = guild_count
+    _RETRY_AT.pop(url, None)
+    _BACKOFF.pop(url, None)
+
+
+async def _flush(delay: float) -> None:
+    global _FLUSH_TASK  # pylint: disable=global-statement
+    try:
+        while True:
+            await asyncio.sleep(delay)
+            guild_count = _PENDING_COUNT
+            assert guild_count is not None
+
+            now = time.monotonic()
+            due = [
+                data
+                for data in config.BOT_LIST_DATA
+                if _LAST_POSTED.get(data["url"]) != guild_count
+                and _RETRY_AT.get(data["url"], 0) <= now
+            ]
+            if due:
+                logging.info(f"Updating bot lists with a guild_count of {guild_count}")
+                await asyncio.gather(
+                    *(_post_count_to_bot_list(data, guild_count) for data in due)
+                )
 
+            # Lists that still need the latest count, either because they are being
+            # backed off from or because it changed while we were posting.
+            now = time.monotonic()
+            next_post_at = [
+                max(_RETRY_AT.get(data["url"], 0), now + config.BOT_LIST_POST_DELAY)
+                for data in config.BOT_LIST_DATA
+                if _LAST_POSTED.get(data["url"]) != _PENDING_COUNT
+            ]
+            if not next_post_at:
+                break
+            delay = min(next_post_at) - now
+    finally:
+        _FLUSH_TASK = None
 
-async def post_all_bot_lists(guild_count: int) -> None:
+
+def report_guild_count(guild_count: int) -> None:
+    """Post the guild count to all bot lists, soon.
+
+    Must be called from inside the event loop.
+
+    Args:
+        guild_count: The number of guilds the bot is in.
+
+    """
+    global _PENDING_COUNT, _FLUSH_TASK  # pylint: disable=global-statement
     if config.INDEV:
         logging.info("In development mode, skipping")
         return
-    for data in config.BOT_LIST_DATA:
-        await _post_count_to_bot_list(data, guild_count)
+    _PENDING_COUNT = guild_count
+    if _FLUSH_TASK is None:
+        _FLUSH_TASK = asyncio.get_running_loop().create_task(
+            _flush(config.BOT_LIST_POST_DELAY)
+        )
@@ -0,0 +1,35 @@
+"""Sends messages to channels as the bot.
+
+Messages are sent as request bodies that have already been serialized, see
+notifications.PreparedMessage, which channel.send has no way of taking. Instead the
+request it would make is made directly with the client's HTTPClient, so it still
+shares the bot's rate limits, and raises the same errors as channel.send.
+"""
+
+import aiohttp
+import discord
+from discord.http import Route
+
+
+async def send_message(
+    http: discord.http.HTTPClient, channel_id: int, body: bytes
+) -> None:
+    """Send a message to a channel.
+
+    Args:
+        http: The HTTPClient of the bot to send it as.
+        channel_id: The id of the channel.
+        body: The message as a JSON request body.
+
+    Raises:
+        discord.HTTPException: Discord responded with an error.
+
+    """
+    # HTTPClient.request and Route are not part of discord.py's public API. This is
+    # what channel.send does as of discord.py 2.5.2, apart from the data being passed
+    # as a payload rather than being serialized from the json argument. Check it
+    # still works whenever discord.py is upgraded, see tests/test_channels.py.
+    await http.request(
+        Route("POST", "/channels/{channel_id}/messages", channel_id=channel_id),
+        data=aiohttp.BytesPayload(body, content_type="application/json"),
+    )
@@ -1,70 +1,232 @@
 """Handles interactions with the Launch Library 2 API.
 
-As of 22/11/22, API rate limit is 15 req/hour per IP.
+As of 22/11/22, API rate limit is 15 req/hour per IP. Every request is taken from a
+token bucket that refills at (API_RATELIMIT_LL2 - API_RATELIMIT_LL2_BURST) per hour
+and holds at most API_RATELIMIT_LL2_BURST, so no hour can see more than
+API_RATELIMIT_LL2 requests. When the budget runs out, or a request fails, the last
+launches are served until a request succeeds again.
+
+Each request gets the next LL2_UPCOMING_WINDOW launches, which are kept in memory so
+that any of them can be looked up without making another request. Requests are
+conditional, so if the launches haven't changed LL2 just responds with a 304, and
+concurrent lookups that need a new request all share one.
 """
 
 import logging
-from typing import Dict
+import math
+import time
+from typing import Dict, List, Union
 
 from aiohttp import ClientConnectorError, ClientError, ContentTypeError
 from aiohttp_client_cache import CachedSession, SQLiteBackend
 
-from .. import config
+from .. import config, telemetry
+from ..utils import SingleFlight, TokenBucket
 
 # Use ratelimit-free but innacurate API if developing (avoids rate limiting).
 _SUBDOMAIN = "lldev" if config.INDEV else "ll"
 
 _DOMAIN = (
-    f"https://{_SUBDOMAIN}.thespacedevs.com/2.2.0/launch/upcoming?limit=1&lsp__id=121"
+    f"https://{_SUBDOMAIN}.thespacedevs.com/2.2.0/launch/upcoming"
+    f"?limit={config.LL2_UPCOMING_WINDOW}&lsp__id=121"
 )
 
-# Cache all requests to launch library.
-# Will help with a potential fix for the /launch command.
-# We use NOTIF_TASK_INTERVAL as we set that to lowest possible for rate limit.
+# By default launches are requested again once they are older than the longest wait
+# between notification checks, the notification loop asks for fresher ones.
+_MAX_AGE = 60 * config.NOTIF_TASK_MAX_INTERVAL
+
+# Cache all requests to launch library. This must expire before the notification loop
+# polls again, otherwise its polls would just be answered from the cache.
 _REQUEST_CACHE = SQLiteBackend(
-    cache_name="./ll2.cache.sqlite", expire_after=60 * config.NOTIF_TASK_INTERVAL
+    cache_name="./ll2.cache.sqlite", expire_after=60 * config.NOTIF_TASK_MIN_INTERVAL
 )
 
 
-async def get_launch_dict(launch_number: int = 0) -> Dict:
-    """Get a launch information dictionary for the given launch.
-
-    If launch_number <= 0 (the default), get the next upcoming launch.
+class _LaunchIndex:
+    """The upcoming launches from the latest request, by position and by LL2 id.
 
+    Also keeps the validators from the response the launches came from, to make
+    the next request conditional.
     """
-    # pylint: disable=too-many-return-statements
 
-    ll2_api_url = _DOMAIN
+    def __init__(self) -> None:
+        self._launches: List[Dict] = []
+        self._by_id: Dict[str, Dict] = {}
+        self._updated = -math.inf
+        self.etag: Union[str, None] = None
+        self.last_modified: Union[str, None] = None
+
+    @property
+    def age(self) -> float:
+        """Seconds since the index was last updated."""
+        return time.monotonic() - self._updated
+
+    def update(
+        self,
+        launches: List[Dict],
+        etag: Union[str, None],
+        last_modified: Union[str, None],
+    ) -> None:
+        self._launches = launches
+        self._by_id = {launch["id"]: launch for launch in launches}
+        self.etag = etag
+        self.last_modified = last_modified
+        self.touch()
+
+    def touch(self) -> None:
+        """Mark the launches as up to date without changing them."""
+        self._updated = time.monotonic()
+
+    def get(self, launch: Union[int, str]) -> Dict:
+        """Get a launch by its position (1 being the next launch) or LL2 id."""
+        if isinstance(launch, str):
+            return self._by_id.get(launch, {})
+        position = max(launch, 1) - 1
+        if position >= len(self._launches):
+            return {}
+        return self._launches[position]
+
+
+_INDEX = _LaunchIndex()
+
+_UPDATES = SingleFlight()
+_BUDGET = TokenBucket(
+    (config.API_RATELIMIT_LL2 - config.API_RATELIMIT_LL2_BURST) / (60 * 60),
+    config.API_RATELIMIT_LL2_BURST,
+)
+# Lookups answered from the index without needing a request.
+_INDEX_HITS = 0
+# Lookups answered from an out of date index as there was no budget for a request.
+_BUDGET_LIMITED = 0
+# If the budget has run out since a request was last allowed, so it is only logged once.
+_OUT_OF_BUDGET = False
 
-    # TODO: /launch command fix
-    if launch_number > 0:
-        # ll2_api_url = ?
-        return {}
+# Shared by every request, see _get_session.
+_SESSION: Union[CachedSession, None] = None
 
-    try:
-        async with CachedSession(cache=_REQUEST_CACHE) as session:
-            async with session.get(ll2_api_url, allow_redirects=True) as response:
-                if response.status != 200:
-                    logging.error(f"Failed with response status: {response.status}")
-                    return {}
 
-                json = await response.json()
-                results = json.get("results", [])
+def _get_session() -> CachedSession:
+    """Get the session used for every request, creating it if required."""
+    global _SESSION  # pylint: disable=global-statement
+    if _SESSION is None or _SESSION.closed:
+        _SESSION = CachedSession(cache=_REQUEST_CACHE)
+    return _SESSION
 
-                if len(results) == 0:
-                    logging.error("Request returned no results")
-                    return {}
 
-                return results[0]
+async def close_session() -> None:
+    """Close the shared session, should be called when shutting down."""
+    if _SESSION is not None:
+        await _SESSION.close()
+
+
+def request_wait() -> float:
+    """How many seconds until there is budget for another request."""
+    return _BUDGET.time_until()
+
+
+async def _update_index() -> bool:
+    """Request the upcoming launches into the index, returns False if it failed.
+
+    If the request budget has run out no request is made. Either way the index is
+    left as it is when the launches couldn't be updated.
+    """
+    # pylint: disable=too-many-return-statements
+    global _BUDGET_LIMITED, _OUT_OF_BUDGET  # pylint: disable=global-statement
+    if not _BUDGET.try_acquire():
+        if not _OUT_OF_BUDGET:
+            logging.warning("Out of LL2 request budget, using the last launches")
+            _OUT_OF_BUDGET = True
+        _BUDGET_LIMITED += 1
+        return False
+    _OUT_OF_BUDGET = False
+
+    headers = {}
+    if _INDEX.etag is not None:
+        headers["If-None-Match"] = _INDEX.etag
+    if _INDEX.last_modified is not None:
+        headers["If-Modified-Since"] = _INDEX.last_modified
+
+    try:
+        async with _get_session().get(
+            _DOMAIN, headers=headers, allow_redirects=True
+        ) as response:
+            etag = response.headers.get("ETag")
+
+            if response.status == 304 or (
+                getattr(response, "from_cache", False)
+                and etag is not None
+                and etag == _INDEX.etag
+            ):
+                # Nothing has changed since the launches we already have.
+                _INDEX.touch()
+                return True
+
+            if response.status != 200:
+                logging.error(f"Failed with response status: {response.status}")
+                return False
+
+            json = await response.json()
+            results = json.get("results", [])
+
+            if len(results) == 0:
+                logging.error("Request returned no results")
+                return False
+
+            _INDEX.update(results, etag, response.headers.get("Last-Modified"))
+            return True
 
     except ClientConnectorError:
         logging.error("Cannot connect to thespacedevs.com")
-        return {}
+        return False
 
     except ContentTypeError:
         logging.error("JSON decode failed")
-        return {}
+        return False
 
     except ClientError:
         logging.error("Caught aiohttp.ClientError", exc_info=True)
-        return {}
+        return False
+
+
+async def get_launch_dict(
+    launch: Union[int, str] = 0, max_age: float = _MAX_AGE
+) -> Dict:
+    """Get a launch information dictionary for the given launch.
+
+    Launches are served from the latest request, a new request is only made if that
+    is older than max_age and there is budget left for it. If the new request fails
+    the launches from the latest successful one are served, and another request is
+    made the next time one is needed.
+
+    Args:
+        launch: The position of the launch in the upcoming launches, where 1 is the
+            next launch, or its LL2 id. If <= 0 (the default), get the next upcoming
+            launch.
+        max_age: How many seconds old the launches can be before a new request is
+            made. Defaults to NOTIF_TASK_MAX_INTERVAL minutes.
+
+    Returns:
+        The launch dictionary, empty if the launch isn't one of the next
+        LL2_UPCOMING_WINDOW launches or if no request has succeeded yet.
+
+    """
+    global _INDEX_HITS  # pylint: disable=global-statement
+    if _INDEX.age < max_age:
+        _INDEX_HITS += 1
+        return _INDEX.get(launch)
+
+    with telemetry.LL2_FETCH_SECONDS.time():
+        updated = await _UPDATES.do("upcoming", _update_index)
+    if not updated and _INDEX.age != math.inf:
+        # The index is still marked as out of date, so it is only served until a
+        # request succeeds.
+        logging.warning(f"Using launches from {_INDEX.age:.0f} seconds ago")
+    return _INDEX.get(launch)
+
+
+def lookup_stats() -> str:
+    """Describe how launch lookups have been answered since startup."""
+    return (
+        f"{_INDEX_HITS} hits, {_UPDATES.executed} misses, "
+        f"{_UPDATES.coalesced} coalesced, {_BUDGET_LIMITED} out of budget"
+    )
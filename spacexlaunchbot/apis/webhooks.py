@@ -0,0 +1,63 @@
+"""Sends notifications through channel webhooks.
+
+Webhook executions have their own rate limits rather than taking from the bot's
+global one, so channels subscribed with a webhook can be sent to alongside the rest
+of a notification without waiting for it. Every execution uses one shared session.
+
+Messages are sent as request bodies that have already been serialized, see
+notifications.PreparedMessage. Errors are raised as the same discord.HTTPException
+subclasses that channel.send raises, so they can be handled the same way. A webhook
+that has been deleted raises discord.NotFound.
+"""
+
+from typing import Union
+
+import aiohttp
+import discord
+
+from .. import config
+
+# Shared by every request, see _get_session.
+_SESSION: Union[aiohttp.ClientSession, None] = None
+
+
+def _get_session() -> aiohttp.ClientSession:
+    """Get the session used for every request, creating it if required."""
+    global _SESSION  # pylint: disable=global-statement
+    if _SESSION is None or _SESSION.closed:
+        _SESSION = aiohttp.ClientSession(
+            timeout=aiohttp.ClientTimeout(total=config.WEBHOOK_REQUEST_TIMEOUT)
+        )
+    return _SESSION
+
+
+async def close_session() -> None:
+    """Close the shared session, for shutting down."""
+    if _SESSION is not None:
+        await _SESSION.close()
+
+
+async def execute(webhook: tuple[int, str], body: bytes) -> None:
+    """Send a message through a webhook.
+
+    Args:
+        webhook: The id and token of the webhook.
+        body: The message as a JSON request body.
+
+    Raises:
+        discord.HTTPException: Discord responded with an error.
+
+    """
+    webhook_id, token = webhook
+    url = f"{config.DISCORD_API_URL}/webhooks/{webhook_id}/{token}"
+    async with _get_session().post(
+        url, data=body, headers={"Content-Type": "application/json"}
+    ) as response:
+        if response.status < 400:
+            return
+        message = await response.text()
+        if response.status == 403:
+            raise discord.Forbidden(response, message)
+        if response.status == 404:
+            raise discord.NotFound(response, message)
+        raise discord.HTTPException(response, message)
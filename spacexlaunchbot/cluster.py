@@ -0,0 +1,114 @@
+"""Coordination between bot processes when the shards are split across them.
+
+One process is elected leader by holding a Postgres advisory lock. Only the leader
+polls LL2 and decides which notifications to send, it adds each one to the outbox and
+publishes its id with NOTIFY so that every process can load it and deliver it to the
+channels in its own guilds. Only the id is published as NOTIFY payloads are limited
+to 8000 bytes, which a large embed can be over.
+"""
+
+import json
+import logging
+import uuid
+from typing import Callable
+
+import asyncpg
+
+from . import config
+
+_NOTIFICATIONS_CHANNEL = "slb_notifications"
+
+# Called with the id of a notification in the outbox.
+NotificationCallback = Callable[[int], None]
+
+
+class Cluster:
+    """Leader election and notification publishing for one bot process.
+
+    A single dedicated connection is used to both LISTEN for notifications and to
+    hold the leader lock, so if it drops we stop being leader at the same time as
+    Postgres releases the lock for another process.
+    """
+
+    def __init__(self, db_pool: asyncpg.Pool, on_notification: NotificationCallback):
+        self.db_pool = db_pool
+        self.on_notification = on_notification
+        self.is_leader = False
+        # Used to ignore notifications that this process published.
+        self._instance_id = uuid.uuid4().hex
+        self._conn: asyncpg.Connection | None = None
+        self._dead_conn: asyncpg.Connection | None = None
+
+    async def _connect(self) -> None:
+        if (dead_conn := self._dead_conn) is not None:
+            self._dead_conn = None
+            await self.db_pool.release(dead_conn)
+        conn = await self.db_pool.acquire()
+        try:
+            await conn.add_listener(_NOTIFICATIONS_CHANNEL, self._on_notify)
+        except (OSError, asyncpg.PostgresError):
+            await self.db_pool.release(conn)
+            raise
+        conn.add_termination_listener(self._on_terminated)
+        self._conn = conn
+        logging.info("Listening for notifications from the leader")
+
+    async def try_lead(self) -> bool:
+        """Try to become the leader, returns True if we are the leader."""
+        if self.is_leader:
+            return True
+        try:
+            if self._conn is None:
+                await self._connect()
+            assert self._conn is not None
+            self.is_leader = await self._conn.fetchval(
+                "select pg_try_advisory_lock($1);", config.CLUSTER_LEADER_LOCK_ID
+            )
+        except (OSError, asyncpg.PostgresError):
+            logging.exception("Failed to take part in leader election")
+            return False
+        if self.is_leader:
+            logging.info("Elected as leader")
+        return self.is_leader
+
+    async def stop(self) -> None:
+        """Step down as leader and stop listening."""
+        conn, self._conn = self._conn, None
+        if conn is None:
+            return
+        if not conn.is_closed():
+            await conn.remove_listener(_NOTIFICATIONS_CHANNEL, self._on_notify)
+            if self.is_leader:
+                await conn.execute(
+                    "select pg_advisory_unlock($1);", config.CLUSTER_LEADER_LOCK_ID
+                )
+        self.is_leader = False
+        await self.db_pool.release(conn)
+
+    async def publish(self, notification_id: int) -> None:
+        """Send a notification in the outbox to every other process."""
+        payload = json.dumps({"from": self._instance_id, "id": notification_id})
+        async with self.db_pool.acquire() as conn:
+            await conn.execute(
+                "select pg_notify($1, $2);", _NOTIFICATIONS_CHANNEL, payload
+            )
+
+    # pylint: disable-next=unused-argument
+    def _on_notify(self, _conn, _pid, _channel, payload: str) -> None:
+        message = json.loads(payload)
+        if message["from"] == self._instance_id:
+            return
+
+        logging.info(f"Received notification {message['id']} from the leader")
+        self.on_notification(message["id"])
+
+    def _on_terminated(self, conn) -> None:
+        # Postgres releases the advisory lock when the session ends.
+        if self.is_leader:
+            logging.warning("Lost connection holding the leader lock, stepping down")
+        else:
+            logging.warning("Lost connection listening for notifications")
+        self.is_leader = False
+        self._conn = None
+        # Given back to the pool the next time we try to connect.
+        self._dead_conn = conn
@@ -36,17 +36,53 @@ DOCKER_VOLUME_PATH = "/docker-volume/"
 
 PICKLE_DUMP_LOCATION = DOCKER_VOLUME_PATH + "slb.pkl" if INSIDE_DOCKER else "./slb.pkl"
 
+# Where subscriptions, metrics, and counts are stored, either "postgres" or "sqlite".
+# SQLite needs no database server, but can only be used by a single process.
+STORAGE_BACKEND = os.environ.get("SLB_STORAGE_BACKEND", "postgres")
+SQLITE_PATH = os.environ.get(
+    "SLB_SQLITE_PATH",
+    DOCKER_VOLUME_PATH + "slb.sqlite" if INSIDE_DOCKER else "./slb.sqlite",
+)
+
 DB_HOST = os.environ.get("SLB_DB_HOST", "localhost")
 DB_PORT = int(os.environ.get("SLB_DB_PORT", 5432))
 
 DB_USER = os.environ.get("POSTGRES_USER", "slb")
-DB_PASS = os.environ["POSTGRES_PASSWORD"]
+DB_PASS = os.environ.get("POSTGRES_PASSWORD")
 DB_NAME = os.environ.get("POSTGRES_DB", "spacexlaunchbot")
 
 # Seem like sensible defaults, may need tuning if DB is used by other applications.
 DB_POOL_MIN_CONNECTIONS = 10
 DB_POOL_MAX_CONNECTIONS = 50
 
+# Metrics are buffered and written in batches, a batch is written when it reaches
+# METRICS_BATCH_SIZE rows or is METRICS_BATCH_DELAY seconds old.
+METRICS_BATCH_SIZE = 500
+METRICS_BATCH_DELAY = 5
+# Metrics registered while this many are waiting to be written are dropped.
+METRICS_MAX_QUEUED = 10_000
+
+#
+# Sharding
+#
+
+# The total number of shards across every process, and the shards this process
+# should run (comma separated). Leave both unset to run every shard in one process.
+SHARD_COUNT = (
+    int(os.environ["SLB_SHARD_COUNT"]) if "SLB_SHARD_COUNT" in os.environ else None
+)
+SHARD_IDS = (
+    [int(i) for i in os.environ["SLB_SHARD_IDS"].split(",")]
+    if "SLB_SHARD_IDS" in os.environ
+    else None
+)
+
+# When shards are split across processes, the process holding this advisory lock is
+# the leader that polls for and publishes notifications.
+CLUSTER_LEADER_LOCK_ID = BOT_CLIENT_ID
+# How many seconds a process that isn't the leader waits before trying to become it.
+CLUSTER_LEADER_RETRY_INTERVAL = 30
+
 #
 # Discord & Related APIs
 #
@@ -77,6 +113,21 @@ BOT_LIST_DATA = [
     },
 ]
 
+# Seconds to wait after a guild count changes before posting it to the bot lists, so
+# that a burst of changes results in one post
+BOT_LIST_POST_DELAY = 60
+
+# The longest number of seconds to wait before trying a bot list again after it fails
+BOT_LIST_MAX_BACKOFF = 60 * 60
+
+# Where webhooks are executed, channels can be subscribed with a webhook so that
+# notifications to them don't take from the bot's global rate limit
+DISCORD_API_URL = "https://discord.com/api/v10"
+# The name given to the webhooks that are created for channels
+WEBHOOK_NAME = "SpaceX Launch Bot"
+# How many seconds a webhook execution can take before it is retried later
+WEBHOOK_REQUEST_TIMEOUT = 10
+
 #
 # Logging
 #
@@ -84,27 +135,122 @@ BOT_LIST_DATA = [
 LOG_FORMAT = "%(asctime)s | %(levelname)s | %(module)s | %(funcName)s | %(message)s"
 LOG_LEVEL = logging.INFO
 
+# Logs are written to the db in batches, see METRICS_BATCH_SIZE.
+LOG_DB_BATCH_SIZE = 200
+LOG_DB_BATCH_DELAY = 2
+LOG_DB_MAX_QUEUED = 5000
+# Once the queue is this full, only 1 in LOG_DB_SAMPLE_RATE records below WARNING
+# are kept. Records are dropped when the queue is completely full.
+LOG_DB_SAMPLE_THRESHOLD = 0.5
+LOG_DB_SAMPLE_RATE = 10
+
+#
+# Healthcheck & Prometheus Metrics
+#
+
+# The healthcheck server answers GET /health, which the Dockerfile's HEALTHCHECK
+# uses, and serves Prometheus metrics from GET /metrics. Set the host to 0.0.0.0 to
+# let Prometheus scrape it from another container.
+HEALTHCHECK_HOST = os.environ.get("SLB_HEALTHCHECK_HOST", "127.0.0.1")
+HEALTHCHECK_PORT = 40404
+# The bot is unhealthy if its latency to Discord is more than this many seconds.
+HEALTHCHECK_MAX_LATENCY = 0.5
+
 #
 # Rate Limits (in minutes)
 #
 
-# Currently just used to validate NOTIF_TASK_INTERVAL
-API_RATELIMIT_MIN_WAIT_LL2 = 5
+# Requests per hour, no more than this many requests are made to LL2 in any hour
+API_RATELIMIT_LL2 = 15
+
+# How many of those requests can be saved up while the next launch is far off, to be
+# spent on checking more often as it gets close
+API_RATELIMIT_LL2_BURST = 5
+
+# How many upcoming launches are requested from LL2 at a time, these are kept so the
+# launch command can be answered without any extra requests.
+LL2_UPCOMING_WINDOW = 10
+
+# Requests per second, see https://discord.com/developers/docs/topics/rate-limits
+API_RATELIMIT_DISCORD_GLOBAL = 50
 
 #
 # Notifications
 #
 
-# How many minutes to wait in-between checking for notifications to send
+# The shortest and longest number of minutes to wait in-between checking for
+# notifications to send. The wait shrinks as the next launch gets closer, see
+# notifications.poll_interval
 # This does not take into account time taken to process the data and to send out notifs
-NOTIF_TASK_INTERVAL = 5
+NOTIF_TASK_MIN_INTERVAL = 2
+NOTIF_TASK_MAX_INTERVAL = 30
 
-# How many minutes to look into the future for an upcoming launch time
-# Must be > NOTIF_TASK_INTERVAL else you risk skipping a launch
+# How many minutes before a launch to send the launch notification, unless a channel
+# chose its own reminder times
+# Must be > NOTIF_TASK_MIN_INTERVAL else you risk skipping a launch
 NOTIF_TASK_LAUNCH_DELTA = 30
 
+# The most launch reminders a channel can have, and the furthest before a launch (in
+# minutes) they can be. Channels that don't choose get one at NOTIF_TASK_LAUNCH_DELTA
+NOTIF_MAX_REMINDERS = 5
+NOTIF_MAX_REMINDER_OFFSET = 7 * 24 * 60
+
+# How many channels a notification is sent to at the same time
+NOTIF_FANOUT_CONCURRENCY = 25
+
+# Channels are unsubscribed once sending to them has been forbidden (e.g. the bot
+# can no longer see the channel) this many times in a row
+NOTIF_MAX_FORBIDDEN = 3
+
+# Notifications are sent from an outbox in the db, so that a send that fails for a
+# reason that may pass (e.g. Discord having an outage) can be tried again, and a
+# restart part way through sending carries on where it left off. A failed send is
+# tried again after NOTIF_RETRY_BASE_DELAY seconds, doubling each time up to
+# NOTIF_RETRY_MAX_DELAY, and is given up on after NOTIF_MAX_ATTEMPTS
+NOTIF_MAX_ATTEMPTS = 5
+NOTIF_RETRY_BASE_DELAY = 30
+NOTIF_RETRY_MAX_DELAY = 10 * 60
+
+# Seconds between checking the outbox for sends to try again
+NOTIF_OUTBOX_INTERVAL = 15
+
+# Sends for notifications older than this many minutes are not tried again, as they
+# are likely out of date
+NOTIF_OUTBOX_MAX_AGE = 60
+
+# How many hours notifications are kept in the outbox for
+NOTIF_OUTBOX_RETENTION = 24
+
+# The results of sends are written to the outbox in batches of this many. If the bot
+# stops before a batch is written, those channels are sent to again on restart
+NOTIF_OUTBOX_BATCH_SIZE = 50
+
 
 def validate():
+    assert STORAGE_BACKEND in ("postgres", "sqlite")
+    if STORAGE_BACKEND == "postgres":
+        assert DB_PASS is not None, "POSTGRES_PASSWORD is required for Postgres"
     assert DB_POOL_MAX_CONNECTIONS >= DB_POOL_MIN_CONNECTIONS
-    assert NOTIF_TASK_INTERVAL >= API_RATELIMIT_MIN_WAIT_LL2
-    assert NOTIF_TASK_LAUNCH_DELTA > NOTIF_TASK_INTERVAL
+    assert 0 < API_RATELIMIT_LL2_BURST < API_RATELIMIT_LL2
+    assert 0 < NOTIF_TASK_MIN_INTERVAL <= NOTIF_TASK_MAX_INTERVAL
+    assert NOTIF_TASK_LAUNCH_DELTA > NOTIF_TASK_MIN_INTERVAL
+    assert NOTIF_MAX_REMINDERS > 0
+    assert NOTIF_MAX_REMINDER_OFFSET >= NOTIF_TASK_LAUNCH_DELTA
+    assert NOTIF_FANOUT_CONCURRENCY > 0
+    assert NOTIF_MAX_FORBIDDEN > 0
+    assert NOTIF_MAX_ATTEMPTS > 0
+    assert 0 < NOTIF_RETRY_BASE_DELAY <= NOTIF_RETRY_MAX_DELAY
+    assert 0 < NOTIF_OUTBOX_INTERVAL < 60 * NOTIF_OUTBOX_MAX_AGE
+    assert 60 * NOTIF_OUTBOX_RETENTION > NOTIF_OUTBOX_MAX_AGE
+    assert NOTIF_OUTBOX_BATCH_SIZE > 0
+    assert BOT_LIST_POST_DELAY > 0
+    assert WEBHOOK_REQUEST_TIMEOUT > 0
+    assert LL2_UPCOMING_WINDOW > 0
+    assert METRICS_MAX_QUEUED >= METRICS_BATCH_SIZE > 0
+    assert LOG_DB_MAX_QUEUED >= LOG_DB_BATCH_SIZE > 0
+    assert 0 < LOG_DB_SAMPLE_THRESHOLD <= 1
+    if SHARD_IDS is not None:
+        assert SHARD_COUNT is not None
+        # Processes find each other through Postgres.
+        assert STORAGE_BACKEND == "postgres"
+        assert all(0 <= shard_id < SHARD_COUNT for shard_id in SHARD_IDS)
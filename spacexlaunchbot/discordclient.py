@@ -2,32 +2,62 @@ import asyncio
 import logging
 import platform
 import signal
-from typing import Union
+import time
+from typing import Collection, Iterable, Union
 
+import aiohttp
 import asyncpg
 import discord
-import discordhealthcheck
 from discord import app_commands
 
-from . import apis, config, embeds, storage
-from .notifications import NotificationType, check_and_send_notifications
+from . import apis, config, embeds, healthcheck, storage, telemetry
+from .cluster import Cluster
+from .fanout import Fanout
+from .notifications import (
+    NotificationType,
+    PreparedMessage,
+    ReminderScheduler,
+    check_and_send_notifications,
+    notification_channels,
+    notification_from_payload,
+    notification_payload,
+    parse_reminder_offsets,
+)
+from .outbox import Outbox
+from .send_failures import SendFailures
+from .storage import DeliveryState
 from .utils import PostgresLogger, sys_info
 
 ONE_MINUTE = 60
 
 
-class SpaceXLaunchBotClient(discord.Client):
+class SpaceXLaunchBotClient(discord.AutoShardedClient):
     # - The signals package is a bit iffy when it comes to pylint.
     #   See https://github.com/PyCQA/pylint/issues/2804
     # - Disable line-too-long because I'm lazy
     # pylint: disable=no-member,line-too-long,too-many-public-methods,too-many-instance-attributes
 
     def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs, intents=discord.Intents.default())
+        super().__init__(
+            *args,
+            **kwargs,
+            intents=discord.Intents.default(),
+            shard_count=config.SHARD_COUNT,
+            shard_ids=config.SHARD_IDS,
+        )
         logging.info("Client initialised")
         logging.info(sys_info())
         self.tree = app_commands.CommandTree(self)
         self.tree_synced = False
+        self.fanout = Fanout(
+            config.NOTIF_FANOUT_CONCURRENCY, config.API_RATELIMIT_DISCORD_GLOBAL
+        )
+        self.reminders = ReminderScheduler(self)
+        self.outbox = Outbox(self, self._send_s)
+        self.send_failures = SendFailures(self)
+        # Fire and forget tasks, referenced here so they aren't garbage collected.
+        # Set up here as notifications can be received before setup_hook finishes.
+        self.background_tasks: set[asyncio.Task] = set()
 
     async def setup_hook(self):
         # pylint: disable=attribute-defined-outside-init
@@ -45,32 +75,50 @@ class SpaceXLaunchBotClient(discord.Client):
                     s, lambda sig=s: self.loop.create_task(self.shutdown(sig=sig))
                 )
 
-        logging.info("Creating a connection pool for DB")
-        self.db_pool = await asyncpg.create_pool(
-            user=config.DB_USER,
-            password=config.DB_PASS,
-            host=config.DB_HOST,
-            port=config.DB_PORT,
-            database=config.DB_NAME,
-            min_size=config.DB_POOL_MIN_CONNECTIONS,
-            max_size=config.DB_POOL_MAX_CONNECTIONS,
-        )
-        logging.info(
-            f"Pooled with {self.db_pool.get_size()}/{self.db_pool.get_max_size()} connections"
-        )
+        self.postgres_logger: PostgresLogger | None = None
+        self.cluster: Cluster | None = None
 
-        logging.getLogger().addHandler(
-            PostgresLogger(config.LOG_FORMAT, self.loop, self.db_pool)
-        )
-        logging.info("Initialised Postgres logger")
+        if config.STORAGE_BACKEND == "sqlite":
+            self.ds = storage.SQLiteDataStore(
+                config.SQLITE_PATH,
+                config.PICKLE_DUMP_LOCATION,
+            )
+        else:
+            logging.info("Creating a connection pool for DB")
+            self.db_pool = await asyncpg.create_pool(
+                user=config.DB_USER,
+                password=config.DB_PASS,
+                host=config.DB_HOST,
+                port=config.DB_PORT,
+                database=config.DB_NAME,
+                min_size=config.DB_POOL_MIN_CONNECTIONS,
+                max_size=config.DB_POOL_MAX_CONNECTIONS,
+            )
+            logging.info(
+                f"Pooled with {self.db_pool.get_size()}/{self.db_pool.get_max_size()} connections"
+            )
 
-        self.ds = storage.DataStore(
-            self.db_pool,
-            config.PICKLE_DUMP_LOCATION,
-        )
-        logging.info("Data storage initialised")
+            self.postgres_logger = PostgresLogger(
+                config.LOG_FORMAT, self.loop, self.db_pool
+            )
+            logging.getLogger().addHandler(self.postgres_logger)
+            logging.info("Initialised Postgres logger")
+
+            self.ds = storage.PostgresDataStore(
+                self.db_pool,
+                config.PICKLE_DUMP_LOCATION,
+            )
+        await self.ds.start()
+        logging.info(f"Data storage initialised using {config.STORAGE_BACKEND}")
+        await self.send_failures.load()
+        self.outbox.start()
+
+        if config.SHARD_IDS is not None:
+            logging.info(f"Running shards {config.SHARD_IDS} of {config.SHARD_COUNT}")
+            self.cluster = Cluster(self.db_pool, self.on_cluster_notification)
+            await self.cluster.try_lead()
 
-        self.healthcheck_server = await discordhealthcheck.start(self)
+        self.healthcheck_server = await healthcheck.start(self)
         logging.info("Started healthcheck server")
 
         self.notification_task = self.loop.create_task(self.start_notification_loop())
@@ -116,11 +164,10 @@ class SpaceXLaunchBotClient(discord.Client):
             description="Send the latest launch schedule message to the current channel",
         )(self.command_next_launch)
 
-        # FIXME: Can't really support this with the current rate limiting?
-        # self.tree.command(
-        #     name="launch",
-        #     description="Send the launch schedule message for the given launch number to the current channel",
-        # )(self.command_launch)
+        self.tree.command(
+            name="launch",
+            description="Send the launch schedule message for the given launch number to the current channel",
+        )(self.command_launch)
 
         self.tree.command(
             name="add",
@@ -153,14 +200,18 @@ class SpaceXLaunchBotClient(discord.Client):
     async def on_guild_join(self, guild) -> None:
         logging.info(f"Joined guild, ID: {guild.id}")
         await self.update_website_metrics()
-        await self.ds.register_metric("guild_join", str(guild.id))
+        self.ds.register_metric("guild_join", str(guild.id))
 
     async def on_guild_remove(self, guild) -> None:
         logging.info(f"Removed from guild, ID: {guild.id}")
         await self.update_website_metrics()
-        await self.ds.register_metric("guild_remove", str(guild.id))
+        self.ds.register_metric("guild_remove", str(guild.id))
         # Any subscribed channels from this guild will be removed later by
-        # send_notification.
+        # deliver_notification.
+
+    def on_cluster_notification(self, notification_id: int) -> None:
+        """Called when the leader process publishes a notification."""
+        self.run_in_background(self.deliver_published_notification(notification_id))
 
     #
     # Helpers
@@ -178,11 +229,43 @@ class SpaceXLaunchBotClient(discord.Client):
         except asyncio.CancelledError:
             pass
 
+    def run_in_background(self, coro) -> None:
+        """Run a coroutine as a task without waiting for it to finish."""
+        task = asyncio.get_running_loop().create_task(coro)
+        self.background_tasks.add(task)
+        task.add_done_callback(self.background_tasks.discard)
+
+    @staticmethod
+    def owns_guild(guild_id: int) -> bool:
+        """Check if the given guild is on one of the shards run by this process."""
+        if config.SHARD_IDS is None:
+            return True
+        assert config.SHARD_COUNT is not None
+        # See https://discord.com/developers/docs/topics/gateway#sharding
+        return (guild_id >> 22) % config.SHARD_COUNT in config.SHARD_IDS
+
+    @property
+    def reports_counts(self) -> bool:
+        """If this process is the one that reports counts for the whole bot."""
+        return self.cluster is None or self.cluster.is_leader
+
+    async def guild_count(self) -> int:
+        """Count the guilds the bot is in, across every process if there are many."""
+        if self.cluster is None:
+            return len(self.guilds)
+        assert config.SHARD_IDS is not None and config.SHARD_COUNT is not None
+        # Shards without any guilds are saved too, as they may have had some before.
+        guild_counts = dict.fromkeys(config.SHARD_IDS, 0)
+        for guild in self.guilds:
+            guild_counts[guild.shard_id] += 1
+        await self.ds.set_shard_guild_counts(guild_counts)
+        return await self.ds.total_guild_count(config.SHARD_COUNT)
+
     async def update_website_metrics(self) -> None:
-        """Update bot list websites with guild count"""
-        guild_count = len(self.guilds)
-        logging.info(f"Updating bot lists with a guild_count of {guild_count}")
-        await apis.bot_lists.post_all_bot_lists(guild_count)
+        """Update bot list websites with guild count, see apis.bot_lists."""
+        guild_count = await self.guild_count()
+        if self.reports_counts:
+            apis.bot_lists.report_guild_count(guild_count)
 
     #
     # State change
@@ -198,16 +281,43 @@ class SpaceXLaunchBotClient(discord.Client):
         logging.info("Cancelling notification_task")
         self.notification_task.cancel()
         await self.notification_task
+        self.reminders.cancel()
 
         logging.info("Cancelling counts_task")
         self.counts_task.cancel()
         await self.counts_task
 
+        if self.cluster is not None:
+            logging.info("Leaving cluster")
+            await self.cluster.stop()
+
+        logging.info("Waiting for background tasks")
+        await asyncio.gather(*self.background_tasks, return_exceptions=True)
+
+        logging.info("Stopping outbox")
+        await self.outbox.stop()
+        await self.send_failures.flush()
+
+        logging.info("Stopping data storage")
+        await self.ds.stop()
+
+        logging.info("Closing LL2, bot list, and webhook sessions")
+        await apis.ll2.close_session()
+        await apis.bot_lists.close_session()
+        await apis.webhooks.close_session()
+
         logging.info("Closing healthcheck server")
-        self.healthcheck_server.close()
-        await self.healthcheck_server.wait_closed()
+        await self.healthcheck_server.cleanup()
 
+        if self.postgres_logger is not None:
+            logging.info(
+                f"Postgres logger dropped {self.postgres_logger.dropped} and sampled "
+                f"out {self.postgres_logger.sampled_out} records"
+            )
         logging.info("Goodbye")
+        if self.postgres_logger is not None:
+            logging.getLogger().removeHandler(self.postgres_logger)
+            await self.postgres_logger.stop()
         await self.close()
 
     async def set_playing(self, title: str) -> None:
@@ -217,76 +327,169 @@ class SpaceXLaunchBotClient(discord.Client):
     # Message sending
     #
 
-    @staticmethod
     async def _send_s(
+        self,
         channel,
-        to_send: Union[str, discord.Embed],
-    ) -> None:
+        message: PreparedMessage,
+        mentions: str = "",
+        allowed_mentions: discord.AllowedMentions | None = None,
+        webhook: tuple[int, str] | None = None,
+    ) -> DeliveryState:
         """Safely send a text / embed message to a channel. Logs any errors that occur.
 
         Args:
             channel: A discord.Channel object.
-            to_send: A string or discord.Embed object.
+            message: The message to send.
+            mentions: Mentions to send in the same message.
+            allowed_mentions: Which of the mentions are allowed to notify anyone.
+            webhook: The id and token of a webhook to send it through, if it has been
+                deleted it is sent as the bot instead.
+
+        Returns:
+            delivered if the message was sent, pending if it failed in a way that
+            may not happen if it is tried again, otherwise failed.
 
         """
+        body = message.body(mentions, allowed_mentions)
         try:
-            if isinstance(to_send, embeds.BetterEmbed):
-                if to_send.size_ok():
-                    await channel.send(embed=to_send)
-                else:
-                    logging.warning("Embed is too large to send")
-            elif isinstance(to_send, discord.Embed):
-                await channel.send(embed=to_send)
-            else:
-                await channel.send(to_send)
+            with telemetry.CHANNEL_SEND_SECONDS.time():
+                if webhook is not None:
+                    try:
+                        await apis.webhooks.execute(webhook, body)
+                    except discord.errors.NotFound:
+                        logging.info(f"Webhook for {channel.id} deleted, forgetting it")
+                        self.run_in_background(self.ds.remove_webhook(str(channel.id)))
+                        webhook = None
+                if webhook is None:
+                    await apis.channels.send_message(self.http, channel.id, body)
+            telemetry.CHANNEL_SENDS.labels("sent").inc()
+            self.send_failures.record(channel.id, forbidden=False)
+            return DeliveryState.delivered
 
         except discord.errors.Forbidden:
-            # TODO: Count how many times this happens and unsub when n have happened?
-            pass
+            # Unsubscribed if this keeps happening, see SendFailures.
+            telemetry.CHANNEL_SENDS.labels("forbidden").inc()
+            self.send_failures.record(channel.id, forbidden=True)
 
         except discord.errors.HTTPException as ex:
             # Length/size is most likely cause,
             # see https://discord.com/developers/docs/resources/channel#embed-limits
             logging.warning(f"HTTPException: {ex}")
+            telemetry.CHANNEL_SENDS.labels("http_error").inc()
+            # Discord having problems or being busy, rather than a bad request.
+            if ex.status >= 500 or ex.status == 429:
+                return DeliveryState.pending
+
+        except (aiohttp.ClientError, asyncio.TimeoutError, OSError) as ex:
+            logging.warning(f"Failed to connect to Discord: {ex}")
+            telemetry.CHANNEL_SENDS.labels("connection_error").inc()
+            return DeliveryState.pending
+
+        return DeliveryState.failed
 
     async def send_notification(
         self,
         to_send: Union[str, discord.Embed],
         notification_type: NotificationType,
+        channel_ids: Collection[int] | None = None,
     ) -> None:
         """Send a notification message to all channels subscribed to the given type.
 
+        When running as part of a cluster, the notification is also published to
+        the other processes so they can deliver it to their guilds.
+
         Args:
             to_send: A string or discord.Embed object.
             notification_type: The type of notification being sent.
+            channel_ids: If given, only send to these of the subscribed channels, e.g.
+                the channels a launch reminder is for.
 
         """
-        channel_ids = await self.ds.get_subbed_channels()
-        invalid_ids = set()
+        notification_id = None
+        if self.cluster is not None:
+            # Added to the outbox first, so other processes can load it from there.
+            notification_id = await self.ds.add_notification(
+                notification_type, notification_payload(to_send, channel_ids), []
+            )
+            await self.cluster.publish(notification_id)
+        await self.deliver_notification(
+            to_send, notification_type, channel_ids, notification_id
+        )
+
+    async def deliver_published_notification(self, notification_id: int) -> None:
+        """Load a notification published by the cluster leader and deliver it."""
+        notification_type, payload = await self.ds.get_notification(notification_id)
+        await self.deliver_notification(
+            notification_from_payload(payload),
+            notification_type,
+            notification_channels(payload),
+            notification_id,
+        )
+
+    async def deliver_notification(
+        self,
+        to_send: Union[str, discord.Embed],
+        notification_type: NotificationType,
+        channel_ids: Collection[int] | None = None,
+        notification_id: int | None = None,
+    ) -> None:
+        """Send a notification message to the subscribed channels in our guilds.
+
+        Args:
+            to_send: A string or discord.Embed object.
+            notification_type: The type of notification being sent.
+            channel_ids: If given, only send to these of the subscribed channels.
+            notification_id: The id of the notification if it is already in the
+                outbox.
 
-        for channel_id in channel_ids:
-            subscription_opts = channel_ids[channel_id]
+        """
+        # Checked once here rather than for every channel it is sent to.
+        if isinstance(to_send, embeds.BetterEmbed) and not to_send.size_ok():
+            logging.warning("Embed is too large to send, truncating it")
+            to_send = to_send.copy()
+            to_send.truncate_to_fit()
+
+        with telemetry.SUBSCRIPTIONS_LOOKUP_SECONDS.time():
+            subscriptions = await self.ds.get_subbed_channels(notification_type)
+        invalid_ids = set()
+        targets = []
 
-            if subscription_opts.notification_type not in [
-                NotificationType.all,
-                notification_type,
-            ]:
+        for channel_id, subscription_opts in subscriptions.items():
+            if not self.owns_guild(subscription_opts.guild_id):
+                # Another process will deliver to this one.
+                telemetry.CHANNELS_SKIPPED.labels("other_process").inc()
+                continue
+            if channel_ids is not None and channel_id not in channel_ids:
+                # A launch reminder for other channels.
+                telemetry.CHANNELS_SKIPPED.labels("no_reminder").inc()
                 continue
 
             channel = self.get_channel(channel_id)
             if channel is None:
+                telemetry.CHANNELS_SKIPPED.labels("not_found").inc()
                 invalid_ids.add(channel_id)
                 continue
 
-            await self._send_s(channel, to_send)
+            targets.append((channel, subscription_opts))
+
+        with telemetry.NOTIFICATION_DELIVER_SECONDS.labels(
+            notification_type.name
+        ).time():
+            stats = await self.outbox.deliver(
+                to_send, notification_type, targets, notification_id
+            )
+        logging.info(f"Sent {notification_type.name} notification: {stats}")
 
-            if notification_type == NotificationType.launch:
-                mentions = subscription_opts.launch_mentions
-                if mentions != "":
-                    await self._send_s(channel, mentions)
+        # Don't hold up any notifications that are sent after this one.
+        self.run_in_background(self.send_failures.flush())
+        if invalid_ids:
+            self.run_in_background(self.prune_channels(invalid_ids))
 
-        for channel_id in invalid_ids:
-            await self.ds.remove_subbed_channel(str(channel_id))
+    async def prune_channels(self, channel_ids: Iterable[int]) -> None:
+        """Unsubscribe channels that can no longer be sent to."""
+        removed = await self.ds.remove_subbed_channels(str(cid) for cid in channel_ids)
+        telemetry.CHANNELS_PRUNED.labels("not_found").inc(removed)
+        logging.info(f"Pruned {removed} channels from subscriptions")
 
     #
     # Background tasks
@@ -294,14 +497,30 @@ class SpaceXLaunchBotClient(discord.Client):
     #
 
     async def start_db_counts_loop(self) -> None:
-        """A loop that every hour sends the guild and subscribed counts to the db."""
+        """A loop that every hour sends the guild and subscribed counts to the db, and
+        prunes old notifications from the outbox.
+
+        When the shards are split across processes only the leader saves the total
+        counts, and reports the guild count so that bot lists get other processes'
+        changes too.
+        """
         logging.info("Waiting for client ready")
         await self.wait_until_ready()
         logging.info("Starting")
 
         while not self.is_closed():
             try:
-                await self.ds.update_counts(len(self.guilds))
+                guild_count = await self.guild_count()
+                if self.reports_counts:
+                    await self.ds.update_counts(guild_count)
+                    apis.bot_lists.report_guild_count(guild_count)
+                # Includes failures from sends that the outbox retried.
+                await self.send_failures.flush()
+                pruned = await self.ds.prune_notifications(
+                    time.time() - 60 * 60 * config.NOTIF_OUTBOX_RETENTION
+                )
+                logging.info(f"Pruned {pruned} old notifications from the outbox")
+                logging.info(f"LL2 launch lookups: {apis.ll2.lookup_stats()}")
                 await asyncio.sleep(ONE_MINUTE * 60)
             except asyncio.CancelledError:
                 logging.info("Cancelled, stopping")
@@ -317,14 +536,20 @@ class SpaceXLaunchBotClient(discord.Client):
 
         while not self.is_closed():
             try:
-                await check_and_send_notifications(self)
-                await asyncio.sleep(ONE_MINUTE * config.NOTIF_TASK_INTERVAL)
+                if self.cluster is not None and not await self.cluster.try_lead():
+                    # The leader checks for notifications and publishes them to us.
+                    self.reminders.cancel()
+                    await asyncio.sleep(config.CLUSTER_LEADER_RETRY_INTERVAL)
+                    continue
+                with telemetry.NOTIFICATION_CHECK_SECONDS.time():
+                    interval = await check_and_send_notifications(self)
+                logging.debug(f"Checking for notifications in {interval:.0f}s")
+                await asyncio.sleep(interval)
             except asyncio.CancelledError:
                 logging.info("Cancelled, stopping")
                 break
 
-        logging.info("Loop finished, saving data")
-        self.ds.save_state()
+        logging.info("Loop finished")
 
     #
     # Slash command helpers
@@ -343,33 +568,48 @@ class SpaceXLaunchBotClient(discord.Client):
     #
 
     async def command_next_launch(self, interaction: discord.Interaction):
-        await self.ds.register_metric("command_next_launch", str(interaction.guild_id))
+        self.ds.register_metric("command_next_launch", str(interaction.guild_id))
         response: discord.Embed
         next_launch_dict = await apis.ll2.get_launch_dict()
         if next_launch_dict == {}:
             response = embeds.API_ERROR_EMBED
         else:
-            response = embeds.create_schedule_embed(next_launch_dict)
+            response, _ = embeds.cached_schedule_embed(next_launch_dict)
         await interaction.response.send_message(embed=response)
 
-    # FIXME: This will cause us to rate limit I imagine...
-    # async def command_launch(
-    #     self, interaction: discord.Interaction, launch_number: int
-    # ):
-    #     await self.ds.register_metric("command_launch", str(interaction.guild_id))
-    #     response: discord.Embed
-    #     launch_dict = await apis.ll2.get_launch_dict(launch_number)
-    #     if launch_dict == {}:
-    #         response = embeds.API_ERROR_EMBED
-    #     else:
-    #         response = embeds.create_schedule_embed(launch_dict)
-    #     await interaction.response.send_message(embed=response)
+    async def command_launch(self, interaction: discord.Interaction, launch: str):
+        """Send the schedule for the nth upcoming launch, or the launch with an LL2 id.
+
+        Served from the launches fetched by the last LL2 request, so this doesn't
+        spend any of the rate limit.
+        """
+        self.ds.register_metric("command_launch", str(interaction.guild_id))
+        response: discord.Embed
+        launch_dict = await apis.ll2.get_launch_dict(
+            int(launch) if launch.isdigit() else launch
+        )
+        if launch_dict == {}:
+            response = embeds.create_interaction_embed(
+                f"Launch {launch} is not one of the next "
+                f"{config.LL2_UPCOMING_WINDOW} upcoming launches",
+                success=False,
+            )
+        else:
+            try:
+                response, _ = embeds.cached_schedule_embed(launch_dict)
+            except (KeyError, TypeError):
+                # Launches further out don't always have all of the data yet.
+                logging.warning(f"Launch {launch} is missing data", exc_info=True)
+                response = embeds.API_ERROR_EMBED
+        await interaction.response.send_message(embed=response)
 
     async def command_add(
         self,
         interaction: discord.Interaction,
         notification_type: str,
         notification_mentions: str | None = None,
+        reminders: str | None = None,
+        webhook: bool = False,
     ):
         if self.interaction_from_admin(interaction) is False:
             await interaction.response.send_message(
@@ -377,7 +617,7 @@ class SpaceXLaunchBotClient(discord.Client):
             )
             return
 
-        await self.ds.register_metric("command_add", str(interaction.guild_id))
+        self.ds.register_metric("command_add", str(interaction.guild_id))
 
         try:
             notification_type = NotificationType[notification_type]  # type: ignore
@@ -390,6 +630,36 @@ class SpaceXLaunchBotClient(discord.Client):
             )
             return
 
+        reminder_offsets = None
+        if reminders is not None:
+            try:
+                reminder_offsets = parse_reminder_offsets(reminders)
+            except ValueError as ex:
+                await interaction.response.send_message(
+                    embed=embeds.create_interaction_embed(
+                        f'Invalid reminders, try "24h, 1h, 10m": {ex}',
+                        success=False,
+                    )
+                )
+                return
+
+        created_webhook: discord.Webhook | None = None
+        if webhook:
+            try:
+                created_webhook = await interaction.channel.create_webhook(  # type: ignore
+                    name=config.WEBHOOK_NAME
+                )
+            except discord.errors.HTTPException as ex:
+                logging.warning(f"Failed to create webhook: {ex}")
+                await interaction.response.send_message(
+                    embed=embeds.create_interaction_embed(
+                        "Could not create a webhook, check that I have the "
+                        "Manage Webhooks permission in this channel",
+                        success=False,
+                    )
+                )
+                return
+
         response: discord.Embed
         added = await self.ds.add_subbed_channel(
             str(interaction.channel_id),
@@ -397,9 +667,17 @@ class SpaceXLaunchBotClient(discord.Client):
             str(interaction.guild_id),
             notification_type,
             notification_mentions,
+            reminder_offsets,
+            (
+                (created_webhook.id, created_webhook.token or "")
+                if created_webhook is not None
+                else None
+            ),
         )
 
         if added is False:
+            if created_webhook is not None:
+                await created_webhook.delete()
             response = embeds.create_interaction_embed(
                 "This channel is already subscribed to the notification service",
                 success=False,
@@ -419,7 +697,7 @@ class SpaceXLaunchBotClient(discord.Client):
             )
             return
 
-        await self.ds.register_metric("command_remove", str(interaction.guild_id))
+        self.ds.register_metric("command_remove", str(interaction.guild_id))
 
         response: discord.Embed
 
@@ -437,9 +715,9 @@ class SpaceXLaunchBotClient(discord.Client):
         await interaction.response.send_message(embed=response)
 
     async def command_info(self, interaction: discord.Interaction):
-        await self.ds.register_metric("command_info", str(interaction.guild_id))
+        self.ds.register_metric("command_info", str(interaction.guild_id))
 
-        guild_count = len(self.guilds)
+        guild_count = await self.guild_count()
         channel_count = await self.ds.subbed_channels_count()
 
         old_guild_count, old_channel_count = await self.ds.day_old_counts()
@@ -457,5 +735,5 @@ class SpaceXLaunchBotClient(discord.Client):
         )
 
     async def command_help(self, interaction: discord.Interaction):
-        await self.ds.register_metric("command_help", str(interaction.guild_id))
+        self.ds.register_metric("command_help", str(interaction.guild_id))
         await interaction.response.send_message(embed=embeds.HELP_EMBED)
@@ -1,9 +1,10 @@
 from .better_embed import BetterEmbed
+from .cache import cached_launch_embed, cached_schedule_embed
 from .create import (
     create_info_embed,
     create_interaction_embed,
     create_launch_embed,
     create_schedule_embed,
 )
-from .diff import diff_schedule_embed_dicts
+from .diff import ScheduleChanges, diff_schedule_embed_dicts
 from .static import ADMIN_PERMISSION_REQUIRED, API_ERROR_EMBED, HELP_EMBED
@@ -1,7 +1,25 @@
-from typing import Union
+from typing import Any, Mapping, Union
 
 import discord
 
+# See https://discord.com/developers/docs/resources/channel#embed-limits
+_MAX_FIELDS = 25
+_MAX_TITLE = 256
+_MAX_DESCRIPTION = 2048
+_MAX_FIELD_NAME = 256
+_MAX_FIELD_VALUE = 1024
+_MAX_FOOTER = 2048
+_MAX_AUTHOR = 256
+_MAX_TOTAL = 6000
+
+_ELLIPSIS = "…"
+
+
+def _truncate(text: str, limit: int) -> str:
+    if len(text) <= limit:
+        return text
+    return text[: max(limit - len(_ELLIPSIS), 0)] + _ELLIPSIS
+
 
 class BetterEmbed(discord.Embed):
     def __init__(
@@ -9,22 +27,92 @@ class BetterEmbed(discord.Embed):
         fields: Union[None, list[list[str]]] = None,
         footer: Union[None, str] = None,
         inline_fields: bool = True,
+        truncate: bool = False,
         **kwargs,
     ):
         """Extends the discord.Embed class with more functionality.
 
+        The size of the fields is kept track of as they are added, so checking if the
+        embed is within Discord's limits doesn't need to look at every field.
+
         Args:
             fields: A list of pairs of strings, the name and text of each field.
             footer: The footer.
             inline_fields: Whether or not to inline all of the fields.
+            truncate: Whether to truncate the embed to fit within Discord's limits
+                once it has been built.
 
         """
+        self._fields_size = 0
+        self._oversized_fields = 0
         super().__init__(**kwargs)
         if fields is not None:
             for field in fields:
                 self.add_field(name=field[0], value=field[1], inline=inline_fields)
         if footer is not None:
             self.set_footer(text=footer)
+        if truncate:
+            self.truncate_to_fit()
+
+    @classmethod
+    def from_dict(cls, data: Mapping[str, Any]):
+        # This bypasses __init__, so the fields need counting.
+        embed = super(BetterEmbed, cls).from_dict(data)
+        embed._count_fields()
+        return embed
+
+    def _count_fields(self) -> None:
+        self._fields_size = 0
+        self._oversized_fields = 0
+        for field in getattr(self, "_fields", []):
+            self._count_field(field)
+
+    def _count_field(self, field: dict) -> None:
+        name_length, value_length = len(field["name"]), len(field["value"])
+        self._fields_size += name_length + value_length
+        if name_length > _MAX_FIELD_NAME or value_length > _MAX_FIELD_VALUE:
+            self._oversized_fields += 1
+
+    def add_field(self, *, name: Any, value: Any, inline: bool = True):
+        super().add_field(name=name, value=value, inline=inline)
+        self._count_field(self._fields[-1])
+        return self
+
+    # Changing fields other than by adding them is rare, so just count them again.
+
+    def insert_field_at(self, index: int, *, name: Any, value: Any, inline=True):
+        super().insert_field_at(index, name=name, value=value, inline=inline)
+        self._count_fields()
+        return self
+
+    def set_field_at(self, index: int, *, name: Any, value: Any, inline=True):
+        super().set_field_at(index, name=name, value=value, inline=inline)
+        self._count_fields()
+        return self
+
+    def remove_field(self, index: int):
+        super().remove_field(index)
+        self._count_fields()
+        return self
+
+    def clear_fields(self):
+        super().clear_fields()
+        self._count_fields()
+        return self
+
+    def _text_parts(self) -> list[tuple[str, int]]:
+        """The text outside of the fields that counts towards the size of the embed,
+        and the limit for each."""
+        parts = []
+        if self.title:
+            parts.append((self.title, _MAX_TITLE))
+        if self.description:
+            parts.append((self.description, _MAX_DESCRIPTION))
+        if self.author.name:
+            parts.append((self.author.name, _MAX_AUTHOR))
+        if self.footer.text:
+            parts.append((self.footer.text, _MAX_FOOTER))
+        return parts
 
     def size_ok(self) -> bool:
         """Determines if an embed is within the size limits for discord.
@@ -35,38 +123,63 @@ class BetterEmbed(discord.Embed):
             True if it is within size limits, otherwise False.
 
         """
-        if len(self.fields) > 25:
+        if len(getattr(self, "_fields", [])) > _MAX_FIELDS or self._oversized_fields:
             return False
 
-        total_len = 0
-        comparisons = []
-
-        if self.title is not None:
-            comparisons.append([len(self.title), 256])  # type: ignore
-
-        if self.description is not None:
-            comparisons.append([len(self.description), 2048])  # type: ignore
-
-        if self.author.name is not None:
-            comparisons.append([len(self.author.name), 256])  # type: ignore
+        total_len = self._fields_size
+        for text, limit in self._text_parts():
+            if len(text) > limit:
+                return False
+            total_len += len(text)
 
-        if self.footer is not None:
-            comparisons.append([len(self.footer), 2048])  # type: ignore
+        return total_len <= _MAX_TOTAL
 
-        for length, limit in comparisons:
-            if length > limit:
-                return False
-            total_len += length
+    def truncate_to_fit(self) -> bool:
+        """Shorten the embed until it is within the size limits for discord.
 
-        for field in self.fields:
-            name_length = len(field.name)  # type: ignore
-            value_length = len(field.value)  # type: ignore
-            if name_length > 256 or value_length > 1024:
-                return False
+        Each part is cut down to its own limit first. If the embed is still too large
+        the description is shortened, then fields are removed from the end.
 
-            total_len += name_length + value_length
+        Returns:
+            True if anything was truncated, otherwise False.
 
-        if total_len > 6000:
+        """
+        if self.size_ok():
             return False
 
+        if self.title:
+            self.title = _truncate(self.title, _MAX_TITLE)
+        if self.description:
+            self.description = _truncate(self.description, _MAX_DESCRIPTION)
+        # New dicts, as these may be shared with a copy of this embed.
+        if self.author.name:
+            self._author = {
+                **self._author,
+                "name": _truncate(self.author.name, _MAX_AUTHOR),
+            }
+        if self.footer.text:
+            self._footer = {
+                **self._footer,
+                "text": _truncate(self.footer.text, _MAX_FOOTER),
+            }
+        self._fields = [
+            {
+                **field,
+                "name": _truncate(field["name"], _MAX_FIELD_NAME),
+                "value": _truncate(field["value"], _MAX_FIELD_VALUE),
+            }
+            for field in getattr(self, "_fields", [])[:_MAX_FIELDS]
+        ]
+        self._count_fields()
+
+        over = self._fields_size + sum(len(t) for t, _ in self._text_parts())
+        over -= _MAX_TOTAL
+        if over > 0 and self.description:
+            self.description = _truncate(
+                self.description, max(len(self.description) - over, 0)
+            )
+        while not self.size_ok() and self._fields:
+            self._fields.pop()
+            self._count_fields()
+
         return True
@@ -0,0 +1,79 @@
+from collections import OrderedDict
+from typing import Callable
+
+from discord.types.embed import Embed as EmbedData
+
+from .. import config, telemetry
+from .better_embed import BetterEmbed
+from .create import (
+    create_launch_embed,
+    create_schedule_embed,
+    launch_embed_key,
+    schedule_embed_key,
+)
+
+
+class _RenderedEmbedCache:  # pylint: disable=too-few-public-methods
+    """Embeds built from launch dicts, kept until the launch they show changes.
+
+    One embed is kept per launch id, along with the key it was built from. It is
+    only rebuilt when that key changes, and the least recently used launches are
+    evicted once max_size launches are cached.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        create: Callable[[dict], BetterEmbed],
+        key: Callable[[dict], tuple],
+        max_size: int,
+    ):
+        self._build_seconds = telemetry.EMBED_BUILD_SECONDS.labels(name)
+        self._create = create
+        self._key = key
+        self._max_size = max_size
+        self._entries: OrderedDict[str, tuple[tuple, BetterEmbed, EmbedData]] = (
+            OrderedDict()
+        )
+
+    def get(self, launch_info: dict) -> tuple[BetterEmbed, EmbedData]:
+        launch_id = launch_info["id"]
+        key = self._key(launch_info)
+
+        cached = self._entries.get(launch_id)
+        if cached is None or cached[0] != key:
+            with self._build_seconds.time():
+                embed = self._create(launch_info)
+            cached = (key, embed, embed.to_dict())
+            self._entries[launch_id] = cached
+
+        self._entries.move_to_end(launch_id)
+        while len(self._entries) > self._max_size:
+            self._entries.popitem(last=False)
+        return cached[1], cached[2]
+
+
+# Enough to hold every launch that ll2 keeps in memory.
+_SCHEDULE_EMBEDS = _RenderedEmbedCache(
+    "schedule", create_schedule_embed, schedule_embed_key, config.LL2_UPCOMING_WINDOW
+)
+_LAUNCH_EMBEDS = _RenderedEmbedCache(
+    "launch", create_launch_embed, launch_embed_key, config.LL2_UPCOMING_WINDOW
+)
+
+
+def cached_schedule_embed(launch_info: dict) -> tuple[BetterEmbed, EmbedData]:
+    """Get the schedule embed for a launch, and its dict form, building it if needed.
+
+    The returned objects are shared with other callers, so must not be modified,
+    use copy() on the embed first if it needs changing.
+    """
+    return _SCHEDULE_EMBEDS.get(launch_info)
+
+
+def cached_launch_embed(launch_info: dict) -> tuple[BetterEmbed, EmbedData]:
+    """Get the launch embed for a launch, and its dict form, building it if needed.
+
+    The returned objects are shared with other callers, so must not be modified.
+    """
+    return _LAUNCH_EMBEDS.get(launch_info)
@@ -85,6 +85,7 @@ def create_schedule_embed(launch_info: dict) -> BetterEmbed:
         description=launch_info["mission"]["description"] or "",
         title=f'Launch #{launch_info["agency_launch_attempt_count"]} - {launch_info["mission"]["name"]}',
         fields=fields,
+        truncate=True,
     )
 
     # if (reddit_url := launch_info["links"]["reddit"]["campaign"]) is not None:
@@ -105,6 +106,25 @@ def create_schedule_embed(launch_info: dict) -> BetterEmbed:
     return schedule_embed
 
 
+def schedule_embed_key(launch_info: dict) -> tuple:
+    """Get the parts of launch_info that create_schedule_embed uses.
+
+    If this is the same for two launch dicts, so is their schedule embed.
+    """
+    return (
+        launch_info["net"],
+        launch_info["rocket"]["configuration"]["full_name"],
+        launch_info["rocket"]["configuration"]["name"],
+        launch_info["status"]["name"],
+        launch_info["pad"]["name"],
+        launch_info["mission"]["name"],
+        launch_info["mission"]["type"],
+        launch_info["mission"]["orbit"]["name"],
+        launch_info["mission"]["description"],
+        launch_info["agency_launch_attempt_count"],
+    )
+
+
 def create_launch_embed(launch_info: dict) -> BetterEmbed:
     """Create a launch embed from a dict of launch information.
 
@@ -132,6 +152,7 @@ def create_launch_embed(launch_info: dict) -> BetterEmbed:
         description=embed_desc,
         color=colours.RED_FALCON,
         fields=[["Launch date (UTC)", launch_date_str]],
+        truncate=True,
     )
 
     # if (patch_url := launch_info["links"]["patch"]["small"]) is not None:
@@ -144,6 +165,18 @@ def create_launch_embed(launch_info: dict) -> BetterEmbed:
     return launch_embed
 
 
+def launch_embed_key(launch_info: dict) -> tuple:
+    """Get the parts of launch_info that create_launch_embed uses.
+
+    If this is the same for two launch dicts, so is their launch embed.
+    """
+    return (
+        launch_info["name"],
+        launch_info["net"],
+        launch_info["rocket"]["configuration"]["name"],
+    )
+
+
 def create_info_embed(
     guild_count: int,
     guild_count_diff: int,
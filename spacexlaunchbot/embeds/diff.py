@@ -1,56 +1,89 @@
+from dataclasses import dataclass
+from typing import Any, cast
+
 from discord.types.embed import Embed as EmbedData
 
+# Top level parts of an embed that are compared, fields are compared separately.
+_COMPARED_PARTS = ("title", "description", "thumbnail", "image")
+
+
+@dataclass(frozen=True)
+class ScheduleChanges:
+    """The differences between 2 schedule embeds, by part or field name.
+
+    Fields are identified by their name, if an embed has more than one field with the
+    same name (e.g. "Core Info" for each core of a Falcon Heavy) the later ones are
+    numbered, e.g. "Core Info 2".
+    """
+
+    changed: tuple[str, ...] = ()
+    added: tuple[str, ...] = ()
+    removed: tuple[str, ...] = ()
+
+    def __bool__(self) -> bool:
+        return bool(self.changed or self.added or self.removed)
+
+    def summary(self) -> str:
+        """A short description of the changes, for use in an embed footer."""
+        names = self.changed + self.added + self.removed
+        if len(names) == 0:
+            return ""
+        if len(names) == 1:
+            return f"Changed: {names[0]}"
+        return f"Changed: {names[0]} + {len(names) - 1} more"
 
-def diff_schedule_embed_dicts(old_embed: dict, new_embed: EmbedData) -> str:
-    """Takes 2 schedule embed dicts and returns a string containing the differences"""
-    diffs = []
 
-    # old_embed can be empty if we have reset it, new_embed will always have a title.
-    if old_embed.get("title", "") != new_embed["title"]:
-        diffs += ["title"]
+# Shared as it can't be changed, and is returned for most diffs.
+_NO_CHANGES = ScheduleChanges()
 
-    if old_embed.get("description", "") != new_embed.get("description", ""):
-        diffs += ["description"]
 
-    if old_embed.get("thumbnail", None) != new_embed.get("thumbnail", None):
-        diffs += ["thumbnail"]
+def _compared_parts(embed: dict) -> dict[str, Any]:
+    """Get the name and value of each compared part of an embed, in order."""
+    parts = {}
+    for part in _COMPARED_PARTS:
+        # Missing and empty are treated the same, e.g. a description of "".
+        if value := embed.get(part):
+            parts[part] = value
 
-    if old_embed.get("image", None) != new_embed.get("image", None):
-        diffs += ["image"]
+    for field in embed.get("fields", ()):
+        name = key = field["name"]
+        count = 1
+        while key in parts:
+            count += 1
+            key = f"{name} {count}"
+        parts[key] = field["value"]
 
-    # Dict of name:value for old_embed fields.
-    old_embed_fields = {
-        field["name"]: field["value"] for field in old_embed.get("fields", [])
-    }
+    return parts
 
-    new_embed_fields = new_embed.get("fields", [])
 
-    # FIXME: Quick hack to get launch vehicle.
-    launch_vehicle = ""
-    for field in new_embed_fields:
-        if field["name"] == "Launch Vehicle":
-            launch_vehicle = field["value"]
+def diff_schedule_embed_dicts(old_embed: dict, new_embed: EmbedData) -> ScheduleChanges:
+    """Takes 2 schedule embed dicts and returns the differences between them.
 
-    # This detects all field changes except if old_embed has a field that new_embed
-    # does not (e.g. a payload was removed). Not going to worry about this for now as
-    # it's unlikely to happen.
-    # TODO: Detect field removals.
-    for field in new_embed_fields:
-        name = field["name"]
+    old_embed can be empty (e.g. if it has been reset), in which case everything in
+    new_embed is added.
+    """
+    new_dict = cast(dict, new_embed)
+    # Most of the time nothing has changed, which can be checked without building
+    # the parts of each embed.
+    for part in _COMPARED_PARTS:
+        if (old_embed.get(part) or None) != (new_dict.get(part) or None):
+            break
+    else:
+        if old_embed.get("fields") == new_dict.get("fields"):
+            return _NO_CHANGES
 
-        # FIXME: We have to skip Core Info for Falcon Heavys as they have 3 Core Info
-        #  fields all with the same name, which breaks this comparison that we're doing.
-        if launch_vehicle == "Falcon Heavy rocket" and field["name"] == "Core Info":
-            continue
+    old_parts = _compared_parts(old_embed)
+    new_parts = _compared_parts(new_dict)
+    if old_parts == new_parts:
+        return _NO_CHANGES
 
-        if name in old_embed_fields:
-            if old_embed_fields[name] != field["value"]:
-                diffs += [name]
-        else:
-            diffs += [name]
+    changed = []
+    added = []
+    for name, new_value in new_parts.items():
+        if name not in old_parts:
+            added.append(name)
+        elif old_parts.pop(name) != new_value:
+            changed.append(name)
 
-    if len(diffs) == 0:
-        return ""
-    if len(diffs) == 1:
-        return f"Changed: {diffs[0]}"
-    return f"Changed: {diffs[0]} + {len(diffs) - 1} more"
+    # Anything left only existed in the old embed.
+    return ScheduleChanges(tuple(changed), tuple(added), tuple(old_parts))
@@ -16,12 +16,11 @@ HELP_EMBED = BetterEmbed(
         ],
         [
             "launch [launch number]",
-            "Currently disabled due to new API rate limits",
-            # "Send the launch schedule message for the gi,ven launch number to the current channel",
+            "Send the launch schedule message for the given launch number (1 being the next launch) to the current channel",
         ],
         [
-            "add [type] [mentions]",
-            "Add the current channel to the notification service with the given notification type (`all`, `schedule`, or `launch`). If you chose `all` or `launch`, the second part can be a list of roles / channels / users to ping when a launch notification is sent\n*Only admins can use this command*",
+            "add [type] [mentions] [reminders] [webhook]",
+            "Add the current channel to the notification service with the given notification type (`all`, `schedule`, or `launch`). If you chose `all` or `launch`, the second part can be a list of roles / channels / users to ping when a launch notification is sent, and the third part can be a list of times before launch to send it, such as `24h, 1h, 10m` (the default is 30m). Set webhook to send notifications through a webhook in the channel, this needs the Manage Webhooks permission\n*Only admins can use this command*",
         ],
         [
             "remove",
@@ -0,0 +1,105 @@
+"""Concurrent delivery of a single notification to many channels."""
+
+import asyncio
+import logging
+import math
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Iterable, TypeVar
+
+from .utils import TokenBucket
+
+T = TypeVar("T")
+
+
+@dataclass
+class FanoutStats:
+    """Throughput and latency figures for one fan-out run."""
+
+    delivered: int = 0
+    failed: int = 0
+    elapsed: float = 0.0
+    # Seconds taken by each call to the deliver function.
+    latencies: list[float] = field(default_factory=list)
+
+    @property
+    def throughput(self) -> float:
+        """Deliveries (successful or not) per second."""
+        if self.elapsed == 0:
+            return 0.0
+        return (self.delivered + self.failed) / self.elapsed
+
+    def percentile(self, pct: float) -> float:
+        """Nearest-rank percentile of the delivery latencies, in seconds."""
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        rank = max(1, math.ceil(pct / 100 * len(ordered)))
+        return ordered[rank - 1]
+
+    def __str__(self) -> str:
+        return (
+            f"{self.delivered} delivered, {self.failed} failed in "
+            f"{self.elapsed:.2f}s ({self.throughput:.1f}/s), latency "
+            f"p50={self.percentile(50) * 1000:.0f}ms "
+            f"p95={self.percentile(95) * 1000:.0f}ms "
+            f"p99={self.percentile(99) * 1000:.0f}ms "
+            f"max={self.percentile(100) * 1000:.0f}ms"
+        )
+
+
+class Fanout:
+    """Delivers to many targets at once without going over Discord's rate limits.
+
+    Targets are handed to a fixed pool of workers, so at most `concurrency`
+    deliveries are in flight. Each target is handled start to finish by one worker,
+    so requests to the same channel (one per-route bucket) never overlap. Every
+    request should call `throttle` first, which paces the whole fan-out to Discord's
+    global limit instead of waiting to be told off with a 429.
+    """
+
+    def __init__(self, concurrency: int, global_rate_limit: float):
+        self.concurrency = concurrency
+        self._global_bucket = TokenBucket(global_rate_limit, global_rate_limit)
+
+    async def throttle(self) -> None:
+        """Wait for room under the global rate limit before making a request."""
+        await self._global_bucket.acquire()
+
+    async def run(
+        self, targets: Iterable[T], deliver: Callable[[T], Awaitable[bool]]
+    ) -> FanoutStats:
+        """Call deliver for every target, returning stats for the run.
+
+        Args:
+            targets: The things to deliver to, e.g. channels.
+            deliver: Sends to one target, returns True if it was delivered.
+
+        Returns:
+            A FanoutStats object.
+
+        """
+        stats = FanoutStats()
+        # Workers share one iterator, nothing awaits between the next() calls so each
+        # target is only taken once.
+        remaining = iter(targets)
+
+        async def worker() -> None:
+            for target in remaining:
+                start = time.perf_counter()
+                try:
+                    delivered = await deliver(target)
+                except Exception:  # pylint: disable=broad-exception-caught
+                    # One bad channel shouldn't stop the rest of the fan-out.
+                    logging.exception("Unexpected error during delivery")
+                    delivered = False
+                stats.latencies.append(time.perf_counter() - start)
+                if delivered:
+                    stats.delivered += 1
+                else:
+                    stats.failed += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+        stats.elapsed = time.perf_counter() - start
+        return stats
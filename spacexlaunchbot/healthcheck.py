@@ -0,0 +1,53 @@
+"""Serves the bot's health and Prometheus metrics over HTTP, on one port.
+
+GET /health is answered with a 200 if the bot is healthy and a 503 if not, which is
+what the Dockerfile's HEALTHCHECK uses. GET /metrics is answered with the metrics
+from telemetry.
+"""
+
+import discord
+from aiohttp import web
+
+from . import config, telemetry
+
+_METRICS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _healthy(client: discord.Client) -> bool:
+    return not (
+        client.latency > config.HEALTHCHECK_MAX_LATENCY
+        or client.user is None  # Not logged in
+        or not client.is_ready()  # Client's internal cache not ready
+        or client.is_closed()  # The websocket connection is closed
+    )
+
+
+def create_app(client: discord.Client) -> web.Application:
+    """Create the application that serves the given client's health and metrics."""
+
+    # pylint: disable-next=unused-argument
+    async def health(request: web.Request) -> web.Response:
+        if _healthy(client):
+            return web.Response(text="healthy\n")
+        return web.Response(status=503, text="unhealthy\n")
+
+    # pylint: disable-next=unused-argument
+    async def metrics(request: web.Request) -> web.Response:
+        return web.Response(
+            body=telemetry.REGISTRY.render().encode(),
+            headers={"Content-Type": _METRICS_CONTENT_TYPE},
+        )
+
+    app = web.Application()
+    app.router.add_get("/health", health)
+    app.router.add_get("/metrics", metrics)
+    return app
+
+
+async def start(client: discord.Client) -> web.AppRunner:
+    """Start the server, it is stopped by cleaning up the returned runner."""
+    # Not logged, as Prometheus and the Docker healthcheck request it constantly.
+    runner = web.AppRunner(create_app(client), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, config.HEALTHCHECK_HOST, config.HEALTHCHECK_PORT).start()
+    return runner
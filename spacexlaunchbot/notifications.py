@@ -1,11 +1,30 @@
+import asyncio
 import datetime
+import json
 import logging
+import time
 from enum import Enum
+from typing import TYPE_CHECKING, Collection, Dict, Union
+
+import discord
 
 from . import config, embeds
 from .apis import ll2
+from .utils import TimerWheel
+
+if TYPE_CHECKING:
+    from .storage import SubscriptionOptions
+
+# Seconds, how precisely reminders are sent.
+_REMINDER_TICK = 1
 
-_LAUNCHING_SOON_DELTA = datetime.timedelta(minutes=config.NOTIF_TASK_LAUNCH_DELTA)
+_MIN_INTERVAL = 60 * config.NOTIF_TASK_MIN_INTERVAL
+_MAX_INTERVAL = 60 * config.NOTIF_TASK_MAX_INTERVAL
+
+# The wait between checks is the time until launch divided by this. With the defaults
+# that is about 15 checks in the hour before launch, paid for by the LL2 budget saved
+# up while the launch was further off.
+_INTERVAL_DIVISOR = 6
 
 
 class NotificationType(Enum):
@@ -19,7 +38,331 @@ class NotificationType(Enum):
     launch = 2
 
 
-async def check_and_send_notifications(client) -> None:
+def notification_payload(
+    to_send: Union[str, discord.Embed], channel_ids: Collection[int] | None = None
+) -> dict:
+    """Turn a notification into a dict that can be stored or published as JSON.
+
+    Args:
+        to_send: A string or discord.Embed object.
+        channel_ids: If given, the only channels it should be sent to, such as the
+            channels a launch reminder is for. See notification_channels.
+
+    """
+    payload: dict = (
+        {"embed": to_send.to_dict()}
+        if isinstance(to_send, discord.Embed)
+        else {"content": to_send}
+    )
+    if channel_ids is not None:
+        payload["channels"] = sorted(channel_ids)
+    return payload
+
+
+def notification_from_payload(payload: dict) -> Union[str, discord.Embed]:
+    """The reverse of notification_payload."""
+    if "embed" in payload:
+        return embeds.BetterEmbed.from_dict(payload["embed"])
+    return payload["content"]
+
+
+def notification_channels(payload: dict) -> set[int] | None:
+    """The channels a notification is only for, or None if it is for every channel."""
+    if "channels" not in payload:
+        return None
+    return set(payload["channels"])
+
+
+def _dumps(obj) -> bytes:
+    # Compact, like discord.py serializes requests.
+    return json.dumps(obj, separators=(",", ":")).encode()
+
+
+class PreparedMessage:  # pylint: disable=too-few-public-methods
+    """A notification serialized to a request body once, for sending to many channels.
+
+    The embed is only serialized when this is created. A body is made for each
+    different set of mentions by splicing them in, and is reused for every channel
+    with those mentions (for most notifications, every channel has none).
+
+    Args:
+        to_send: A string or discord.Embed object.
+    """
+
+    def __init__(self, to_send: Union[str, discord.Embed]):
+        self.to_send = to_send
+        self._embeds = (
+            b'"embeds":[' + _dumps(to_send.to_dict()) + b"]"
+            if isinstance(to_send, discord.Embed)
+            else None
+        )
+        # Request bodies by mentions.
+        self._bodies: dict[str, bytes] = {}
+
+    def body(
+        self, mentions: str, allowed_mentions: Union[discord.AllowedMentions, None]
+    ) -> bytes:
+        """Get the JSON request body for sending the message with some mentions.
+
+        Args:
+            mentions: Mentions to send in the same message, empty for none.
+            allowed_mentions: Which of the mentions are allowed to notify anyone, must
+                be the same whenever the mentions are.
+
+        Returns:
+            The body of a request to create a message or execute a webhook.
+
+        """
+        if (body := self._bodies.get(mentions)) is not None:
+            return body
+        fields = [] if self._embeds is None else [self._embeds]
+        if isinstance(self.to_send, str):
+            content = f"{self.to_send}\n{mentions}" if mentions else self.to_send
+            fields.append(b'"content":' + _dumps(content))
+        elif mentions:
+            fields.append(b'"content":' + _dumps(mentions))
+        if mentions and allowed_mentions is not None:
+            fields.append(b'"allowed_mentions":' + _dumps(allowed_mentions.to_dict()))
+        body = self._bodies[mentions] = b"{" + b",".join(fields) + b"}"
+        return body
+
+
+def _launch_timestamp(launch_dict: Dict) -> int:
+    """Get the launch time as a unix timestamp, or 0 if it doesn't have one."""
+    try:
+        # launch_timestamp = int(next_launch_dict["date_unix"])
+        return int(datetime.datetime.fromisoformat(launch_dict["net"]).timestamp())
+    except ValueError:
+        return 0
+
+
+def poll_interval(next_launch_dict: Dict) -> float:
+    """How many seconds to wait before checking for notifications again.
+
+    Checks rarely while the next launch is far off and more often as it gets closer,
+    but never before the budget in apis.ll2 has a request for the check to use.
+
+    Args:
+        next_launch_dict: The launch information dictionary for the next launch.
+
+    Returns:
+        A number of seconds between NOTIF_TASK_MIN_INTERVAL and
+        NOTIF_TASK_MAX_INTERVAL minutes.
+
+    """
+    interval: float
+    if next_launch_dict == {}:
+        # The request failed, try again soon.
+        interval = _MIN_INTERVAL
+    elif (launch_timestamp := _launch_timestamp(next_launch_dict)) == 0:
+        interval = _MAX_INTERVAL
+    else:
+        # Once the launch time has passed this is negative, as it could be launching,
+        # delayed, or replaced by the next launch at any moment, so check often.
+        until_launch = launch_timestamp - time.time()
+        interval = min(
+            max(until_launch / _INTERVAL_DIVISOR, _MIN_INTERVAL), _MAX_INTERVAL
+        )
+
+    # Polling any sooner would only find the launches from last time.
+    return max(interval, ll2.request_wait())
+
+
+def parse_reminder_offsets(text: str) -> tuple[int, ...]:
+    """Parse a list of times before launch, such as "24h, 1h, 10m".
+
+    Args:
+        text: Comma or space separated times, each a number of minutes with an
+            optional "m" suffix, or of hours with an "h" suffix.
+
+    Returns:
+        The times in minutes, largest first without duplicates.
+
+    Raises:
+        ValueError: If a time is invalid or out of range, or there are too many.
+
+    """
+    offsets = set()
+    for part in text.replace(",", " ").lower().split():
+        if part.endswith("h"):
+            offsets.add(int(part[:-1]) * 60)
+        else:
+            offsets.add(int(part.removesuffix("m")))
+    if not offsets or len(offsets) > config.NOTIF_MAX_REMINDERS:
+        raise ValueError(f"Must give 1 to {config.NOTIF_MAX_REMINDERS} times")
+    if not all(0 < offset <= config.NOTIF_MAX_REMINDER_OFFSET for offset in offsets):
+        raise ValueError("Times must be in the week before launch")
+    return tuple(sorted(offsets, reverse=True))
+
+
+class ReminderScheduler:
+    """Sends launch notifications at each subscription's reminder offsets.
+
+    Armed by check_and_send_notifications when it sees a launch that is go for
+    launch, and re-armed or cancelled by later checks if the launch moves. There is
+    a timer for every channel and offset, held in a TimerWheel so that arming them
+    all again when the launch slips is cheap. Timers that expire together are sent
+    as one notification per offset, to only the channels whose timers they were.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self._wheel = TimerWheel(time.time(), tick=_REMINDER_TICK)
+        self._armed_for: tuple[str, int] | None = None
+        self._armed_keys: set[tuple[int, int]] = set()
+        # Reminders already sent for the launch we are armed for.
+        self._fired: set[tuple[int, int]] = set()
+        self._task: asyncio.Task | None = None
+        # Held while reading and then saving the notification task state, so that
+        # the check and the reminders don't lose each other's changes.
+        self.state_lock = asyncio.Lock()
+
+    def arm(
+        self,
+        launch_id: str,
+        launch_timestamp: int,
+        subscriptions: dict[int, "SubscriptionOptions"],
+        catch_up: bool,
+    ) -> None:
+        """Set a timer for each subscription's reminders for the given launch.
+
+        Existing timers are kept if they are still right, so this can be called
+        after every check.
+
+        Args:
+            launch_id: The LL2 id of the launch.
+            launch_timestamp: The launch time as a unix timestamp.
+            subscriptions: The channels subscribed to launch notifications.
+            catch_up: Whether to send the latest reminder that is already due, for
+                when no reminder has been sent for this launch yet.
+
+        """
+        if self._armed_for != (launch_id, launch_timestamp):
+            self.cancel()
+            self._armed_for = (launch_id, launch_timestamp)
+
+        now = time.time()
+        # Catch up on the ticks since the wheel was last used.
+        if expired := self._wheel.advance(now):
+            self._fire(expired)
+        wanted = set()
+        due = []
+        for channel_id, options in subscriptions.items():
+            for offset in options.reminder_offsets:
+                key = (channel_id, offset)
+                if key in self._fired:
+                    continue
+                if key in self._wheel:
+                    # Armed by an earlier call for the same launch time.
+                    wanted.add(key)
+                    continue
+                when = launch_timestamp - 60 * offset
+                if when <= now:
+                    due.append(key)
+                    continue
+                wanted.add(key)
+                self._wheel.schedule(key, when, (channel_id, offset, when))
+
+        # Only each channel's reminder nearest to launch is caught up, the others
+        # are stale.
+        if catch_up and due:
+            latest: dict[int, int] = {}
+            for channel_id, offset in due:
+                latest[channel_id] = min(offset, latest.get(channel_id, offset))
+            for channel_id, offset in latest.items():
+                wanted.add((channel_id, offset))
+                self._wheel.schedule(
+                    (channel_id, offset), now, (channel_id, offset, now)
+                )
+
+        # Channels that have unsubscribed or changed their reminders.
+        for key in self._armed_keys - wanted:
+            self._wheel.cancel(key)
+        self._armed_keys = wanted
+
+        logging.info(
+            f"Reminders armed for launch {launch_id}: {len(self._wheel)} timers"
+        )
+        # Restarted, as it may be sleeping until a later timer than one just added.
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if len(self._wheel):
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def cancel(self) -> None:
+        if self._armed_for is None:
+            return
+        logging.info(f"Reminders for launch {self._armed_for[0]} cancelled")
+        self._wheel.clear()
+        self._armed_keys = set()
+        self._fired.clear()
+        self._armed_for = None
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self) -> None:
+        while len(self._wheel):
+            # Only wakes when there is something to do, which for a launch days away
+            # is a few times a day until the reminders are close.
+            await asyncio.sleep(max(self._wheel.next_due_at - time.time(), 0))
+            if expired := self._wheel.advance(time.time()):
+                self._fire(expired)
+        self._task = None
+
+    def _fire(self, expired: list[tuple[int, int, float]]) -> None:
+        assert self._armed_for is not None
+        launch_id, launch_timestamp = self._armed_for
+        now = time.time()
+        error = max(now - when for _, _, when in expired)
+        logging.info(
+            f"{len(expired)} reminder timers fired, scheduling error "
+            f"{error * 1000:+.1f}ms"
+        )
+        channels_by_offset: dict[int, set[int]] = {}
+        for channel_id, offset, _ in expired:
+            self._fired.add((channel_id, offset))
+            self._armed_keys.discard((channel_id, offset))
+            channels_by_offset.setdefault(offset, set()).add(channel_id)
+        for offset in sorted(channels_by_offset, reverse=True):
+            self.client.run_in_background(
+                self._send(
+                    launch_id, launch_timestamp, offset, channels_by_offset[offset]
+                )
+            )
+
+    async def _send(
+        self,
+        launch_id: str,
+        launch_timestamp: int,
+        offset: int,
+        channel_ids: set[int],
+    ) -> None:
+        # Usually answered from the launches the last check got, without a request.
+        launch_dict = await ll2.get_launch_dict(launch_id)
+        if (
+            launch_dict == {}
+            or launch_dict["status"]["id"] != 1
+            or _launch_timestamp(launch_dict) != launch_timestamp
+        ):
+            logging.info(f"Launch {launch_id} changed since the reminder was armed")
+            return
+        async with self.state_lock:
+            _, schedule_embed_dict = await self.client.ds.get_notification_task_vars()
+            # So that reminders already due aren't caught up again after a restart.
+            await self.client.ds.set_notification_task_vars(True, schedule_embed_dict)
+        logging.info(
+            f"Sending T-{offset}m notifications for launch @ timestamp "
+            f"{launch_timestamp} to {len(channel_ids)} channels"
+        )
+        launch_embed, _ = embeds.cached_launch_embed(launch_dict)
+        await self.client.send_notification(
+            launch_embed, NotificationType.launch, channel_ids=channel_ids
+        )
+
+
+async def check_and_send_notifications(client) -> float:
     """Checks what notification messages need to be sent, and sends them.
 
     Updates database values if they need updating.
@@ -27,23 +370,24 @@ async def check_and_send_notifications(client) -> None:
     Args:
         client: The Discord client to use to send messages.
 
+    Returns:
+        How many seconds to wait before checking again, see poll_interval.
+
     """
-    next_launch_dict = await ll2.get_launch_dict()
+    # Only the notification loop asks for launches this fresh.
+    next_launch_dict = await ll2.get_launch_dict(max_age=_MIN_INTERVAL)
     if next_launch_dict == {}:
-        return
+        return poll_interval(next_launch_dict)
 
-    (
-        launch_embed_for_current_schedule_sent,
-        previous_schedule_embed_dict,
-    ) = client.ds.get_notification_task_vars()
+    _, previous_schedule_embed_dict = await client.ds.get_notification_task_vars()
 
     #
     # Schedule Notification
     #
 
-    schedule_embed = embeds.create_schedule_embed(next_launch_dict)
-    diff_str = embeds.diff_schedule_embed_dicts(
-        previous_schedule_embed_dict, schedule_embed.to_dict()
+    schedule_embed, schedule_embed_dict = embeds.cached_schedule_embed(next_launch_dict)
+    changes = embeds.diff_schedule_embed_dicts(
+        previous_schedule_embed_dict, schedule_embed_dict
     )
 
     before_flight = not next_launch_dict["status"]["name"] in [
@@ -51,46 +395,50 @@ async def check_and_send_notifications(client) -> None:
         "Launch Successful",
     ]
 
-    if before_flight and diff_str != "":
-        logging.info(f"Sending notifications for launch schedule, diff: {diff_str}")
-        schedule_embed.set_footer(text=diff_str)
+    schedule_changed = before_flight and bool(changes)
+    if schedule_changed:
+        logging.info(f"Sending notifications for launch schedule, diff: {changes}")
+        # Copied as the cached embed is shared.
+        schedule_embed = schedule_embed.copy()
+        schedule_embed.set_footer(text=changes.summary())
         await client.send_notification(schedule_embed, NotificationType.schedule)
-        launch_embed_for_current_schedule_sent = False
 
     #
-    # Launch Notification
+    # Save data
     #
 
-    try:
-        # launch_timestamp = int(next_launch_dict["date_unix"])
-        launch_timestamp = int(
-            datetime.datetime.fromisoformat(next_launch_dict["net"]).timestamp()
+    async with client.reminders.state_lock:
+        # Read after any awaits, as the launch timer may have sent its notification.
+        launch_embed_for_current_schedule_sent, _ = (
+            await client.ds.get_notification_task_vars()
+        )
+        if schedule_changed:
+            launch_embed_for_current_schedule_sent = False
+        await client.ds.set_notification_task_vars(
+            launch_embed_for_current_schedule_sent, schedule_embed_dict
         )
 
-    except ValueError:
-        # Doesn't have a date, don't trigger notifications
-        launch_timestamp = 0
+    #
+    # Launch Notification
+    #
 
-    current_time = datetime.datetime.utcnow()
-    current_time_plus_delta = (current_time + _LAUNCHING_SOON_DELTA).timestamp()
+    # If it doesn't have a date this is 0, which won't trigger notifications.
+    launch_timestamp = _launch_timestamp(next_launch_dict)
 
-    # If the launch time is within the next NOTIF_TASK_LAUNCH_DELTA, and if the
-    # launch_timestamp is not in the past, and we haven't already sent the notif,
-    # and the launch time precision is at the best.
+    # If the launch time is not in the past, and the launch time precision is at the
+    # best, the scheduler sends each subscription's reminders at the right time. Any
+    # already due are caught up if we haven't sent any for this schedule.
     if (
-        current_time_plus_delta >= launch_timestamp >= current_time.timestamp()
-        and launch_embed_for_current_schedule_sent is False
+        launch_timestamp >= time.time()
         and next_launch_dict["status"]["id"] == 1  # 1 is "Go for Launch"
     ):
-        logging.info(f"Sending notifications for launch @ timestamp {launch_timestamp}")
-        launch_embed_for_current_schedule_sent = True
-        launch_embed = embeds.create_launch_embed(next_launch_dict)
-        await client.send_notification(launch_embed, NotificationType.launch)
-
-    #
-    # Save data
-    #
+        client.reminders.arm(
+            next_launch_dict["id"],
+            launch_timestamp,
+            await client.ds.get_subbed_channels(NotificationType.launch),
+            catch_up=launch_embed_for_current_schedule_sent is False,
+        )
+    else:
+        client.reminders.cancel()
 
-    client.ds.set_notification_task_vars(
-        launch_embed_for_current_schedule_sent, schedule_embed.to_dict()
-    )
+    return poll_interval(next_launch_dict)
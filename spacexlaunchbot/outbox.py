@@ -0,0 +1,252 @@
+"""Durable delivery of notifications, so that they reach every channel.
+
+Before a notification is sent, it is added to the outbox along with a pending
+delivery to each channel. The fan-out's workers then send it, and each delivery is
+recorded as delivered, failed, or pending with a time to try it again. A loop drains
+the outbox every NOTIF_OUTBOX_INTERVAL seconds, sending the deliveries that are due,
+which includes any that were left pending when the bot last stopped.
+
+Channels subscribed with a webhook are sent to through it, without waiting for the
+fan-out's global rate limit. Deliveries retried from the outbox are sent as the bot.
+
+Delivery results are written in batches of NOTIF_OUTBOX_BATCH_SIZE, so if the bot
+stops before a batch is written those channels will be sent to again.
+"""
+
+import asyncio
+import logging
+import time
+from dataclasses import replace
+from typing import Awaitable, Callable, Sequence, Union
+
+import discord
+
+from . import config, telemetry
+from .fanout import FanoutStats
+from .notifications import (
+    NotificationType,
+    PreparedMessage,
+    notification_from_payload,
+    notification_payload,
+)
+from .storage import Delivery, DeliveryState
+from .utils import allowed_mentions
+
+# Sends a message to a channel, like SpaceXLaunchBotClient._send_s.
+SendFunction = Callable[..., Awaitable[DeliveryState]]
+
+
+def _after_attempt(delivery: Delivery, state: DeliveryState) -> Delivery:
+    """Update a delivery with the result of an attempt, scheduling any retry."""
+    attempts = delivery.attempts + 1
+    if state is DeliveryState.pending:
+        if attempts >= config.NOTIF_MAX_ATTEMPTS:
+            state = DeliveryState.failed
+        else:
+            delay = min(
+                config.NOTIF_RETRY_BASE_DELAY * 2 ** (attempts - 1),
+                config.NOTIF_RETRY_MAX_DELAY,
+            )
+            return replace(
+                delivery, attempts=attempts, next_attempt=time.time() + delay
+            )
+    return replace(delivery, state=state, attempts=attempts)
+
+
+class Outbox:
+    """Sends notifications through the outbox in the client's DataStore.
+
+    Args:
+        client: The Discord client, for its DataStore, fan-out, and channels.
+        send: Sends a message to a channel, returning the state of the delivery.
+    """
+
+    def __init__(self, client, send: SendFunction):
+        self.client = client
+        self._send = send
+        # Results waiting to be written.
+        self._results: list[Delivery] = []
+        # Notifications being delivered, which draining leaves alone.
+        self._in_flight: set[int] = set()
+        # Counts finished fan-outs, and when each notification's last one finished by
+        # that count. Draining uses them to tell if the deliveries it read may have
+        # been sent since.
+        self._finished = 0
+        self._finished_at: dict[int, int] = {}
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        """Start draining the outbox, must be called from inside the event loop."""
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop draining the outbox, and write any results that are waiting."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self._write_results()
+
+    async def deliver(
+        self,
+        to_send: Union[str, discord.Embed],
+        notification_type: NotificationType,
+        targets: Sequence[tuple],
+        notification_id: int | None = None,
+    ) -> FanoutStats:
+        """Add a notification to the outbox and deliver it to the given channels.
+
+        Args:
+            to_send: A string or discord.Embed object.
+            notification_type: The type of notification being sent.
+            targets: Pairs of channel and the SubscriptionOptions for it.
+            notification_id: The id of the notification if it is already in the
+                outbox, such as one published by the cluster leader.
+
+        Returns:
+            A FanoutStats object.
+
+        """
+        launch = notification_type == NotificationType.launch
+        channels = [
+            (channel.id, opts.guild_id, opts.launch_mentions if launch else "")
+            for channel, opts in targets
+        ]
+        try:
+            if notification_id is None:
+                notification_id = await self.client.ds.add_notification(
+                    notification_type, notification_payload(to_send), channels
+                )
+            else:
+                await self.client.ds.add_deliveries(notification_id, channels)
+        except Exception:  # pylint: disable=broad-exception-caught
+            # Better to send without being able to retry than to not send at all.
+            logging.exception("Failed to add notification to the outbox")
+            notification_id = None
+
+        deliveries = [
+            (
+                channel,
+                Delivery(notification_id or 0, *row),
+                opts.launch_allowed_mentions if launch else None,
+                opts.webhook,
+            )
+            for (channel, opts), row in zip(targets, channels)
+        ]
+        return await self._fan_out(notification_id, to_send, deliveries)
+
+    def _sent_since(self, notification_id: int, read_at: int) -> bool:
+        """If a notification may have been sent to since its deliveries were read."""
+        return (
+            notification_id in self._in_flight
+            or self._finished_at.get(notification_id, 0) > read_at
+        )
+
+    async def drain(self) -> int:
+        """Send the deliveries in the outbox that are due, returns how many.
+
+        Deliveries of notifications that are being sent, or have been since they
+        were read, are left for the next drain, as they may not be due any more.
+        """
+        created_after = time.time() - 60 * config.NOTIF_OUTBOX_MAX_AGE
+        read_at = self._finished
+        due: dict[int, list[tuple]] = {}
+        gone = []
+        for delivery in await self.client.ds.due_deliveries(created_after):
+            if not self.client.owns_guild(delivery.guild_id):
+                continue
+            if self._sent_since(delivery.notification_id, read_at):
+                continue
+            channel = self.client.get_channel(delivery.channel_id)
+            if channel is None:
+                gone.append(replace(delivery, state=DeliveryState.failed))
+                continue
+            due.setdefault(delivery.notification_id, []).append(
+                (channel, delivery, allowed_mentions(delivery.mentions), None)
+            )
+        await self.client.ds.update_deliveries(gone)
+
+        sent = 0
+        for notification_id, deliveries in due.items():
+            notification_type, payload = await self.client.ds.get_notification(
+                notification_id
+            )
+            if self._sent_since(notification_id, read_at):
+                continue
+            logging.info(
+                f"Sending {notification_type.name} notification {notification_id} "
+                f"from the outbox to {len(deliveries)} channels"
+            )
+            telemetry.OUTBOX_RESENDS.inc(len(deliveries))
+            stats = await self._fan_out(
+                notification_id, notification_from_payload(payload), deliveries
+            )
+            logging.info(
+                f"Sent notification {notification_id} from the outbox: {stats}"
+            )
+            sent += len(deliveries)
+
+        # Only needed by drains that read their deliveries before these finished.
+        self._finished_at = {
+            notification_id: finished
+            for notification_id, finished in self._finished_at.items()
+            if finished > read_at
+        }
+        return sent
+
+    async def _fan_out(
+        self,
+        notification_id: int | None,
+        to_send: Union[str, discord.Embed],
+        deliveries: list[tuple],
+    ) -> FanoutStats:
+        # Serialized once, rather than for every channel.
+        message = PreparedMessage(to_send)
+
+        async def deliver(target: tuple) -> bool:
+            channel, delivery, mentions_allowed, webhook = target
+            if webhook is None:
+                await self.client.fanout.throttle()
+            state = await self._send(
+                channel, message, delivery.mentions, mentions_allowed, webhook
+            )
+            if notification_id is not None:
+                await self._add_result(_after_attempt(delivery, state))
+            return state is DeliveryState.delivered
+
+        if notification_id is not None:
+            self._in_flight.add(notification_id)
+        try:
+            return await self.client.fanout.run(deliveries, deliver)
+        finally:
+            # Written even if cancelled, so a restart doesn't send them again. Only
+            # then can a drain send to them, or it could read them as still pending.
+            await self._write_results()
+            if notification_id is not None:
+                self._finished += 1
+                self._finished_at[notification_id] = self._finished
+                self._in_flight.discard(notification_id)
+
+    async def _add_result(self, delivery: Delivery) -> None:
+        self._results.append(delivery)
+        if len(self._results) >= config.NOTIF_OUTBOX_BATCH_SIZE:
+            await self._write_results()
+
+    async def _write_results(self) -> None:
+        results, self._results = self._results, []
+        if not results:
+            return
+        try:
+            await self.client.ds.update_deliveries(results)
+        except Exception:  # pylint: disable=broad-exception-caught
+            # They stay pending, so will be sent again.
+            logging.exception(f"Failed to write {len(results)} delivery results")
+
+    async def _run(self) -> None:
+        await self.client.wait_until_ready()
+        while True:
+            try:
+                await self.drain()
+            except Exception:  # pylint: disable=broad-exception-caught
+                logging.exception("Failed to drain the outbox")
+            await asyncio.sleep(config.NOTIF_OUTBOX_INTERVAL)
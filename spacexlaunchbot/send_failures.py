@@ -0,0 +1,73 @@
+"""Unsubscribes channels that keep forbidding the bot from sending to them.
+
+How many times in a row sending to each channel has been forbidden is counted in
+memory, and a send that succeeds starts the count again. Changed counts are written
+to the DataStore in one batch by flush, which also unsubscribes any channel whose
+count has reached NOTIF_MAX_FORBIDDEN.
+"""
+
+import logging
+
+from . import config, telemetry
+
+
+class SendFailures:
+    """Per-channel counts of forbidden sends, see the module docstring.
+
+    Args:
+        client: The Discord client, for its DataStore.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        # Channel id to count, only for channels with a count above 0.
+        self._counts: dict[int, int] = {}
+        # Channels whose count has changed since the last flush.
+        self._changed: set[int] = set()
+
+    async def load(self) -> None:
+        """Load the counts from the DataStore, carrying them on from last time."""
+        self._counts = await self.client.ds.get_send_failures()
+        self._changed.clear()
+
+    def record(self, channel_id: int, forbidden: bool) -> None:
+        """Record the result of sending to a channel."""
+        if forbidden:
+            self._counts[channel_id] = self._counts.get(channel_id, 0) + 1
+            self._changed.add(channel_id)
+        elif self._counts.pop(channel_id, 0) > 0:
+            self._changed.add(channel_id)
+
+    async def flush(self) -> int:
+        """Write the changed counts and unsubscribe channels that reached the limit.
+
+        Returns:
+            The number of channels that were unsubscribed.
+
+        """
+        changed, self._changed = self._changed, set()
+        if not changed:
+            return 0
+        counts = {channel_id: self._counts.get(channel_id, 0) for channel_id in changed}
+        await self.client.ds.set_send_failures(counts)
+
+        # Counts are checked again as sends may have worked while we were writing.
+        forbidden = [
+            channel_id
+            for channel_id in counts
+            if self._counts.get(channel_id, 0) >= config.NOTIF_MAX_FORBIDDEN
+        ]
+        if not forbidden:
+            return 0
+        removed = await self.client.ds.remove_subbed_channels(
+            str(channel_id) for channel_id in forbidden
+        )
+        for channel_id in forbidden:
+            # May have gone already, if a send worked or another flush removed it.
+            self._counts.pop(channel_id, None)
+        telemetry.CHANNELS_PRUNED.labels("forbidden").inc(removed)
+        logging.info(
+            f"Unsubscribed {removed} channels that forbade sending "
+            f"{config.NOTIF_MAX_FORBIDDEN} times in a row"
+        )
+        return removed
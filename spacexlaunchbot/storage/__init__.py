@@ -0,0 +1,8 @@
+"""Storage for bot data, see DataStore for the interface.
+
+Which implementation is used is set by config.STORAGE_BACKEND.
+"""
+
+from .base import DataStore, Delivery, DeliveryState, SubscriptionOptions
+from .postgres import PostgresDataStore
+from .sqlite import SQLiteDataStore
@@ -0,0 +1,406 @@
+import abc
+import logging
+import os
+import pickle
+from dataclasses import dataclass, field, replace
+from enum import Enum
+from typing import Iterable, Sequence
+
+import discord
+
+from .. import config
+from ..notifications import NotificationType
+from ..utils import allowed_mentions
+
+
+@dataclass(frozen=True)
+class SubscriptionOptions:
+    """A dataclass for holding channel subscription options."""
+
+    notification_type: NotificationType
+    launch_mentions: str
+    guild_id: int
+    # Minutes before launch to send a launch notification.
+    reminder_offsets: tuple[int, ...] = (config.NOTIF_TASK_LAUNCH_DELTA,)
+    # The id and token of the webhook to send notifications through, if any.
+    webhook: tuple[int, str] | None = None
+    # Worked out once from launch_mentions, so they can be sent in the same message
+    # as launch notifications without checking them each time.
+    launch_allowed_mentions: discord.AllowedMentions = field(
+        init=False, compare=False, repr=False
+    )
+
+    def __post_init__(self) -> None:
+        # Frozen, so can't be set normally.
+        object.__setattr__(
+            self, "launch_allowed_mentions", allowed_mentions(self.launch_mentions)
+        )
+
+    @classmethod
+    def from_columns(
+        cls,
+        notification_type: NotificationType,
+        launch_mentions: str | None,
+        guild_id: int,
+        reminder_offsets: Sequence[int] | None,
+        *,
+        webhook_id: str | None = None,
+        webhook_token: str | None = None,
+    ) -> "SubscriptionOptions":
+        """Create from the nullable columns that the options are stored in."""
+        options = cls(
+            notification_type,
+            launch_mentions if launch_mentions is not None else "",
+            guild_id,
+            webhook=(
+                (int(webhook_id), webhook_token)
+                if webhook_id is not None and webhook_token is not None
+                else None
+            ),
+        )
+        if reminder_offsets:
+            options = replace(options, reminder_offsets=tuple(reminder_offsets))
+        return options
+
+
+class DeliveryState(Enum):
+    """Where the delivery of a notification to a channel is up to."""
+
+    # Lower case like NotificationType, as these are stored by name.
+    # pylint: disable=invalid-name
+
+    # Not sent yet, or to be tried again.
+    pending = 0
+    delivered = 1
+    # Won't be tried again.
+    failed = 2
+
+
+@dataclass(frozen=True)
+class Delivery:
+    """A row of the outbox, the delivery of a notification to one channel."""
+
+    notification_id: int
+    channel_id: int
+    guild_id: int
+    # Sent after the notification, empty for none.
+    mentions: str
+    state: DeliveryState = DeliveryState.pending
+    attempts: int = 0
+    # Unix timestamp that the next attempt can be made at, if pending.
+    next_attempt: float = 0.0
+
+
+class _SubscriptionIndex:
+    """Subscribed channels bucketed by notification type."""
+
+    def __init__(self) -> None:
+        self._buckets: dict[NotificationType, dict[int, SubscriptionOptions]] = {
+            notification_type: {} for notification_type in NotificationType
+        }
+        self._types: dict[int, NotificationType] = {}
+
+    def __len__(self) -> int:
+        return len(self._types)
+
+    def add(self, channel_id: int, subscription_opts: SubscriptionOptions) -> None:
+        self.remove(channel_id)
+        self._buckets[subscription_opts.notification_type][
+            channel_id
+        ] = subscription_opts
+        self._types[channel_id] = subscription_opts.notification_type
+
+    def get(self, channel_id: int) -> SubscriptionOptions | None:
+        if (notification_type := self._types.get(channel_id)) is None:
+            return None
+        return self._buckets[notification_type][channel_id]
+
+    def remove(self, channel_id: int) -> None:
+        if (notification_type := self._types.pop(channel_id, None)) is not None:
+            del self._buckets[notification_type][channel_id]
+
+    def subscribed_to(
+        self, notification_type: NotificationType
+    ) -> dict[int, SubscriptionOptions]:
+        """Get the channels that should receive the given type of notification."""
+        channels = dict(self._buckets[NotificationType.all])
+        if notification_type is not NotificationType.all:
+            channels.update(self._buckets[notification_type])
+        return channels
+
+
+class DataStore(abc.ABC):
+    """The interface for storing bot data, whatever it is stored in.
+
+    Subscribed channels, metrics, counts, and the state of the notification task are
+        stored by the implementation, so that every process using the same database
+        sees the same data.
+
+    All methods that either return or take mutable objects as parameters make a deep
+        copy of said object(s) so that changes cannot be made outside the instance.
+
+    Immutable object references:
+     - https://stackoverflow.com/a/23715872/6396652
+     - https://stackoverflow.com/a/986145/6396652
+    """
+
+    # pylint: disable=too-many-public-methods
+
+    def __init__(self, pickle_file_path: str):
+        # Where older versions kept the notification task state, see
+        # _import_pickled_state.
+        self._pickle_file_path = pickle_file_path
+
+    @abc.abstractmethod
+    async def start(self) -> None:
+        """Get ready to be used, must be called before anything else."""
+
+    @abc.abstractmethod
+    async def stop(self) -> None:
+        """Write anything that is waiting to be written and release resources."""
+
+    # pylint: disable=too-many-positional-arguments
+    @abc.abstractmethod
+    async def add_subbed_channel(
+        self,
+        channel_id: str,
+        channel_name: str,
+        guild_id: str,
+        notif_type: NotificationType,
+        launch_mentions: str | None,
+        reminder_offsets: Sequence[int] | None = None,
+        webhook: tuple[int, str] | None = None,
+    ) -> bool:
+        """Add a channel to subscribed channels.
+
+        Args:
+            channel_id: The channel to add.
+            channel_name: The name of the channel.
+            guild_id: The guild the channel is in.
+            notif_type: The type of subscription.
+            launch_mentions: The mentions for launch notifications.
+            reminder_offsets: Minutes before launch to send launch notifications,
+                None for the default.
+            webhook: The id and token of a webhook to send notifications through,
+                None to send them as the bot.
+
+        Returns:
+            A bool indicating if the channel was added or not.
+
+        """
+
+    @abc.abstractmethod
+    async def get_subbed_channels(
+        self, notification_type: NotificationType
+    ) -> dict[int, SubscriptionOptions]:
+        """Get the channels that should be sent the given type of notification.
+
+        Args:
+            notification_type: The type of notification being sent.
+
+        Returns:
+            A dict of channel id to subscription options, containing channels
+            subscribed to the given type or to all notifications.
+
+        """
+
+    async def remove_subbed_channel(self, channel_id: str) -> bool:
+        return await self.remove_subbed_channels([channel_id]) == 1
+
+    @abc.abstractmethod
+    async def remove_subbed_channels(self, channel_ids: Iterable[str]) -> int:
+        """Remove many channels from subscribed channels at once.
+
+        Args:
+            channel_ids: The channels to remove.
+
+        Returns:
+            The number of channels that were removed.
+
+        """
+
+    @abc.abstractmethod
+    async def remove_webhook(self, channel_id: str) -> bool:
+        """Stop sending notifications to a channel through its webhook.
+
+        Args:
+            channel_id: The channel whose webhook no longer works.
+
+        Returns:
+            A bool indicating if the channel had a webhook or not.
+
+        """
+
+    @abc.abstractmethod
+    async def subbed_channels_count(self) -> int:
+        pass
+
+    @abc.abstractmethod
+    async def get_send_failures(self) -> dict[int, int]:
+        """Get how many times in a row sending to channels has been forbidden.
+
+        Returns:
+            A dict of channel id to count, for channels with a count above 0.
+
+        """
+
+    @abc.abstractmethod
+    async def set_send_failures(self, counts: dict[int, int]) -> None:
+        """Set how many times in a row sending to many channels has been forbidden.
+
+        Args:
+            counts: A dict of channel id to count, 0 once a send succeeds.
+
+        """
+
+    @abc.abstractmethod
+    def register_metric(self, action: str, guild_id: str) -> bool:
+        """Register an action occurring to the metrics table.
+
+        The metric is queued and written in a batch later on, so this doesn't wait
+        for the database.
+
+        Args:
+            action: The name of the action, naming convention is camel_case.
+            guild_id: The ID of the guild the action occurred in.
+
+        Returns:
+            A bool indicating if the metric was queued or not.
+
+        """
+
+    @abc.abstractmethod
+    async def update_counts(self, guild_count: int) -> bool:
+        """Insert new guild and subscribed channel counts into the db.
+
+        Args:
+            guild_count: The number of guilds the bot is currently in.
+
+        Returns:
+            A bool indicating if the count was added or not.
+
+        """
+
+    @abc.abstractmethod
+    async def set_shard_guild_counts(self, guild_counts: dict[int, int]) -> None:
+        """Save the number of guilds that each of the given shards is in.
+
+        Args:
+            guild_counts: The guild count by shard id.
+
+        """
+
+    @abc.abstractmethod
+    async def total_guild_count(self, shard_count: int) -> int:
+        """Get the number of guilds that every shard is in, see set_shard_guild_counts.
+
+        Args:
+            shard_count: How many shards there are, any others are ignored.
+
+        """
+
+    @abc.abstractmethod
+    async def day_old_counts(self) -> tuple[int, int]:
+        """Get guild and subsribed count from 24 hours ago.
+
+        Returns:
+            guild count, subscribed channel count
+        """
+
+    @abc.abstractmethod
+    async def add_notification(
+        self,
+        notification_type: NotificationType,
+        payload: dict,
+        channels: Sequence[tuple[int, int, str]],
+    ) -> int:
+        """Add a notification to the outbox, with a pending delivery to each channel.
+
+        Args:
+            notification_type: The type of notification being sent.
+            payload: The notification, see notifications.notification_payload.
+            channels: The channel id, guild id, and mentions of each delivery.
+
+        Returns:
+            The id of the notification.
+
+        """
+
+    @abc.abstractmethod
+    async def add_deliveries(
+        self, notification_id: int, channels: Sequence[tuple[int, int, str]]
+    ) -> None:
+        """Add pending deliveries of a notification that is already in the outbox.
+
+        Args:
+            notification_id: The id of the notification.
+            channels: The channel id, guild id, and mentions of each delivery.
+
+        """
+
+    @abc.abstractmethod
+    async def get_notification(
+        self, notification_id: int
+    ) -> tuple[NotificationType, dict]:
+        """Get the type and payload of a notification in the outbox."""
+
+    @abc.abstractmethod
+    async def due_deliveries(self, created_after: float) -> list[Delivery]:
+        """Get pending deliveries that are due to be attempted.
+
+        Args:
+            created_after: Only get deliveries of notifications added after this
+                Unix timestamp.
+
+        Returns:
+            The deliveries, ordered by notification.
+
+        """
+
+    @abc.abstractmethod
+    async def update_deliveries(self, deliveries: Iterable[Delivery]) -> None:
+        """Save the state, attempts, and next_attempt of many deliveries at once."""
+
+    @abc.abstractmethod
+    async def prune_notifications(self, created_before: float) -> int:
+        """Remove notifications, and their deliveries, added before a Unix timestamp.
+
+        Returns:
+            The number of notifications that were removed.
+
+        """
+
+    @abc.abstractmethod
+    async def get_notification_task_vars(self) -> tuple[bool, dict]:
+        """Get the state of the notification task.
+
+        Returns:
+            If a launch notification has been sent for the current schedule, and the
+            dict of the schedule embed that was sent last (for diffing).
+
+        """
+
+    @abc.abstractmethod
+    async def set_notification_task_vars(
+        self,
+        launch_embed_for_current_schedule_sent: bool,
+        previous_schedule_embed_dict: dict,
+    ) -> None:
+        """Save the state of the notification task, see get_notification_task_vars."""
+
+    async def _import_pickled_state(self) -> None:
+        """Save the notification task state from the file older versions used.
+
+        The file is renamed afterwards, so that it is only imported once.
+        """
+        try:
+            with open(self._pickle_file_path, "rb") as f_in:
+                state = pickle.load(f_in)
+        except FileNotFoundError:
+            return
+        await self.set_notification_task_vars(
+            state["_launch_embed_for_current_schedule_sent"],
+            state["_previous_schedule_embed_dict"],
+        )
+        os.replace(self._pickle_file_path, f"{self._pickle_file_path}.imported")
+        logging.info(f"Imported notification task state from {self._pickle_file_path}")
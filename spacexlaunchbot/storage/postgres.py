@@ -0,0 +1,578 @@
+import asyncio
+import json
+import logging
+import uuid
+from contextlib import asynccontextmanager
+from dataclasses import replace
+from typing import AsyncIterator, Iterable, Sequence
+
+import asyncpg
+
+from .. import config, telemetry
+from ..notifications import NotificationType
+from ..utils import BatchWriter
+from .base import (
+    DataStore,
+    Delivery,
+    SubscriptionOptions,
+    _SubscriptionIndex,
+)
+
+# Postgres channel that is notified whenever subscribed_channels is changed. Anything
+# else that edits the table should `notify subscribed_channels` afterwards so that
+# running bots drop their cached copy.
+_SUBSCRIPTIONS_CHANNEL = "subscribed_channels"
+
+# Applied in order by DataStore.start, so each one must be safe to run again.
+_SCHEMA_MIGRATIONS = (
+    # Minutes before launch to send launch reminders, null for the default.
+    "alter table subscribed_channels add column if not exists "
+    "reminder_offsets integer[];",
+    # The outbox, notifications and the state of their delivery to each channel.
+    """
+    create table if not exists notifications (
+        notification_id bigserial primary key,
+        created timestamptz not null default now(),
+        notification_type text not null,
+        payload jsonb not null
+    );""",
+    """
+    create table if not exists notification_outbox (
+        notification_id bigint not null
+            references notifications on delete cascade,
+        channel_id text not null,
+        guild_id text not null,
+        mentions text not null,
+        state text not null default 'pending',
+        attempts integer not null default 0,
+        next_attempt timestamptz not null default now(),
+        primary key (notification_id, channel_id)
+    );""",
+    "create index if not exists notification_outbox_due "
+    "on notification_outbox (next_attempt) where state = 'pending';",
+    # How many times in a row sending to the channel has been forbidden.
+    "alter table subscribed_channels add column if not exists "
+    "forbidden_count integer not null default 0;",
+    # The webhook that notifications are sent through, null to send as the bot.
+    "alter table subscribed_channels add column if not exists webhook_id text, "
+    "add column if not exists webhook_token text;",
+    # The notification task state, in one row so every process sees the same one.
+    """
+    create table if not exists notification_task_state (
+        id boolean primary key default true check (id),
+        launch_embed_sent boolean not null,
+        previous_schedule_embed jsonb not null
+    );""",
+    # The guild count of each shard, summed for the count across every process.
+    """
+    create table if not exists shard_guild_counts (
+        shard_id integer primary key,
+        guild_count integer not null
+    );""",
+)
+
+
+class PostgresDataStore(DataStore):
+    """Stores bot data in a postgres database.
+
+    Must a database connection pool from asyncpg.create_pool.
+
+    Subscribed channels are also cached in memory once `start` has been called. This
+        instance keeps the cache up to date when it changes the table, and a
+        LISTEN on the subscribed_channels channel invalidates it when anything else
+        does.
+    """
+
+    # pylint: disable=too-many-instance-attributes,too-many-public-methods
+
+    def __init__(self, db_pool: asyncpg.Pool, pickle_file_path: str):
+        super().__init__(pickle_file_path)
+        self.db_pool = db_pool
+
+        # Channel id to options by type, None when it needs to be loaded from the db.
+        self._subscriptions: _SubscriptionIndex | None = None
+        self._subscriptions_lock = asyncio.Lock()
+        # Bumped on every change so a load that raced with a change is thrown away.
+        self._subscriptions_generation = 0
+        # Used to ignore notifications that this instance sent.
+        self._instance_id = uuid.uuid4().hex
+        self._listener_conn: asyncpg.Connection | None = None
+        self._dead_listener_conn: asyncpg.Connection | None = None
+
+        self._metrics_writer = BatchWriter.copy_to(
+            db_pool,
+            "metrics",
+            ("action", "guild_id"),
+            max_batch_size=config.METRICS_BATCH_SIZE,
+            max_delay=config.METRICS_BATCH_DELAY,
+            max_queued=config.METRICS_MAX_QUEUED,
+        )
+
+    async def start(self) -> None:
+        """Load subscriptions, listen for changes to them, and start writing metrics."""
+        await self._migrate()
+        await self._import_pickled_state()
+        await self._listen()
+        await self._load_subscriptions()
+        self._metrics_writer.start()
+
+    async def stop(self) -> None:
+        """Write any queued metrics and stop listening for subscription changes."""
+        await self._metrics_writer.close()
+        if self._metrics_writer.dropped > 0:
+            logging.warning(f"Dropped {self._metrics_writer.dropped} metrics")
+
+        conn, self._listener_conn = self._listener_conn, None
+        if conn is None:
+            return
+        if not conn.is_closed():
+            await conn.remove_listener(_SUBSCRIPTIONS_CHANNEL, self._on_notify)
+        await self.db_pool.release(conn)
+
+    @asynccontextmanager
+    async def _acquire(self) -> AsyncIterator[asyncpg.Connection]:
+        """Like db_pool.acquire, but records how long it waited for a connection."""
+        with telemetry.DB_POOL_ACQUIRE_SECONDS.time():
+            conn = await self.db_pool.acquire()
+        try:
+            yield conn
+        finally:
+            await self.db_pool.release(conn)
+
+    async def _migrate(self) -> None:
+        async with self._acquire() as conn:
+            for sql in _SCHEMA_MIGRATIONS:
+                await conn.execute(sql)
+
+    async def _listen(self) -> None:
+        if (dead_conn := self._dead_listener_conn) is not None:
+            self._dead_listener_conn = None
+            await self.db_pool.release(dead_conn)
+        try:
+            conn = await self.db_pool.acquire()
+        except (OSError, asyncpg.PostgresError):
+            logging.exception("Failed to acquire a connection to listen on")
+            return
+        try:
+            await conn.add_listener(_SUBSCRIPTIONS_CHANNEL, self._on_notify)
+        except (OSError, asyncpg.PostgresError):
+            logging.exception("Failed to listen for subscription changes")
+            await self.db_pool.release(conn)
+            return
+        conn.add_termination_listener(self._on_listener_terminated)
+        self._listener_conn = conn
+
+    # pylint: disable-next=unused-argument
+    def _on_notify(self, _conn, _pid, _channel, payload: str) -> None:
+        if payload != self._instance_id:
+            logging.info("Subscriptions changed elsewhere, invalidating cache")
+            self._invalidate_subscriptions()
+
+    def _on_listener_terminated(self, conn) -> None:
+        # We can't hear about changes any more, so stop trusting the cache.
+        logging.warning("Subscription listener connection lost")
+        self._listener_conn = None
+        # Given back to the pool the next time we try to listen.
+        self._dead_listener_conn = conn
+        self._invalidate_subscriptions()
+
+    def _invalidate_subscriptions(self) -> None:
+        self._subscriptions = None
+        self._subscriptions_generation += 1
+
+    async def _load_subscriptions(self) -> _SubscriptionIndex:
+        generation = self._subscriptions_generation
+        channels = _SubscriptionIndex()
+        sql = "select * from subscribed_channels;"
+        async with self._acquire() as conn:
+            records = await conn.fetch(sql)
+        for rec in records:
+            channels.add(
+                int(rec["channel_id"]),
+                SubscriptionOptions.from_columns(
+                    NotificationType[rec["notification_type"]],
+                    rec["launch_mentions"],
+                    int(rec["guild_id"]),
+                    rec["reminder_offsets"],
+                    webhook_id=rec["webhook_id"],
+                    webhook_token=rec["webhook_token"],
+                ),
+            )
+        # Without a listener we can't know when this goes stale, so don't keep it.
+        if (
+            self._listener_conn is not None
+            and generation == self._subscriptions_generation
+        ):
+            self._subscriptions = channels
+        return channels
+
+    async def _subscription_index(self) -> _SubscriptionIndex:
+        """Get the cached subscriptions, loading them from the db if required."""
+        async with self._subscriptions_lock:
+            if self._listener_conn is None:
+                await self._listen()
+            if self._subscriptions is not None:
+                return self._subscriptions
+            return await self._load_subscriptions()
+
+    async def _notify_subscriptions_changed(self, conn: asyncpg.Connection) -> None:
+        # Sent when the surrounding transaction commits.
+        await conn.execute(
+            "select pg_notify($1, $2);", _SUBSCRIPTIONS_CHANNEL, self._instance_id
+        )
+
+    # pylint: disable=too-many-positional-arguments
+    async def add_subbed_channel(
+        self,
+        channel_id: str,
+        channel_name: str,
+        guild_id: str,
+        notif_type: NotificationType,
+        launch_mentions: str | None,
+        reminder_offsets: Sequence[int] | None = None,
+        webhook: tuple[int, str] | None = None,
+    ) -> bool:
+        notification_type = notif_type.name
+        webhook_id, webhook_token = (
+            (str(webhook[0]), webhook[1]) if webhook is not None else (None, None)
+        )
+        sql = """
+        insert into subscribed_channels
+            (channel_id, guild_id, channel_name, notification_type, launch_mentions,
+            reminder_offsets, webhook_id, webhook_token)
+        values
+            ($1, $2, $3, $4, $5, $6, $7, $8);"""
+        async with self._acquire() as conn:
+            try:
+                async with conn.transaction():
+                    response = await conn.execute(
+                        sql,
+                        channel_id,
+                        guild_id,
+                        channel_name,
+                        notification_type,
+                        launch_mentions,
+                        reminder_offsets,
+                        webhook_id,
+                        webhook_token,
+                    )
+                    await self._notify_subscriptions_changed(conn)
+            except asyncpg.exceptions.UniqueViolationError:
+                # channel_id (primary key) already exists.
+                return False
+        # Not great practice but it works.
+        if response != "INSERT 0 1":
+            return False
+        self._subscriptions_generation += 1
+        if self._subscriptions is not None:
+            self._subscriptions.add(
+                int(channel_id),
+                SubscriptionOptions.from_columns(
+                    notif_type,
+                    launch_mentions,
+                    int(guild_id),
+                    reminder_offsets,
+                    webhook_id=webhook_id,
+                    webhook_token=webhook_token,
+                ),
+            )
+        return True
+
+    async def get_subbed_channels(
+        self, notification_type: NotificationType
+    ) -> dict[int, SubscriptionOptions]:
+        return (await self._subscription_index()).subscribed_to(notification_type)
+
+    async def remove_subbed_channels(self, channel_ids: Iterable[str]) -> int:
+        # One statement, however many channels there are.
+        channel_ids = list(channel_ids)
+        if len(channel_ids) == 0:
+            return 0
+        sql = "delete from subscribed_channels where channel_id = any($1::text[]);"
+        async with self._acquire() as conn:
+            async with conn.transaction():
+                response = await conn.execute(sql, channel_ids)
+                await self._notify_subscriptions_changed(conn)
+        self._subscriptions_generation += 1
+        if self._subscriptions is not None:
+            for channel_id in channel_ids:
+                self._subscriptions.remove(int(channel_id))
+        # Response is "DELETE <count>".
+        return int(response.split()[-1])
+
+    async def remove_webhook(self, channel_id: str) -> bool:
+        sql = """
+        update
+            subscribed_channels
+        set
+            webhook_id = null,
+            webhook_token = null
+        where
+            channel_id = $1 and webhook_id is not null;"""
+        async with self._acquire() as conn:
+            async with conn.transaction():
+                response = await conn.execute(sql, channel_id)
+                await self._notify_subscriptions_changed(conn)
+        self._subscriptions_generation += 1
+        if self._subscriptions is not None:
+            options = self._subscriptions.get(int(channel_id))
+            if options is not None:
+                self._subscriptions.add(int(channel_id), replace(options, webhook=None))
+        # Response is "UPDATE <count>".
+        return response == "UPDATE 1"
+
+    async def subbed_channels_count(self) -> int:
+        return len(await self._subscription_index())
+
+    async def get_send_failures(self) -> dict[int, int]:
+        sql = """
+        select
+            channel_id,
+            forbidden_count
+        from
+            subscribed_channels
+        where
+            forbidden_count > 0;"""
+        async with self._acquire() as conn:
+            records = await conn.fetch(sql)
+        return {int(rec["channel_id"]): rec["forbidden_count"] for rec in records}
+
+    async def set_send_failures(self, counts: dict[int, int]) -> None:
+        if len(counts) == 0:
+            return
+        # One statement, however many channels there are.
+        sql = """
+        update subscribed_channels s set
+            forbidden_count = u.forbidden_count
+        from
+            unnest($1::text[], $2::integer[]) as u(channel_id, forbidden_count)
+        where
+            s.channel_id = u.channel_id;"""
+        async with self._acquire() as conn:
+            await conn.execute(sql, [str(cid) for cid in counts], list(counts.values()))
+
+    def register_metric(self, action: str, guild_id: str) -> bool:
+        return self._metrics_writer.put((action, guild_id))
+
+    async def update_counts(self, guild_count: int) -> bool:
+        subbed_count = await self.subbed_channels_count()
+
+        sql = """
+        insert into counts
+            (guild_count, subscribed_count)
+        values
+            ($1, $2);"""
+        async with self._acquire() as conn:
+            response = await conn.execute(
+                sql,
+                guild_count,
+                subbed_count,
+            )
+            if response == "INSERT 0 1":
+                return True
+        return False
+
+    async def set_shard_guild_counts(self, guild_counts: dict[int, int]) -> None:
+        sql = """
+        insert into shard_guild_counts
+            (shard_id, guild_count)
+        select
+            *
+        from
+            unnest($1::integer[], $2::integer[])
+        on conflict (shard_id) do update set
+            guild_count = excluded.guild_count;"""
+        async with self._acquire() as conn:
+            await conn.execute(sql, list(guild_counts), list(guild_counts.values()))
+
+    async def total_guild_count(self, shard_count: int) -> int:
+        # Shards left over from running with more of them aren't counted.
+        sql = """
+        select
+            coalesce(sum(guild_count), 0)
+        from
+            shard_guild_counts
+        where
+            shard_id < $1;"""
+        async with self._acquire() as conn:
+            return await conn.fetchval(sql, shard_count)
+
+    async def day_old_counts(self) -> tuple[int, int]:
+        sql = """
+        select
+            guild_count,
+            subscribed_count
+        from
+            counts
+        where
+            time between now() - interval '1 day' and now()
+        order by
+            time asc
+        limit
+            1;"""
+        async with self._acquire() as conn:
+            records = await conn.fetch(sql)
+        try:
+            record = records[0]
+            return int(record["guild_count"]), int(record["subscribed_count"])
+        except (IndexError, ValueError, KeyError):
+            return 0, 0
+
+    async def get_notification_task_vars(self) -> tuple[bool, dict]:
+        sql = """
+        select
+            launch_embed_sent,
+            previous_schedule_embed
+        from
+            notification_task_state;"""
+        async with self._acquire() as conn:
+            record = await conn.fetchrow(sql)
+        if record is None:
+            return False, {}
+        return (
+            record["launch_embed_sent"],
+            json.loads(record["previous_schedule_embed"]),
+        )
+
+    async def set_notification_task_vars(
+        self,
+        launch_embed_for_current_schedule_sent: bool,
+        previous_schedule_embed_dict: dict,
+    ) -> None:
+        sql = """
+        insert into notification_task_state
+            (launch_embed_sent, previous_schedule_embed)
+        values
+            ($1, $2)
+        on conflict (id) do update set
+            launch_embed_sent = excluded.launch_embed_sent,
+            previous_schedule_embed = excluded.previous_schedule_embed;"""
+        async with self._acquire() as conn:
+            await conn.execute(
+                sql,
+                launch_embed_for_current_schedule_sent,
+                json.dumps(previous_schedule_embed_dict),
+            )
+
+    async def add_notification(
+        self,
+        notification_type: NotificationType,
+        payload: dict,
+        channels: Sequence[tuple[int, int, str]],
+    ) -> int:
+        sql = """
+        insert into notifications
+            (notification_type, payload)
+        values
+            ($1, $2)
+        returning
+            notification_id;"""
+        async with self._acquire() as conn:
+            async with conn.transaction():
+                notification_id = await conn.fetchval(
+                    sql, notification_type.name, json.dumps(payload)
+                )
+                await self._copy_deliveries(conn, notification_id, channels)
+        return notification_id
+
+    async def add_deliveries(
+        self, notification_id: int, channels: Sequence[tuple[int, int, str]]
+    ) -> None:
+        async with self._acquire() as conn:
+            await self._copy_deliveries(conn, notification_id, channels)
+
+    @staticmethod
+    async def _copy_deliveries(
+        conn: asyncpg.Connection,
+        notification_id: int,
+        channels: Sequence[tuple[int, int, str]],
+    ) -> None:
+        await conn.copy_records_to_table(
+            "notification_outbox",
+            records=[
+                (notification_id, str(channel_id), str(guild_id), mentions)
+                for channel_id, guild_id, mentions in channels
+            ],
+            columns=("notification_id", "channel_id", "guild_id", "mentions"),
+        )
+
+    async def get_notification(
+        self, notification_id: int
+    ) -> tuple[NotificationType, dict]:
+        sql = """
+        select
+            notification_type,
+            payload
+        from
+            notifications
+        where
+            notification_id = $1;"""
+        async with self._acquire() as conn:
+            record = await conn.fetchrow(sql, notification_id)
+        return (
+            NotificationType[record["notification_type"]],
+            json.loads(record["payload"]),
+        )
+
+    async def due_deliveries(self, created_after: float) -> list[Delivery]:
+        sql = """
+        select
+            o.notification_id,
+            o.channel_id,
+            o.guild_id,
+            o.mentions,
+            o.attempts
+        from
+            notification_outbox o
+            join notifications n using (notification_id)
+        where
+            o.state = 'pending'
+            and o.next_attempt <= now()
+            and n.created > to_timestamp($1)
+        order by
+            o.notification_id;"""
+        async with self._acquire() as conn:
+            records = await conn.fetch(sql, created_after)
+        return [
+            Delivery(
+                rec["notification_id"],
+                int(rec["channel_id"]),
+                int(rec["guild_id"]),
+                rec["mentions"],
+                attempts=rec["attempts"],
+            )
+            for rec in records
+        ]
+
+    async def update_deliveries(self, deliveries: Iterable[Delivery]) -> None:
+        deliveries = list(deliveries)
+        if len(deliveries) == 0:
+            return
+        # One statement, however many deliveries there are.
+        sql = """
+        update notification_outbox o set
+            state = u.state,
+            attempts = u.attempts,
+            next_attempt = to_timestamp(u.next_attempt)
+        from
+            unnest($1::bigint[], $2::text[], $3::text[], $4::integer[], $5::float8[])
+            as u(notification_id, channel_id, state, attempts, next_attempt)
+        where
+            o.notification_id = u.notification_id
+            and o.channel_id = u.channel_id;"""
+        async with self._acquire() as conn:
+            await conn.execute(
+                sql,
+                [d.notification_id for d in deliveries],
+                [str(d.channel_id) for d in deliveries],
+                [d.state.name for d in deliveries],
+                [d.attempts for d in deliveries],
+                [d.next_attempt for d in deliveries],
+            )
+
+    async def prune_notifications(self, created_before: float) -> int:
+        sql = "delete from notifications where created < to_timestamp($1);"
+        async with self._acquire() as conn:
+            response = await conn.execute(sql, created_before)
+        # Response is "DELETE <count>".
+        return int(response.split()[-1])
@@ -0,0 +1,440 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import time
+from contextlib import asynccontextmanager
+from dataclasses import replace
+from typing import AsyncIterator, Iterable, Sequence
+
+import aiosqlite
+
+from .. import config
+from ..notifications import NotificationType
+from ..utils import BatchWriter
+from .base import DataStore, Delivery, SubscriptionOptions, _SubscriptionIndex
+
+_SCHEMA = """
+create table if not exists subscribed_channels (
+    channel_id text primary key,
+    guild_id text not null,
+    channel_name text,
+    notification_type text not null,
+    launch_mentions text,
+    -- A JSON list of minutes before launch, null for the default.
+    reminder_offsets text
+);
+create table if not exists metrics (
+    time text not null default (datetime('now')),
+    action text not null,
+    guild_id text
+);
+create table if not exists counts (
+    time text not null default (datetime('now')),
+    guild_count integer not null,
+    subscribed_count integer not null
+);
+create table if not exists notifications (
+    notification_id integer primary key,
+    -- Unix timestamps, like next_attempt.
+    created real not null,
+    notification_type text not null,
+    payload text not null
+);
+create table if not exists notification_outbox (
+    notification_id integer not null,
+    channel_id text not null,
+    guild_id text not null,
+    -- Sent after the notification, empty for none.
+    mentions text not null,
+    state text not null default 'pending',
+    attempts integer not null default 0,
+    next_attempt real not null default 0,
+    primary key (notification_id, channel_id)
+);
+-- The notification task state, in one row.
+create table if not exists notification_task_state (
+    id integer primary key check (id = 1),
+    launch_embed_sent integer not null,
+    -- A JSON object.
+    previous_schedule_embed text not null
+);
+create table if not exists shard_guild_counts (
+    shard_id integer primary key,
+    guild_count integer not null
+);
+"""
+
+# Applied in order by start, a column that already exists is skipped.
+_SCHEMA_MIGRATIONS = (
+    # How many times in a row sending to the channel has been forbidden.
+    "alter table subscribed_channels add column "
+    "forbidden_count integer not null default 0;",
+    # The webhook that notifications are sent through, null to send as the bot.
+    "alter table subscribed_channels add column webhook_id text;",
+    "alter table subscribed_channels add column webhook_token text;",
+)
+
+# SQLite limits how many parameters a statement can have.
+_MAX_PARAMETERS = 500
+
+
+class SQLiteDataStore(DataStore):
+    """Stores bot data in an SQLite database, for running without Postgres.
+
+    The database file is only used by this process, so subscribed channels are
+        loaded into memory by `start` and kept there alongside every change. Use a
+        path of ":memory:" to not keep anything once stopped.
+
+    Every coroutine shares one connection, so each write is made in its own
+        transaction while holding a lock, see `_transaction`.
+
+    Metrics are queued and written in batches, like PostgresDataStore.
+    """
+
+    # pylint: disable=too-many-public-methods
+
+    def __init__(self, db_path: str, pickle_file_path: str):
+        super().__init__(pickle_file_path)
+        self.db_path = db_path
+        self._db: aiosqlite.Connection | None = None
+        self._write_lock = asyncio.Lock()
+        self._subscriptions = _SubscriptionIndex()
+        self._metrics_writer = BatchWriter(
+            self._write_metrics,
+            "metrics",
+            max_batch_size=config.METRICS_BATCH_SIZE,
+            max_delay=config.METRICS_BATCH_DELAY,
+            max_queued=config.METRICS_MAX_QUEUED,
+        )
+
+    @property
+    def db(self) -> aiosqlite.Connection:
+        assert self._db is not None, "start has not been called"
+        return self._db
+
+    async def start(self) -> None:
+        """Create the tables if required, load subscriptions, and start writing
+        metrics."""
+        # Transactions are started explicitly, see _transaction.
+        self._db = await aiosqlite.connect(self.db_path, isolation_level=None)
+        await self._db.executescript(_SCHEMA)
+        async with self._transaction() as db:
+            for sql in _SCHEMA_MIGRATIONS:
+                try:
+                    await db.execute(sql)
+                except sqlite3.OperationalError as ex:
+                    if "duplicate column" not in str(ex):
+                        raise
+        await self._import_pickled_state()
+
+        sql = """
+        select channel_id, guild_id, notification_type, launch_mentions,
+            reminder_offsets, webhook_id, webhook_token
+        from subscribed_channels;"""
+        async with self._db.execute(sql) as cursor:
+            async for row in cursor:
+                channel_id, guild_id, notif_type, mentions, offsets = row[:5]
+                self._subscriptions.add(
+                    int(channel_id),
+                    SubscriptionOptions.from_columns(
+                        NotificationType[notif_type],
+                        mentions,
+                        int(guild_id),
+                        json.loads(offsets) if offsets is not None else None,
+                        webhook_id=row[5],
+                        webhook_token=row[6],
+                    ),
+                )
+        self._metrics_writer.start()
+
+    async def stop(self) -> None:
+        """Write any queued metrics and close the database."""
+        if self._db is None:
+            return
+        await self._metrics_writer.close()
+        if self._metrics_writer.dropped > 0:
+            logging.warning(f"Dropped {self._metrics_writer.dropped} metrics")
+        await self._db.close()
+        self._db = None
+
+    @asynccontextmanager
+    async def _transaction(self) -> AsyncIterator[aiosqlite.Connection]:
+        """Make writes in a transaction that is committed, or rolled back if anything
+        raises, as a whole.
+
+        Holds a lock so that writes from other coroutines on the shared connection
+        can't become part of it.
+        """
+        async with self._write_lock:
+            await self.db.execute("begin;")
+            try:
+                yield self.db
+            except BaseException:
+                await self.db.rollback()
+                raise
+            await self.db.commit()
+
+    # pylint: disable=too-many-positional-arguments
+    async def add_subbed_channel(
+        self,
+        channel_id: str,
+        channel_name: str,
+        guild_id: str,
+        notif_type: NotificationType,
+        launch_mentions: str | None,
+        reminder_offsets: Sequence[int] | None = None,
+        webhook: tuple[int, str] | None = None,
+    ) -> bool:
+        options = replace(
+            SubscriptionOptions.from_columns(
+                notif_type, launch_mentions, int(guild_id), reminder_offsets
+            ),
+            webhook=webhook,
+        )
+        sql = """
+        insert into subscribed_channels (channel_id, guild_id, channel_name,
+            notification_type, launch_mentions, reminder_offsets, webhook_id,
+            webhook_token)
+        values (?, ?, ?, ?, ?, ?, ?, ?);"""
+        try:
+            async with self._transaction() as db:
+                await db.execute(
+                    sql,
+                    (
+                        channel_id,
+                        guild_id,
+                        channel_name,
+                        notif_type.name,
+                        launch_mentions,
+                        (
+                            json.dumps(list(reminder_offsets))
+                            if reminder_offsets
+                            else None
+                        ),
+                        str(webhook[0]) if webhook is not None else None,
+                        webhook[1] if webhook is not None else None,
+                    ),
+                )
+        except sqlite3.IntegrityError:
+            # channel_id (primary key) already exists.
+            return False
+        self._subscriptions.add(int(channel_id), options)
+        return True
+
+    async def get_subbed_channels(
+        self, notification_type: NotificationType
+    ) -> dict[int, SubscriptionOptions]:
+        return self._subscriptions.subscribed_to(notification_type)
+
+    async def remove_subbed_channels(self, channel_ids: Iterable[str]) -> int:
+        channel_ids = list(channel_ids)
+        removed = 0
+        async with self._transaction() as db:
+            for start in range(0, len(channel_ids), _MAX_PARAMETERS):
+                chunk = channel_ids[start:][:_MAX_PARAMETERS]
+                placeholders = ", ".join("?" * len(chunk))
+                sql = (
+                    "delete from subscribed_channels "
+                    f"where channel_id in ({placeholders});"
+                )
+                async with db.execute(sql, chunk) as cursor:
+                    removed += cursor.rowcount
+        for channel_id in channel_ids:
+            self._subscriptions.remove(int(channel_id))
+        return removed
+
+    async def remove_webhook(self, channel_id: str) -> bool:
+        sql = """
+        update subscribed_channels set webhook_id = null, webhook_token = null
+        where channel_id = ? and webhook_id is not null;"""
+        async with self._transaction() as db:
+            async with db.execute(sql, (channel_id,)) as cursor:
+                removed = cursor.rowcount == 1
+        options = self._subscriptions.get(int(channel_id))
+        if options is not None:
+            self._subscriptions.add(int(channel_id), replace(options, webhook=None))
+        return removed
+
+    async def subbed_channels_count(self) -> int:
+        return len(self._subscriptions)
+
+    async def get_send_failures(self) -> dict[int, int]:
+        sql = """
+        select channel_id, forbidden_count from subscribed_channels
+        where forbidden_count > 0;"""
+        async with self.db.execute(sql) as cursor:
+            return {int(row[0]): row[1] for row in await cursor.fetchall()}
+
+    async def set_send_failures(self, counts: dict[int, int]) -> None:
+        async with self._transaction() as db:
+            await db.executemany(
+                "update subscribed_channels set forbidden_count = ? "
+                "where channel_id = ?;",
+                [(count, str(channel_id)) for channel_id, count in counts.items()],
+            )
+
+    def register_metric(self, action: str, guild_id: str) -> bool:
+        return self._metrics_writer.put((action, guild_id))
+
+    async def _write_metrics(self, metrics: list[tuple]) -> None:
+        async with self._transaction() as db:
+            await db.executemany(
+                "insert into metrics (action, guild_id) values (?, ?);", metrics
+            )
+
+    async def update_counts(self, guild_count: int) -> bool:
+        subbed_count = await self.subbed_channels_count()
+        sql = "insert into counts (guild_count, subscribed_count) values (?, ?);"
+        async with self._transaction() as db:
+            async with db.execute(sql, (guild_count, subbed_count)) as cursor:
+                added = cursor.rowcount == 1
+        return added
+
+    async def set_shard_guild_counts(self, guild_counts: dict[int, int]) -> None:
+        sql = "insert or replace into shard_guild_counts values (?, ?);"
+        async with self._transaction() as db:
+            await db.executemany(sql, guild_counts.items())
+
+    async def total_guild_count(self, shard_count: int) -> int:
+        # Shards left over from running with more of them aren't counted.
+        sql = """
+        select coalesce(sum(guild_count), 0) from shard_guild_counts
+        where shard_id < ?;"""
+        async with self.db.execute(sql, (shard_count,)) as cursor:
+            row = await cursor.fetchone()
+        assert row is not None
+        return int(row[0])
+
+    async def get_notification_task_vars(self) -> tuple[bool, dict]:
+        sql = """
+        select launch_embed_sent, previous_schedule_embed
+        from notification_task_state;"""
+        async with self.db.execute(sql) as cursor:
+            row = await cursor.fetchone()
+        if row is None:
+            return False, {}
+        return bool(row[0]), json.loads(row[1])
+
+    async def set_notification_task_vars(
+        self,
+        launch_embed_for_current_schedule_sent: bool,
+        previous_schedule_embed_dict: dict,
+    ) -> None:
+        sql = "insert or replace into notification_task_state values (1, ?, ?);"
+        async with self._transaction() as db:
+            await db.execute(
+                sql,
+                (
+                    launch_embed_for_current_schedule_sent,
+                    json.dumps(previous_schedule_embed_dict),
+                ),
+            )
+
+    async def day_old_counts(self) -> tuple[int, int]:
+        sql = """
+        select guild_count, subscribed_count from counts
+        where time between datetime('now', '-1 day') and datetime('now')
+        order by time asc limit 1;"""
+        async with self.db.execute(sql) as cursor:
+            row = await cursor.fetchone()
+        if row is None:
+            return 0, 0
+        return int(row[0]), int(row[1])
+
+    async def add_notification(
+        self,
+        notification_type: NotificationType,
+        payload: dict,
+        channels: Sequence[tuple[int, int, str]],
+    ) -> int:
+        sql = "insert into notifications values (null, ?, ?, ?);"
+        async with self._transaction() as db:
+            async with db.execute(
+                sql, (time.time(), notification_type.name, json.dumps(payload))
+            ) as cursor:
+                notification_id = cursor.lastrowid
+            assert notification_id is not None
+            await self._insert_deliveries(db, notification_id, channels)
+        return notification_id
+
+    async def add_deliveries(
+        self, notification_id: int, channels: Sequence[tuple[int, int, str]]
+    ) -> None:
+        async with self._transaction() as db:
+            await self._insert_deliveries(db, notification_id, channels)
+
+    @staticmethod
+    async def _insert_deliveries(
+        db: aiosqlite.Connection,
+        notification_id: int,
+        channels: Sequence[tuple[int, int, str]],
+    ) -> None:
+        await db.executemany(
+            "insert into notification_outbox (notification_id, channel_id, guild_id, "
+            "mentions) values (?, ?, ?, ?);",
+            [
+                (notification_id, str(channel_id), str(guild_id), mentions)
+                for channel_id, guild_id, mentions in channels
+            ],
+        )
+
+    async def get_notification(
+        self, notification_id: int
+    ) -> tuple[NotificationType, dict]:
+        sql = """
+        select notification_type, payload from notifications
+        where notification_id = ?;"""
+        async with self.db.execute(sql, (notification_id,)) as cursor:
+            row = await cursor.fetchone()
+        assert row is not None, f"No notification {notification_id}"
+        return NotificationType[row[0]], json.loads(row[1])
+
+    async def due_deliveries(self, created_after: float) -> list[Delivery]:
+        sql = """
+        select o.notification_id, o.channel_id, o.guild_id, o.mentions, o.attempts
+        from notification_outbox o join notifications n using (notification_id)
+        where o.state = 'pending' and o.next_attempt <= ? and n.created > ?
+        order by o.notification_id;"""
+        async with self.db.execute(sql, (time.time(), created_after)) as cursor:
+            rows = await cursor.fetchall()
+        return [
+            Delivery(
+                notification_id,
+                int(channel_id),
+                int(guild_id),
+                mentions,
+                attempts=attempts,
+            )
+            for notification_id, channel_id, guild_id, mentions, attempts in rows
+        ]
+
+    async def update_deliveries(self, deliveries: Iterable[Delivery]) -> None:
+        sql = """
+        update notification_outbox set state = ?, attempts = ?, next_attempt = ?
+        where notification_id = ? and channel_id = ?;"""
+        rows = [
+            (
+                d.state.name,
+                d.attempts,
+                d.next_attempt,
+                d.notification_id,
+                str(d.channel_id),
+            )
+            for d in deliveries
+        ]
+        async with self._transaction() as db:
+            await db.executemany(sql, rows)
+
+    async def prune_notifications(self, created_before: float) -> int:
+        pruned = "select notification_id from notifications where created < ?"
+        async with self._transaction() as db:
+            await db.execute(
+                f"delete from notification_outbox where notification_id in ({pruned});",
+                (created_before,),
+            )
+            async with db.execute(
+                "delete from notifications where created < ?;", (created_before,)
+            ) as cursor:
+                removed = cursor.rowcount
+        return removed
@@ -0,0 +1,63 @@
+"""Prometheus metrics for the notification pipeline, served by the healthcheck server.
+
+These are for watching the bot as it runs, unlike the metrics table in the database
+which records what guilds use it for.
+"""
+
+from .utils import Registry
+
+REGISTRY = Registry()
+
+NOTIFICATION_CHECK_SECONDS = REGISTRY.histogram(
+    "slb_notification_check_seconds",
+    "Time taken to check for and send notifications.",
+    buckets=(0.1, 0.5, 1, 5, 10, 30, 60, 120, 300, 600),
+)
+LL2_FETCH_SECONDS = REGISTRY.histogram(
+    "slb_ll2_fetch_seconds",
+    "Time taken to update launches from LL2, including waiting for a request that "
+    "another lookup made.",
+)
+EMBED_BUILD_SECONDS = REGISTRY.histogram(
+    "slb_embed_build_seconds",
+    "Time taken to build an embed that wasn't cached.",
+    ("type",),
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1),
+)
+NOTIFICATION_DELIVER_SECONDS = REGISTRY.histogram(
+    "slb_notification_deliver_seconds",
+    "Time taken to deliver a notification to every subscribed channel.",
+    ("type",),
+    buckets=(0.1, 0.5, 1, 5, 10, 30, 60, 120, 300, 600),
+)
+CHANNEL_SEND_SECONDS = REGISTRY.histogram(
+    "slb_channel_send_seconds",
+    "Time taken to send a message to a channel, including rate limit waits.",
+)
+CHANNEL_SENDS = REGISTRY.counter(
+    "slb_channel_sends_total",
+    "Messages sent to channels, by whether they were sent or why not.",
+    ("result",),
+)
+CHANNELS_SKIPPED = REGISTRY.counter(
+    "slb_channels_skipped_total",
+    "Subscribed channels that a notification wasn't sent to, by why.",
+    ("reason",),
+)
+OUTBOX_RESENDS = REGISTRY.counter(
+    "slb_outbox_resends_total",
+    "Deliveries sent from the outbox, to retry them or after a restart.",
+)
+CHANNELS_PRUNED = REGISTRY.counter(
+    "slb_channels_pruned_total",
+    "Channels that were unsubscribed as they can no longer be sent to, by why.",
+    ("reason",),
+)
+SUBSCRIPTIONS_LOOKUP_SECONDS = REGISTRY.histogram(
+    "slb_subscriptions_lookup_seconds",
+    "Time taken to get the channels subscribed to a notification.",
+)
+DB_POOL_ACQUIRE_SECONDS = REGISTRY.histogram(
+    "slb_db_pool_acquire_seconds",
+    "Time spent waiting for a connection from the database pool.",
+)
@@ -1,2 +1,7 @@
-from .misc import md_link, setup_logging, sys_info, utc_from_time
+from .batch_writer import BatchWriter
+from .misc import allowed_mentions, md_link, setup_logging, sys_info, utc_from_time
 from .postgres_logger import PostgresLogger
+from .prometheus import Registry
+from .ratelimit import TokenBucket
+from .singleflight import SingleFlight
+from .timer_wheel import TimerWheel
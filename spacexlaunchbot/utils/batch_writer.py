@@ -0,0 +1,142 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Sequence
+
+import asyncpg
+
+# Put on the queue by close to tell the writer to flush and stop.
+_STOP = object()
+
+# Writes a batch of rows, raising if they could not be written.
+WriteFunction = Callable[[list[tuple]], Awaitable[None]]
+
+
+class BatchWriter:
+    """Buffers rows in memory and writes them in batches with the given function.
+
+    A batch is written when it reaches `max_batch_size` rows or when its oldest row
+    has waited `max_delay` seconds, whichever comes first. At most `max_queued` rows
+    are held in memory, rows added past that are dropped and counted.
+
+    Use `copy_to` to write to a Postgres table using COPY.
+    """
+
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(
+        self,
+        write: WriteFunction,
+        table: str,
+        *,
+        max_batch_size: int,
+        max_delay: float,
+        max_queued: int,
+    ):
+        self.write = write
+        # Only used for logging.
+        self.table = table
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queued)
+        self._task: asyncio.Task | None = None
+        self._closed = False
+
+        # Rows that were not added because the queue was full or we were closed.
+        self.dropped = 0
+        # Rows that were lost because writing their batch failed.
+        self.failed = 0
+
+    @classmethod
+    def copy_to(
+        cls,
+        db_pool: asyncpg.Pool,
+        table: str,
+        columns: Sequence[str],
+        **kwargs,
+    ) -> "BatchWriter":
+        """Create a writer that writes to a Postgres table using COPY.
+
+        Args:
+            db_pool: The pool to get a connection for each batch from.
+            table: The table to write to.
+            columns: The columns of the table that are in each row.
+            **kwargs: The limits of the writer, see BatchWriter.
+
+        """
+
+        async def write(batch: list[tuple]) -> None:
+            async with db_pool.acquire() as conn:
+                await conn.copy_records_to_table(table, records=batch, columns=columns)
+
+        return cls(write, table, **kwargs)
+
+    @property
+    def queued(self) -> int:
+        return self._queue.qsize()
+
+    @property
+    def max_queued(self) -> int:
+        return self._queue.maxsize
+
+    def start(self) -> None:
+        """Start the writer, must be called from inside the event loop."""
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def put(self, row: tuple) -> bool:
+        """Queue a row to be written, without waiting.
+
+        Returns:
+            A bool indicating if the row was queued or not.
+
+        """
+        if self._closed:
+            self.dropped += 1
+            return False
+        try:
+            self._queue.put_nowait(row)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+        return True
+
+    async def close(self) -> None:
+        """Write everything that has been queued then stop the writer."""
+        if self._closed:
+            return
+        self._closed = True
+        if self._task is None:
+            return
+        await self._queue.put(_STOP)
+        await self._task
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        stopping = False
+
+        while not stopping:
+            row = await self._queue.get()
+            if row is _STOP:
+                break
+
+            batch = [row]
+            deadline = loop.time() + self.max_delay
+            while len(batch) < self.max_batch_size:
+                try:
+                    row = await asyncio.wait_for(
+                        self._queue.get(), deadline - loop.time()
+                    )
+                except asyncio.TimeoutError:
+                    break
+                if row is _STOP:
+                    stopping = True
+                    break
+                batch.append(row)
+
+            await self._write(batch)
+
+    async def _write(self, batch: list[tuple]) -> None:
+        try:
+            await self.write(batch)
+        except Exception:  # pylint: disable=broad-exception-caught
+            self.failed += len(batch)
+            logging.exception(f"Failed to write {len(batch)} rows to {self.table}")
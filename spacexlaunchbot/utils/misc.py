@@ -2,9 +2,11 @@ import datetime
 import json
 import logging
 import platform
+import re
 import sys
 from typing import Union
 
+import discord
 from discord import version_info
 
 from .. import config, version
@@ -26,6 +28,31 @@ def md_link(name: str, url: str) -> str:
     return f"[{name}]({url})"
 
 
+_USER_MENTION = re.compile(r"<@!?(\d+)>")
+_ROLE_MENTION = re.compile(r"<@&(\d+)>")
+
+
+def allowed_mentions(text: str) -> discord.AllowedMentions:
+    """Only allow the mentions that are in the given text to notify anyone.
+
+    Args:
+        text: Text containing user (<@id> or <@!id>), role (<@&id>), @everyone or
+            @here mentions.
+
+    Returns:
+        An AllowedMentions for sending the text with.
+
+    """
+    users = [discord.Object(int(i)) for i in _USER_MENTION.findall(text)]
+    roles = [discord.Object(int(i)) for i in _ROLE_MENTION.findall(text)]
+    return discord.AllowedMentions(
+        everyone="@everyone" in text or "@here" in text,
+        users=users or False,
+        roles=roles or False,
+        replied_user=False,
+    )
+
+
 def sys_info() -> str:
     """Returns a JSON string of system information (useful for debugging)."""
     return json.dumps(
@@ -1,46 +1,76 @@
 import asyncio
 import logging
+import threading
 
 import asyncpg
 
+from .. import config
+from .batch_writer import BatchWriter
+
+
+class PostgresLogger(logging.Handler):
+    """Writes log records to the log table in batches.
+
+    Records are queued and written by a single BatchWriter task so that a burst of
+    logs can't take connections away from everything else using the pool. When the
+    queue starts filling up, records below WARNING are sampled, and when it is full
+    records are dropped. Both are counted.
+    """
 
-class PostgresLogger(logging.StreamHandler):
     def __init__(
         self, fmt: str, loop: asyncio.AbstractEventLoop, db_pool: asyncpg.Pool
     ):
-        logging.StreamHandler.__init__(self)
+        logging.Handler.__init__(self)
         self.formatter = logging.Formatter(fmt=fmt)
         self.loop = loop
-        self.db_pool = db_pool
+        # Must be created inside the loop, emit uses this to spot other threads.
+        self._loop_thread_id = threading.get_ident()
+        self._writer = BatchWriter.copy_to(
+            db_pool,
+            "log",
+            ("time", "level", "location", "function", "message"),
+            max_batch_size=config.LOG_DB_BATCH_SIZE,
+            max_delay=config.LOG_DB_BATCH_DELAY,
+            max_queued=config.LOG_DB_MAX_QUEUED,
+        )
+        self._writer.start()
+        self._sample_count = 0
+        # Records not written because they weren't picked when sampling.
+        self.sampled_out = 0
 
-    async def fire(self, formatted):
-        """Shoot our record at Postgres, don't really care if it fails."""
-        try:
-            time, level, location, function, message = formatted.split(" | ")
-            sql = """
-            insert into log
-                (time, level, location, function, message)
-            values
-                ($1, $2, $3, $4, $5);"""
-            async with self.db_pool.acquire() as conn:
-                await conn.execute(
-                    sql,
-                    time,
-                    level,
-                    location,
-                    function,
-                    message,
-                )
-        except ValueError:
-            # Not a log that fits our custom format.
-            pass
+    @property
+    def dropped(self) -> int:
+        """Records not written because the queue was full."""
+        return self._writer.dropped
+
+    async def stop(self) -> None:
+        """Write any queued records and stop the writer."""
+        await self._writer.close()
+
+    def _enqueue(self, level: int, row: tuple) -> None:
+        fullness = self._writer.queued / self._writer.max_queued
+        if level < logging.WARNING and fullness >= config.LOG_DB_SAMPLE_THRESHOLD:
+            self._sample_count += 1
+            if self._sample_count % config.LOG_DB_SAMPLE_RATE != 0:
+                self.sampled_out += 1
+                return
+        self._writer.put(row)
 
     def emit(self, record):
         # Bare except just seems to be the done thing for custom loggers.
         # pylint: disable=bare-except
+        if record.module == "batch_writer":
+            # Failing to write logs would otherwise log more logs to write.
+            return
         try:
-            msg = self.format(record)
-            self.loop.create_task(self.fire(msg))
+            row = tuple(self.format(record).split(" | ", 4))
+            if len(row) != 5:
+                # Not a log that fits our custom format.
+                return
+            if threading.get_ident() == self._loop_thread_id:
+                self._enqueue(record.levelno, row)
+            else:
+                self.loop.call_soon_threadsafe(self._enqueue, record.levelno, row)
         except (KeyboardInterrupt, SystemExit):
             raise
         except:
@@ -0,0 +1,199 @@
+"""Just enough of Prometheus to export counters and histograms.
+
+Metrics are created from a Registry, which renders all of them in the text
+exposition format, see https://prometheus.io/docs/instrumenting/exposition_formats/.
+"""
+
+import bisect
+import math
+import time
+from contextlib import contextmanager
+from typing import Iterator, Sequence
+
+# The defaults that the official clients use, in seconds.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value))
+
+
+def _escape(value: str, quotes: bool = True) -> str:
+    value = value.replace("\\", "\\\\").replace("\n", "\\n")
+    # Only label values are quoted, so help text doesn't escape them.
+    return value.replace('"', '\\"') if quotes else value
+
+
+def _format_labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items())
+    return "{" + pairs + "}"
+
+
+class _CounterValue:  # pylint: disable=too-few-public-methods
+    def __init__(self) -> None:
+        self.value = 0.0
+
+    def inc(self, amount: float = 1) -> None:
+        assert amount >= 0, "Counters can only go up"
+        self.value += amount
+
+
+class _HistogramValue:
+    def __init__(self, buckets: Sequence[float]):
+        self._buckets = buckets
+        # Not cumulative, the last is for anything above the largest bucket.
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self._buckets, value)] += 1
+        self.sum += value
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        """Observe how many seconds the body of the with statement takes."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+
+class _Metric:  # pylint: disable=too-few-public-methods
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str]):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: dict[tuple[str, ...], _CounterValue | _HistogramValue] = {}
+
+    def _new_value(self) -> _CounterValue | _HistogramValue:
+        raise NotImplementedError
+
+    def _value(self, labelvalues: Sequence[str]) -> _CounterValue | _HistogramValue:
+        labelvalues = tuple(labelvalues)
+        assert len(labelvalues) == len(self.labelnames), "Wrong number of labels"
+        if (value := self._values.get(labelvalues)) is None:
+            value = self._values[labelvalues] = self._new_value()
+        return value
+
+    def render(self) -> list[str]:
+        return [
+            f"# HELP {self.name} {_escape(self.documentation, quotes=False)}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+
+
+class Counter(_Metric):
+    """A value that only goes up, such as how many messages have been sent.
+
+    By convention the name should end in _total.
+    """
+
+    kind = "counter"
+
+    def _new_value(self) -> _CounterValue:
+        return _CounterValue()
+
+    def labels(self, *labelvalues: str) -> _CounterValue:
+        value = self._value(labelvalues)
+        assert isinstance(value, _CounterValue)
+        return value
+
+    def inc(self, amount: float = 1) -> None:
+        self.labels().inc(amount)
+
+    def render(self) -> list[str]:
+        lines = super().render()
+        for labelvalues, value in self._values.items():
+            assert isinstance(value, _CounterValue)
+            labels = _format_labels(dict(zip(self.labelnames, labelvalues)))
+            lines.append(f"{self.name}{labels} {_format_value(value.value)}")
+        return lines
+
+
+class Histogram(_Metric):
+    """Counts observations, such as how long requests take, into buckets."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str],
+        buckets: Sequence[float],
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_value(self) -> _HistogramValue:
+        return _HistogramValue(self.buckets)
+
+    def labels(self, *labelvalues: str) -> _HistogramValue:
+        value = self._value(labelvalues)
+        assert isinstance(value, _HistogramValue)
+        return value
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def time(self):
+        return self.labels().time()
+
+    def render(self) -> list[str]:
+        lines = super().render()
+        for labelvalues, value in self._values.items():
+            assert isinstance(value, _HistogramValue)
+            labels = dict(zip(self.labelnames, labelvalues))
+            cumulative = 0
+            for bound, count in zip((*self.buckets, math.inf), value.counts):
+                cumulative += count
+                bucket_labels = _format_labels({**labels, "le": _format_value(bound)})
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(
+                f"{self.name}_sum{_format_labels(labels)} {_format_value(value.sum)}"
+            )
+            lines.append(f"{self.name}_count{_format_labels(labels)} {cumulative}")
+        return lines
+
+
+class Registry:
+    """Creates metrics and renders them all together."""
+
+    def __init__(self) -> None:
+        self._metrics: dict[str, _Metric] = {}
+
+    def _register(self, metric: _Metric) -> None:
+        assert metric.name not in self._metrics, f"{metric.name} already exists"
+        self._metrics[metric.name] = metric
+
+    def counter(
+        self, name: str, documentation: str, labelnames: Sequence[str] = ()
+    ) -> Counter:
+        counter = Counter(name, documentation, labelnames)
+        self._register(counter)
+        return counter
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        histogram = Histogram(name, documentation, labelnames, buckets)
+        self._register(histogram)
+        return histogram
+
+    def render(self) -> str:
+        """Render every metric in the text exposition format."""
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,58 @@
+import asyncio
+import time
+
+
+class TokenBucket:
+    """An asyncio token bucket for keeping a request rate under an API limit.
+
+    Tokens are refilled continuously at `rate` per second, up to `capacity`.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+
+    async def acquire(self, tokens: float = 1) -> None:
+        """Wait until the given number of tokens are available, then take them."""
+        # The lock keeps waiters in FIFO order so a burst can't starve anyone.
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                await asyncio.sleep(self._wait_for(tokens))
+
+    def _wait_for(self, tokens: float) -> float:
+        return max(tokens - self._tokens, 0) / self.rate
+
+    def time_until(self, tokens: float = 1) -> float:
+        """How many seconds until the given number of tokens will be available."""
+        self._refill()
+        return self._wait_for(tokens)
+
+    def try_acquire(self, tokens: float = 1) -> bool:
+        """Take the given number of tokens if they are available, without waiting.
+
+        Returns:
+            A bool indicating if the tokens were taken or not.
+
+        """
+        if self._lock.locked():
+            # Don't jump ahead of anyone waiting in acquire.
+            return False
+        self._refill()
+        if self._tokens < tokens:
+            return False
+        self._tokens -= tokens
+        return True
@@ -0,0 +1,32 @@
+import asyncio
+from typing import Awaitable, Callable, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:  # pylint: disable=too-few-public-methods
+    """Lets concurrent callers share one in-flight call instead of each making one.
+
+    Calls are identified by a key, while a call for a key is running anyone else
+    asking for that key waits for, and gets, the same result.
+    """
+
+    def __init__(self) -> None:
+        self._in_flight: dict[Hashable, asyncio.Future] = {}
+        # Calls that were actually made.
+        self.executed = 0
+        # Calls that waited on one already in flight.
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[T]]) -> T:
+        """Call func, unless a call for key is already in flight then use its result."""
+        if (in_flight := self._in_flight.get(key)) is not None:
+            self.coalesced += 1
+            return await asyncio.shield(in_flight)
+
+        self.executed += 1
+        future = asyncio.ensure_future(func())
+        self._in_flight[key] = future
+        future.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        # Shielded so one caller being cancelled doesn't cancel it for everyone.
+        return await asyncio.shield(future)
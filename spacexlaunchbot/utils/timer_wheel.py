@@ -0,0 +1,150 @@
+import math
+from typing import Any, Hashable
+
+
+class TimerWheel:
+    """A hierarchical timing wheel, for holding a lot of timers cheaply.
+
+    Time is split into ticks. The first wheel has a slot for each of the next `slots`
+    ticks, each wheel after that has slots that are `slots` times longer than the
+    last. A timer is put in the slot of the smallest wheel that reaches its expiry,
+    and is moved down to a smaller wheel when the one below wraps around to it. This
+    makes scheduling and cancelling O(1), and each timer is moved at most `levels`
+    times before it expires.
+
+    Timers further off than the largest wheel reaches are put in its furthest slot,
+    and put back in the wheel again when they get there.
+
+    See http://www.cs.columbia.edu/~nahum/w6998/papers/sosp87-timing-wheels.pdf
+    """
+
+    def __init__(self, start: float, tick: float = 1, slots: int = 64, levels: int = 4):
+        """
+        Args:
+            start: The time to count ticks from.
+            tick: How long each tick is, the precision of the timers.
+            slots: How many slots there are in each wheel.
+            levels: How many wheels there are.
+
+        """
+        self.tick = tick
+        self._start = start
+        self._slots = slots
+        self._wheels: list[list[dict[Hashable, tuple[int, Any]]]] = [
+            [{} for _ in range(slots)] for _ in range(levels)
+        ]
+        # Which wheel and slot each timer is in, so it can be found to cancel.
+        self._where: dict[Hashable, tuple[int, int]] = {}
+        # How many ticks have been processed.
+        self._now = 0
+
+    def __len__(self) -> int:
+        return len(self._where)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._where
+
+    @property
+    def next_due_at(self) -> float:
+        """The time advance next has anything to do, or inf if there are no timers.
+
+        That is when the first timer expires, or when one is moved down from a larger
+        wheel, so it can be earlier than any timer expires.
+        """
+        return self._start + self._next_event() * self.tick
+
+    def _next_event(self) -> float:
+        """The next tick that expires or moves a timer, or inf if there are none."""
+        if not self._where:
+            return math.inf
+        first = math.inf
+        for level, wheel in enumerate(self._wheels):
+            span = self._slots**level
+            position = self._now // span
+            # Each slot is reached again after a full turn of its wheel.
+            for ahead in range(1, self._slots + 1):
+                if wheel[(position + ahead) % self._slots]:
+                    first = min(first, (position + ahead) * span)
+                    break
+        return first
+
+    def schedule(self, key: Hashable, when: float, value: Any) -> None:
+        """Add a timer, replacing any timer that already has the same key.
+
+        Args:
+            key: Identifies the timer, to cancel or replace it.
+            when: The time it expires, if this has passed it expires on the next tick.
+            value: Returned by advance when it expires.
+
+        """
+        self.cancel(key)
+        expires = max(math.ceil((when - self._start) / self.tick), self._now + 1)
+        self._insert(key, expires, value)
+
+    def cancel(self, key: Hashable) -> bool:
+        """Remove a timer, returns False if there wasn't one with the given key."""
+        if (where := self._where.pop(key, None)) is None:
+            return False
+        level, slot = where
+        del self._wheels[level][slot][key]
+        return True
+
+    def clear(self) -> None:
+        for wheel in self._wheels:
+            for slot in wheel:
+                slot.clear()
+        self._where.clear()
+
+    def _insert(self, key: Hashable, expires: int, value: Any) -> None:
+        delta = expires - self._now
+        level, span = 0, self._slots
+        while delta >= span and level < len(self._wheels) - 1:
+            level += 1
+            span *= self._slots
+        # Slot by where it would be if it fit, it is put back when it gets there.
+        position = min(expires, self._now + span - 1)
+        slot = (position // (span // self._slots)) % self._slots
+        self._wheels[level][slot][key] = (expires, value)
+        self._where[key] = (level, slot)
+
+    def _take(self, level: int, slot: int) -> dict[Hashable, tuple[int, Any]]:
+        timers = self._wheels[level][slot]
+        self._wheels[level][slot] = {}
+        for key in timers:
+            del self._where[key]
+        return timers
+
+    def advance(self, now: float) -> list:
+        """Process every tick up to the given time.
+
+        Args:
+            now: The current time.
+
+        Returns:
+            The values of the timers that expired, in the order they expired.
+
+        """
+        expired = []
+        target = math.floor((now - self._start) / self.tick)
+        while self._now < target:
+            if not self._wheels[0][(self._now + 1) % self._slots]:
+                # Nothing is moved or expires before the next event, so skip to it.
+                self._now = max(self._now, int(min(self._next_event(), target)) - 1)
+            self._now += 1
+
+            # Move timers down from any larger wheels that have reached a new slot,
+            # largest first so that they can keep moving down this tick.
+            for level in range(len(self._wheels) - 1, 0, -1):
+                span = self._slots**level
+                if self._now % span == 0:
+                    slot = (self._now // span) % self._slots
+                    for key, (expires, value) in self._take(level, slot).items():
+                        self._insert(key, expires, value)
+
+            for key, (expires, value) in self._take(0, self._now % self._slots).items():
+                if expires > self._now:
+                    # Further off than the largest wheel reached when it was added.
+                    self._insert(key, expires, value)
+                else:
+                    expired.append(value)
+        return expired
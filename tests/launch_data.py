@@ -0,0 +1,24 @@
+"""A trimmed down launch dict, in the shape returned by the LL2 upcoming endpoint."""
+
+from copy import deepcopy
+
+_LAUNCH_INFO = {
+    "id": "e3df2ecd-c239-472f-95e4-2b89b4f75800",
+    "name": "Falcon 9 Block 5 | Starlink Group 6-1",
+    "net": "2023-01-19T15:00:00+00:00",
+    "status": {"id": 1, "name": "Go for Launch"},
+    "agency_launch_attempt_count": 210,
+    "rocket": {"configuration": {"name": "Falcon 9", "full_name": "Falcon 9 Block 5"}},
+    "mission": {
+        "name": "Starlink Group 6-1",
+        "type": "Communications",
+        "description": "A batch of satellites for the Starlink constellation.",
+        "orbit": {"name": "Low Earth Orbit"},
+    },
+    "pad": {"name": "Space Launch Complex 40"},
+}
+
+
+def launch_info() -> dict:
+    """Get a fresh copy of the example launch dict."""
+    return deepcopy(_LAUNCH_INFO)
@@ -0,0 +1,57 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+from spacexlaunchbot.utils import BatchWriter
+
+
+class RecordingPool:
+    """Stands in for an asyncpg.Pool, recording each batch that is copied."""
+
+    def __init__(self):
+        self.batches = []
+
+    @asynccontextmanager
+    async def acquire(self):
+        yield self
+
+    async def copy_records_to_table(self, table, *, records, columns):
+        self.batches.append((table, tuple(columns), list(records)))
+
+
+def test_batch_writer_flushes_on_size_and_close():
+    pool = RecordingPool()
+
+    async def run():
+        writer = BatchWriter.copy_to(
+            pool, "metrics", ("a", "b"), max_batch_size=3, max_delay=60, max_queued=10
+        )
+        writer.start()
+        for n in range(4):
+            assert writer.put((n, str(n)))
+        await asyncio.sleep(0)
+        await writer.close()
+        assert writer.put((5, "5")) is False
+        return writer
+
+    writer = asyncio.run(run())
+    assert [len(batch) for _, _, batch in pool.batches] == [3, 1]
+    assert pool.batches[0][:2] == ("metrics", ("a", "b"))
+    assert writer.dropped == 1
+
+
+def test_batch_writer_drops_when_full():
+    pool = RecordingPool()
+
+    async def run():
+        writer = BatchWriter.copy_to(
+            pool, "metrics", ("a",), max_batch_size=10, max_delay=0.01, max_queued=2
+        )
+        results = [writer.put((n,)) for n in range(3)]
+        writer.start()
+        await writer.close()
+        return writer, results
+
+    writer, results = asyncio.run(run())
+    assert results == [True, True, False]
+    assert writer.dropped == 1
+    assert [batch for _, _, batch in pool.batches] == [[(0,), (1,)]]
@@ -0,0 +1,98 @@
+import asyncio
+
+import aiohttp
+from aiohttp import web
+
+from spacexlaunchbot import config
+from spacexlaunchbot.apis import bot_lists
+
+
+def test_bot_list_posts_are_debounced_and_backed_off(monkeypatch):
+    posts = []
+
+    async def handle(request):
+        posts.append((request.match_info["name"], await request.json()))
+        if request.match_info["name"] == "busy" and len(posts) < 3:
+            return web.Response(status=429, headers={"Retry-After": "0.2"})
+        return web.Response()
+
+    async def run():
+        app = web.Application()
+        app.router.add_post("/{name}", handle)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+
+        monkeypatch.setattr(config, "INDEV", False)
+        monkeypatch.setattr(config, "BOT_LIST_POST_DELAY", 0.1)
+        monkeypatch.setattr(
+            config,
+            "BOT_LIST_DATA",
+            [
+                {
+                    "url": f"http://127.0.0.1:{port}/{name}",
+                    "token": "token",
+                    "guild_count_parameter": "count",
+                }
+                for name in ("quiet", "busy")
+            ],
+        )
+        try:
+            for guild_count in range(1, 6):
+                bot_lists.report_guild_count(guild_count)
+            await asyncio.sleep(0.5)
+            # Unchanged, so nothing is posted.
+            bot_lists.report_guild_count(5)
+            await asyncio.sleep(0.2)
+        finally:
+            await bot_lists.close_session()
+            await runner.cleanup()
+
+    asyncio.run(run())
+    assert sorted(posts) == [
+        ("busy", {"count": 5}),
+        ("busy", {"count": 5}),
+        ("quiet", {"count": 5}),
+    ]
+
+
+def test_bot_list_timeouts_are_backed_off(monkeypatch):
+    async def handle(_):
+        await asyncio.sleep(1)
+        return web.Response()
+
+    async def run():
+        app = web.Application()
+        app.router.add_post("/slow", handle)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        url = f"http://127.0.0.1:{port}/slow"
+
+        monkeypatch.setattr(config, "INDEV", False)
+        monkeypatch.setattr(config, "BOT_LIST_POST_DELAY", 0.1)
+        monkeypatch.setattr(
+            config,
+            "BOT_LIST_DATA",
+            [{"url": url, "token": "token", "guild_count_parameter": "count"}],
+        )
+        monkeypatch.setattr(
+            bot_lists,
+            "_SESSION",
+            aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=0.1)),
+        )
+        try:
+            bot_lists.report_guild_count(1)
+            await asyncio.sleep(0.4)
+            # Still waiting to post again, rather than having died with the timeout.
+            assert bot_lists._FLUSH_TASK is not None
+            assert url in bot_lists._RETRY_AT
+        finally:
+            await bot_lists.close_session()
+            await runner.cleanup()
+
+    asyncio.run(run())
@@ -0,0 +1,59 @@
+import asyncio
+
+import discord
+import pytest
+from aiohttp import web
+from discord.http import HTTPClient, Route
+
+from spacexlaunchbot.apis import channels
+from spacexlaunchbot.notifications import PreparedMessage
+
+
+def test_send_message_makes_the_same_request_as_channel_send(monkeypatch):
+    requests = []
+
+    async def handle_me(_):
+        return web.json_response({"id": "1", "username": "bot"})
+
+    async def handle_message(request):
+        requests.append(
+            (
+                request.path,
+                request.headers["Content-Type"],
+                request.headers["Authorization"],
+                await request.read(),
+            )
+        )
+        if request.match_info["channel_id"] == "403":
+            return web.json_response(
+                {"message": "Missing Access", "code": 50001}, status=403
+            )
+        return web.json_response({"id": "2"})
+
+    async def run():
+        app = web.Application()
+        app.router.add_get("/users/@me", handle_me)
+        app.router.add_post("/channels/{channel_id}/messages", handle_message)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        monkeypatch.setattr(Route, "BASE", f"http://127.0.0.1:{port}")
+
+        http = HTTPClient(asyncio.get_running_loop())
+        await http.static_login("token")
+        try:
+            await channels.send_message(http, 1, body)
+            with pytest.raises(discord.Forbidden):
+                await channels.send_message(http, 403, body)
+        finally:
+            await http.close()
+            await runner.cleanup()
+
+    body = PreparedMessage(discord.Embed(title="Launch")).body("<@&2>", None)
+    asyncio.run(run())
+    assert requests == [
+        ("/channels/1/messages", "application/json", "Bot token", body),
+        ("/channels/403/messages", "application/json", "Bot token", body),
+    ]
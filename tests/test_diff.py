@@ -0,0 +1,54 @@
+from spacexlaunchbot.embeds import (
+    ScheduleChanges,
+    cached_schedule_embed,
+    diff_schedule_embed_dicts,
+)
+
+from .launch_data import launch_info
+
+
+def _fields(*fields):
+    return {"title": "Launch", "fields": [{"name": n, "value": v} for n, v in fields]}
+
+
+def test_diff_no_changes():
+    _, embed_dict = cached_schedule_embed(launch_info())
+    changes = diff_schedule_embed_dicts(embed_dict, embed_dict)
+    assert not changes
+    assert changes.summary() == ""
+
+
+def test_diff_ignores_parts_that_are_not_compared():
+    old = _fields(("Launch Status", "Go"))
+    new = _fields(("Launch Status", "Go"))
+    new["description"] = ""
+    new["fields"][0]["inline"] = True
+    assert not diff_schedule_embed_dicts(old, new)
+
+
+def test_diff_from_empty_adds_everything():
+    _, embed_dict = cached_schedule_embed(launch_info())
+    changes = diff_schedule_embed_dicts({}, embed_dict)
+    assert changes.added[:2] == ("title", "description")
+    assert changes.changed == changes.removed == ()
+    assert changes.summary().startswith("Changed: title + ")
+
+
+def test_diff_detects_changed_field():
+    info = launch_info()
+    _, old = cached_schedule_embed(info)
+    info["status"]["name"] = "To Be Confirmed"
+    _, new = cached_schedule_embed(info)
+    changes = diff_schedule_embed_dicts(old, new)
+    assert changes == ScheduleChanges(changed=("Launch Status",))
+    assert changes.summary() == "Changed: Launch Status"
+
+
+def test_diff_handles_repeated_and_removed_fields():
+    old = _fields(("Core Info", "B1"), ("Core Info", "B2"), ("Payload", "P"))
+    new = _fields(("Core Info", "B1"), ("Core Info", "B3"), ("Core Info", "B4"))
+    changes = diff_schedule_embed_dicts(old, new)
+    assert changes.changed == ("Core Info 2",)
+    assert changes.added == ("Core Info 3",)
+    assert changes.removed == ("Payload",)
+    assert changes.summary() == "Changed: Core Info 2 + 2 more"
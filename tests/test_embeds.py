@@ -1,4 +1,6 @@
-from spacexlaunchbot.embeds import BetterEmbed
+from spacexlaunchbot.embeds import BetterEmbed, cached_schedule_embed
+
+from .launch_data import launch_info
 
 
 def test_embed_is_valid():
@@ -12,3 +14,45 @@ def test_embed_is_invalid():
     assert BetterEmbed(title="a" * 257).size_ok() is False
     assert BetterEmbed(description="a" * 2049).size_ok() is False
     assert BetterEmbed(fields=[["a", "a"]] * 26).size_ok() is False
+
+
+def test_cached_schedule_embed_rebuilt_when_launch_changes():
+    info = launch_info()
+    embed, embed_dict = cached_schedule_embed(info)
+    assert embed_dict == embed.to_dict()
+
+    # Fields the embed doesn't show don't cause a rebuild.
+    info["status"]["id"] = 3
+    assert cached_schedule_embed(info)[0] is embed
+
+    info["net"] = "2023-01-20T15:00:00+00:00"
+    new_embed, new_embed_dict = cached_schedule_embed(info)
+    assert new_embed is not embed
+    assert new_embed_dict != embed_dict
+
+
+def test_embed_size_tracked_as_fields_change():
+    embed = BetterEmbed(description="a" * 2000)
+    for _ in range(3):
+        embed.add_field(name="a", value="a" * 1000)
+    assert embed.size_ok() is True
+    embed.add_field(name="a", value="a" * 1000)
+    assert embed.size_ok() is False
+    embed.remove_field(3)
+    assert embed.size_ok() is True
+    assert BetterEmbed.from_dict(embed.to_dict()).size_ok() is True
+    embed.set_field_at(0, name="a", value="a" * 1025)
+    assert embed.size_ok() is False
+
+
+def test_embed_truncated_to_fit():
+    embed = BetterEmbed(
+        title="a" * 300,
+        description="a" * 3000,
+        fields=[["a", "a" * 2000]] * 30,
+        truncate=True,
+    )
+    assert embed.size_ok() is True
+    assert len(embed.title) == 256
+    assert embed.title.endswith("…")
+    assert BetterEmbed(title="a", truncate=True).to_dict()["title"] == "a"
@@ -0,0 +1,30 @@
+import asyncio
+
+from spacexlaunchbot.fanout import Fanout, FanoutStats
+
+
+def test_fanout_bounds_concurrency():
+    in_flight = 0
+    max_in_flight = 0
+
+    async def deliver(target: int) -> bool:
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0)
+        in_flight -= 1
+        return target % 10 != 0
+
+    stats = asyncio.run(Fanout(4, 1000).run(range(100), deliver))
+    assert max_in_flight == 4
+    assert stats.delivered == 90
+    assert stats.failed == 10
+    assert len(stats.latencies) == 100
+
+
+def test_fanout_stats_percentile():
+    stats = FanoutStats(latencies=[float(n) for n in range(1, 101)])
+    assert stats.percentile(50) == 50
+    assert stats.percentile(99) == 99
+    assert stats.percentile(100) == 100
+    assert FanoutStats().percentile(99) == 0
@@ -0,0 +1,89 @@
+import asyncio
+
+from aiohttp.test_utils import TestClient, TestServer
+
+from spacexlaunchbot import config, healthcheck, telemetry
+from spacexlaunchbot.utils import Registry
+
+
+class FakeClient:
+    user = "bot"
+
+    def __init__(self, latency=0.1):
+        self.latency = latency
+
+    @staticmethod
+    def is_ready():
+        return True
+
+    @staticmethod
+    def is_closed():
+        return False
+
+
+def test_registry_renders_text_format():
+    registry = Registry()
+    sends = registry.counter("sends_total", "Messages sent.", ("result",))
+    sends.labels("sent").inc()
+    sends.labels("sent").inc(2)
+    sends.labels('say "hi"').inc()
+    seconds = registry.histogram("send_seconds", "Send time.", buckets=(0.1, 1))
+    seconds.observe(0.05)
+    seconds.observe(0.1)
+    seconds.observe(5)
+
+    assert registry.render().splitlines() == [
+        "# HELP sends_total Messages sent.",
+        "# TYPE sends_total counter",
+        'sends_total{result="sent"} 3.0',
+        'sends_total{result="say \\"hi\\""} 1.0',
+        "# HELP send_seconds Send time.",
+        "# TYPE send_seconds histogram",
+        'send_seconds_bucket{le="0.1"} 2',
+        'send_seconds_bucket{le="1.0"} 2',
+        'send_seconds_bucket{le="+Inf"} 3',
+        "send_seconds_sum 5.15",
+        "send_seconds_count 3",
+    ]
+
+
+def test_healthcheck_serves_health_and_metrics():
+    telemetry.CHANNELS_PRUNED.labels("forbidden").inc()
+
+    async def run():
+        client = FakeClient()
+        async with TestClient(TestServer(healthcheck.create_app(client))) as http:
+            health = await http.get("/health")
+            metrics = await http.get("/metrics")
+            not_found = await http.get("/nope")
+            not_allowed = await http.post("/metrics")
+            client.latency = 1
+            unhealthy = await http.get("/health")
+            return (
+                (health.status, await health.text()),
+                (metrics.status, metrics.headers["Content-Type"], await metrics.text()),
+                not_found.status,
+                not_allowed.status,
+                (unhealthy.status, await unhealthy.text()),
+            )
+
+    health, metrics, not_found, not_allowed, unhealthy = asyncio.run(run())
+    assert health == (200, "healthy\n")
+    assert unhealthy == (503, "unhealthy\n")
+    assert metrics[:2] == (200, "text/plain; version=0.0.4; charset=utf-8")
+    assert '\nslb_channels_pruned_total{reason="forbidden"} ' in metrics[2]
+    assert not_found == 404
+    assert not_allowed == 405
+
+
+def test_healthcheck_server_starts_and_stops(monkeypatch):
+    monkeypatch.setattr(config, "HEALTHCHECK_PORT", 0)
+
+    async def run():
+        runner = await healthcheck.start(FakeClient())
+        try:
+            return [site.name for site in runner.sites]
+        finally:
+            await runner.cleanup()
+
+    assert len(asyncio.run(run())) == 1
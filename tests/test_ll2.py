@@ -0,0 +1,38 @@
+import asyncio
+import logging
+
+from spacexlaunchbot.apis import ll2
+from spacexlaunchbot.utils import TokenBucket
+
+from .launch_data import launch_info
+
+
+def test_failed_update_keeps_serving_the_last_launches(monkeypatch):
+    index = ll2._LaunchIndex()
+    monkeypatch.setattr(ll2, "_INDEX", index)
+
+    async def failed_update():
+        return False
+
+    monkeypatch.setattr(ll2, "_update_index", failed_update)
+    assert asyncio.run(ll2.get_launch_dict()) == {}
+
+    launch = launch_info()
+    index.update([launch], None, None)
+    assert asyncio.run(ll2.get_launch_dict(max_age=0)) == launch
+    assert asyncio.run(ll2.get_launch_dict(launch["id"], max_age=0)) == launch
+    # Still out of date, so the next lookup tries again.
+    assert index.age > 0
+
+
+def test_out_of_budget_is_only_logged_once(monkeypatch, caplog):
+    budget = TokenBucket(1 / 3600, 1)
+    assert budget.try_acquire()
+    monkeypatch.setattr(ll2, "_BUDGET", budget)
+    monkeypatch.setattr(ll2, "_OUT_OF_BUDGET", False)
+
+    with caplog.at_level(logging.WARNING):
+        for _ in range(3):
+            assert asyncio.run(ll2._update_index()) is False
+    assert len(caplog.records) == 1
+    assert 3590 < ll2.request_wait() <= 3600
@@ -0,0 +1,253 @@
+import asyncio
+import datetime
+import json
+import time
+
+import discord
+import pytest
+from discord.http import handle_message_parameters
+
+from spacexlaunchbot import config, notifications
+from spacexlaunchbot.notifications import (
+    NotificationType,
+    PreparedMessage,
+    ReminderScheduler,
+    notification_channels,
+    notification_from_payload,
+    notification_payload,
+    parse_reminder_offsets,
+    poll_interval,
+)
+from spacexlaunchbot.storage import SubscriptionOptions
+
+from .launch_data import launch_info
+
+
+def _launching_in(minutes: float) -> dict:
+    net = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(
+        minutes=minutes
+    )
+    return {"net": net.isoformat()}
+
+
+def test_poll_interval_shrinks_as_launch_gets_closer():
+    far = poll_interval(_launching_in(7 * 24 * 60))
+    hour = poll_interval(_launching_in(60))
+    soon = poll_interval(_launching_in(5))
+    assert far == 60 * config.NOTIF_TASK_MAX_INTERVAL
+    assert far > hour > soon
+    assert soon == 60 * config.NOTIF_TASK_MIN_INTERVAL
+    assert poll_interval(_launching_in(-10)) == soon
+    assert poll_interval({}) == soon
+    assert poll_interval({"net": ""}) == far
+
+
+def test_poll_interval_waits_for_ll2_budget(monkeypatch):
+    monkeypatch.setattr(notifications.ll2, "request_wait", lambda: 20 * 60)
+    assert poll_interval(_launching_in(5)) == 20 * 60
+    assert poll_interval({}) == 20 * 60
+    assert poll_interval({"net": ""}) == 60 * config.NOTIF_TASK_MAX_INTERVAL
+
+
+class FakeDataStore:
+    def __init__(self):
+        self.vars = (False, {})
+
+    async def get_notification_task_vars(self):
+        return self.vars
+
+    async def set_notification_task_vars(self, sent, schedule_embed_dict):
+        self.vars = (sent, schedule_embed_dict)
+
+
+class FakeClient:
+    def __init__(self):
+        self.ds = FakeDataStore()
+        self.sent = []
+        self.tasks = set()
+
+    def run_in_background(self, coro):
+        self.tasks.add(asyncio.get_running_loop().create_task(coro))
+
+    async def send_notification(self, _, notification_type, channel_ids):
+        self.sent.append((notification_type, channel_ids))
+
+
+class FakeClock:
+    """Stands in for time.time and asyncio.sleep, only moving when advanced."""
+
+    def __init__(self):
+        self.now = float(int(time.time()))
+        # How long each call to sleep asked to sleep for.
+        self.sleeps = []
+        self._real_sleep = asyncio.sleep
+
+    def time(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        wake_at = self.now + seconds
+        while self.now < wake_at:
+            await self._real_sleep(0)
+
+    async def advance(self, seconds, step=0.1):
+        for _ in range(round(seconds / step)):
+            self.now += step
+            for _ in range(3):
+                await self._real_sleep(0)
+
+
+@pytest.fixture(name="clock")
+def fixture_clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(notifications.time, "time", clock.time)
+    monkeypatch.setattr(asyncio, "sleep", clock.sleep)
+    return clock
+
+
+def _go_for_launch(monkeypatch) -> dict:
+    info = launch_info()
+    info["status"]["id"] = 1
+
+    async def get_launch_dict(launch):
+        assert launch == info["id"]
+        return info
+
+    monkeypatch.setattr(notifications.ll2, "get_launch_dict", get_launch_dict)
+    return info
+
+
+def _set_launch_time(info: dict, launch_timestamp: int) -> None:
+    info["net"] = datetime.datetime.fromtimestamp(
+        launch_timestamp, datetime.timezone.utc
+    ).isoformat()
+
+
+def test_prepared_message_bodies_match_discord_py():
+    mentions = "<@&1> @here"
+    allowed = SubscriptionOptions(
+        NotificationType.all, mentions, 0
+    ).launch_allowed_mentions
+    embed = discord.Embed(title="Launch", description="Soon")
+    message = PreparedMessage(embed)
+
+    # Reused for every channel with the same mentions.
+    assert message.body("", None) is message.body("", None)
+    for content, allowed_mentions in ((None, None), (mentions, allowed)):
+        with handle_message_parameters(
+            content=content, embed=embed, allowed_mentions=allowed_mentions
+        ) as params:
+            expected = {k: v for k, v in params.payload.items() if v is not None}
+        del expected["tts"]
+        assert json.loads(message.body(content or "", allowed_mentions)) == expected
+
+    text = PreparedMessage("Launching soon")
+    assert json.loads(text.body("", None)) == {"content": "Launching soon"}
+    assert json.loads(text.body(mentions, allowed))["content"] == (
+        "Launching soon\n<@&1> @here"
+    )
+
+
+def test_parse_reminder_offsets():
+    assert parse_reminder_offsets("10m, 24h 1h,60") == (1440, 60, 10)
+    for invalid in ["", "0m", "1w", "1h 2h 3h 4h 5h 6h", "200h"]:
+        with pytest.raises(ValueError):
+            parse_reminder_offsets(invalid)
+
+
+def test_reminders_fire_once_per_offset_for_latest_launch_time(monkeypatch, clock):
+    info = _go_for_launch(monkeypatch)
+    subscriptions = {
+        1: SubscriptionOptions(NotificationType.launch, "", 1),
+        2: SubscriptionOptions(NotificationType.all, "", 1, (60, 30)),
+    }
+
+    async def run():
+        client = FakeClient()
+        reminders = ReminderScheduler(client)
+        # So the T-30m reminder is never already due when armed.
+        soon = int(clock.now) + 30 * 60 + 2
+        # Moved before the timers fire, only the new time should be sent.
+        reminders.arm(info["id"], soon + 60, subscriptions, catch_up=True)
+        _set_launch_time(info, soon)
+        reminders.arm(info["id"], soon, subscriptions, catch_up=True)
+        await clock.advance(0.1)
+        # The T-60m reminder was already due, so it is caught up straight away.
+        reminders.arm(info["id"], soon, subscriptions, catch_up=False)
+        await clock.advance(2.5)
+        await asyncio.gather(*client.tasks)
+        return client
+
+    client = asyncio.run(run())
+    assert client.sent == [
+        (NotificationType.launch, {2}),
+        (NotificationType.launch, {1, 2}),
+    ]
+    assert client.ds.vars[0] is True
+
+
+def test_reminders_catch_up_each_channels_latest_due_offset(monkeypatch, clock):
+    info = _go_for_launch(monkeypatch)
+    subscriptions = {
+        1: SubscriptionOptions(NotificationType.launch, "", 1, (1440,)),
+        2: SubscriptionOptions(NotificationType.launch, "", 1, (60,)),
+        3: SubscriptionOptions(NotificationType.launch, "", 1, (1440, 60)),
+        4: SubscriptionOptions(NotificationType.launch, "", 1, (1440, 10)),
+    }
+
+    async def run():
+        client = FakeClient()
+        reminders = ReminderScheduler(client)
+        launch_timestamp = int(clock.now) + 45 * 60
+        _set_launch_time(info, launch_timestamp)
+        reminders.arm(info["id"], launch_timestamp, subscriptions, catch_up=True)
+        await clock.advance(1.5)
+        await asyncio.gather(*client.tasks)
+        return client
+
+    client = asyncio.run(run())
+    # Channel 4's T-10m reminder isn't due yet, so its T-24h one is caught up.
+    assert client.sent == [
+        (NotificationType.launch, {1, 4}),
+        (NotificationType.launch, {2, 3}),
+    ]
+
+
+def test_reminders_sleep_until_they_are_due(monkeypatch, clock):
+    info = _go_for_launch(monkeypatch)
+    subscriptions = {1: SubscriptionOptions(NotificationType.launch, "", 1, (30,))}
+
+    async def run():
+        client = FakeClient()
+        reminders = ReminderScheduler(client)
+        launch_timestamp = int(clock.now) + 24 * 60 * 60
+        _set_launch_time(info, launch_timestamp)
+        reminders.arm(info["id"], launch_timestamp, subscriptions, catch_up=False)
+        await clock.advance(60, step=60)
+        assert clock.sleeps[-1] > 60 * 60
+
+        # Due long before the one it is sleeping until, so it is woken for it.
+        subscriptions[2] = SubscriptionOptions(NotificationType.launch, "", 1, (1430,))
+        reminders.arm(info["id"], launch_timestamp, subscriptions, catch_up=False)
+        await clock.advance(10 * 60, step=60)
+        await asyncio.gather(*client.tasks)
+        assert client.sent == [(NotificationType.launch, {2})]
+
+        await clock.advance(24 * 60 * 60 - 40 * 60, step=60)
+        await asyncio.gather(*client.tasks)
+        return client
+
+    client = asyncio.run(run())
+    assert client.sent == [
+        (NotificationType.launch, {2}),
+        (NotificationType.launch, {1}),
+    ]
+    assert len(clock.sleeps) < 10
+
+
+def test_notification_payload_round_trips_channels():
+    payload = json.loads(json.dumps(notification_payload("Hello", {3, 1})))
+    assert notification_from_payload(payload) == "Hello"
+    assert notification_channels(payload) == {1, 3}
+    assert notification_channels(notification_payload("Hello")) is None
@@ -0,0 +1,209 @@
+import asyncio
+import time
+
+from spacexlaunchbot import config
+from spacexlaunchbot.fanout import Fanout
+from spacexlaunchbot.notifications import NotificationType
+from spacexlaunchbot.outbox import Outbox, _after_attempt
+from spacexlaunchbot.storage import (
+    Delivery,
+    DeliveryState,
+    SQLiteDataStore,
+    SubscriptionOptions,
+)
+
+
+class FakeChannel:  # pylint: disable=too-few-public-methods
+    def __init__(self, channel_id, *results):
+        self.id = channel_id  # pylint: disable=invalid-name
+        # The result of each send, delivered once these run out.
+        self.results = list(results)
+        self.sent = []
+        self.allowed_mentions = None
+
+    async def send(self, to_send, mentions, allowed_mentions):
+        self.sent.append((to_send, mentions))
+        self.allowed_mentions = allowed_mentions
+        return self.results.pop(0) if self.results else DeliveryState.delivered
+
+
+class FakeClient:
+    def __init__(self, ds, channels):
+        self.ds = ds
+        self.fanout = Fanout(4, 1e9)
+        self.channels = {channel.id: channel for channel in channels}
+
+    def get_channel(self, channel_id):
+        return self.channels.get(channel_id)
+
+    @staticmethod
+    def owns_guild(guild_id):
+        return guild_id != 99
+
+
+async def _send(channel, message, mentions, allowed_mentions, _webhook):
+    return await channel.send(message.to_send, mentions, allowed_mentions)
+
+
+async def _states(ds):
+    async with ds.db.execute(
+        "select channel_id, state, attempts from notification_outbox;"
+    ) as cursor:
+        return {int(row[0]): (row[1], row[2]) for row in await cursor.fetchall()}
+
+
+def test_outbox_retries_and_resumes(monkeypatch, tmp_path):
+    monkeypatch.setattr(config, "NOTIF_RETRY_BASE_DELAY", 0)
+    channels = [
+        FakeChannel(1),
+        FakeChannel(2, DeliveryState.pending),
+        FakeChannel(3, DeliveryState.failed),
+        FakeChannel(4),
+    ]
+    subscription = SubscriptionOptions(NotificationType.all, "@here", 10)
+
+    async def run():
+        ds = SQLiteDataStore(":memory:", str(tmp_path / "slb.pkl"))
+        await ds.start()
+        outbox = Outbox(FakeClient(ds, channels), _send)
+
+        stats = await outbox.deliver(
+            "Hello",
+            NotificationType.launch,
+            [(channel, subscription) for channel in channels[:3]],
+        )
+        after_deliver = await _states(ds)
+
+        # Left pending by a restart, and one owned by another process.
+        await ds.add_notification(
+            NotificationType.schedule, {"content": "Again"}, [(4, 10, ""), (5, 99, "")]
+        )
+        drained = await outbox.drain()
+        after_drain = await _states(ds)
+        drained_again = await outbox.drain()
+
+        await ds.stop()
+        return stats, after_deliver, drained, after_drain, drained_again
+
+    stats, after_deliver, drained, after_drain, drained_again = asyncio.run(run())
+
+    assert (stats.delivered, stats.failed) == (1, 2)
+    assert after_deliver == {
+        1: ("delivered", 1),
+        2: ("pending", 1),
+        3: ("failed", 1),
+    }
+    assert drained == 2
+    assert after_drain[2] == ("delivered", 2)
+    assert after_drain[4] == ("delivered", 1)
+    assert after_drain[5] == ("pending", 0)
+    assert drained_again == 0
+    # Mentions are sent in the same message as the notification.
+    assert channels[0].sent == [("Hello", "@here")]
+    assert channels[1].sent == [("Hello", "@here"), ("Hello", "@here")]
+    assert channels[2].sent == [("Hello", "@here")]
+    assert channels[3].sent == [("Again", "")]
+    assert channels[1].allowed_mentions.everyone
+    assert not channels[3].allowed_mentions.everyone
+
+
+def test_drain_leaves_notifications_being_sent_alone(tmp_path):
+    channels = [FakeChannel(channel_id) for channel_id in range(1, 5)]
+    subscription = SubscriptionOptions(NotificationType.all, "", 10)
+
+    async def run():
+        ds = SQLiteDataStore(":memory:", str(tmp_path / "slb.pkl"))
+        await ds.start()
+        outbox = Outbox(FakeClient(ds, channels), _send)
+
+        # Hold up writing the results of the fan-out.
+        writing = asyncio.Event()
+        written = asyncio.Event()
+        update_deliveries = ds.update_deliveries
+
+        async def slow_update_deliveries(deliveries):
+            deliveries = list(deliveries)
+            if deliveries and not written.is_set():
+                writing.set()
+                # Times out if a drain sends them again, and so writes more results.
+                await asyncio.wait_for(written.wait(), 1)
+            await update_deliveries(deliveries)
+
+        ds.update_deliveries = slow_update_deliveries
+        deliver = asyncio.create_task(
+            outbox.deliver(
+                "Hello",
+                NotificationType.schedule,
+                [(channel, subscription) for channel in channels[:2]],
+            )
+        )
+        await writing.wait()
+        during_write = await outbox.drain()
+        written.set()
+        await deliver
+
+        # Left pending by a restart, then drained twice at the same time.
+        await ds.add_notification(
+            NotificationType.schedule, {"content": "Again"}, [(3, 10, ""), (4, 10, "")]
+        )
+        concurrent = await asyncio.gather(outbox.drain(), outbox.drain())
+        await ds.stop()
+        return during_write, concurrent
+
+    during_write, concurrent = asyncio.run(run())
+    assert during_write == 0
+    assert sorted(concurrent) == [0, 2]
+    assert [channel.sent for channel in channels] == [
+        [("Hello", "")],
+        [("Hello", "")],
+        [("Again", "")],
+        [("Again", "")],
+    ]
+
+
+def test_retries_back_off_then_give_up(monkeypatch):
+    monkeypatch.setattr(config, "NOTIF_MAX_ATTEMPTS", 3)
+    monkeypatch.setattr(config, "NOTIF_RETRY_BASE_DELAY", 10)
+    monkeypatch.setattr(config, "NOTIF_RETRY_MAX_DELAY", 15)
+    delivery = Delivery(1, 2, 3, "")
+
+    delivery = _after_attempt(delivery, DeliveryState.pending)
+    assert delivery.state is DeliveryState.pending
+    assert 9 < delivery.next_attempt - time.time() <= 10
+    delivery = _after_attempt(delivery, DeliveryState.pending)
+    assert 14 < delivery.next_attempt - time.time() <= 15
+    delivery = _after_attempt(delivery, DeliveryState.pending)
+    assert delivery.state is DeliveryState.failed
+    assert delivery.attempts == 3
+
+
+def test_deliver_published_notification(tmp_path):
+    channel = FakeChannel(1)
+    subscription = SubscriptionOptions(NotificationType.all, "", 10)
+
+    async def run():
+        ds = SQLiteDataStore(":memory:", str(tmp_path / "slb.pkl"))
+        await ds.start()
+        # Like the cluster leader, which adds it before publishing its id.
+        notification_id = await ds.add_notification(
+            NotificationType.schedule, {"content": "Hello"}, []
+        )
+        stats = await Outbox(FakeClient(ds, [channel]), _send).deliver(
+            "Hello",
+            NotificationType.schedule,
+            [(channel, subscription)],
+            notification_id,
+        )
+        async with ds.db.execute(
+            "select notification_id, state from notification_outbox;"
+        ) as cursor:
+            rows = await cursor.fetchall()
+        async with ds.db.execute("select count(*) from notifications;") as cursor:
+            notifications = (await cursor.fetchone())[0]
+        await ds.stop()
+        return notification_id, stats, rows, notifications
+
+    notification_id, stats, rows, notifications = asyncio.run(run())
+    assert stats.delivered == 1
+    assert rows == [(notification_id, "delivered")]
+    assert notifications == 1
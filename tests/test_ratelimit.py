@@ -0,0 +1,19 @@
+from spacexlaunchbot.utils import ratelimit
+from spacexlaunchbot.utils.ratelimit import TokenBucket
+
+
+def test_token_bucket_never_exceeds_limit_in_any_hour(monkeypatch):
+    now = 0.0
+    monkeypatch.setattr(ratelimit.time, "monotonic", lambda: now)
+    # The LL2 budget, 15 per hour with 5 saved up.
+    bucket = TokenBucket(10 / 3600, 5)
+
+    taken = []
+    for second in range(0, 4 * 3600, 30):
+        now = float(second)
+        if bucket.try_acquire():
+            taken.append(second)
+
+    assert len(taken) > 15
+    for i, start in enumerate(taken):
+        assert len([t for t in taken[i:] if t < start + 3600]) <= 15
@@ -0,0 +1,76 @@
+import asyncio
+from types import SimpleNamespace
+
+from spacexlaunchbot import config
+from spacexlaunchbot.notifications import NotificationType
+from spacexlaunchbot.send_failures import SendFailures
+from spacexlaunchbot.storage import SQLiteDataStore
+
+
+def test_channels_forbidden_in_a_row_are_unsubscribed(monkeypatch, tmp_path):
+    monkeypatch.setattr(config, "NOTIF_MAX_FORBIDDEN", 2)
+
+    async def run():
+        ds = SQLiteDataStore(":memory:", str(tmp_path / "slb.pkl"))
+        await ds.start()
+        for channel_id in ("1", "2", "3"):
+            await ds.add_subbed_channel(
+                channel_id, "", "10", NotificationType.all, None
+            )
+        client = SimpleNamespace(ds=ds)
+
+        failures = SendFailures(client)
+        await failures.load()
+        failures.record(1, forbidden=True)
+        failures.record(2, forbidden=True)
+        failures.record(3, forbidden=False)
+        assert await failures.flush() == 0
+        saved = await ds.get_send_failures()
+
+        # Carried on after a restart, and a send that works starts it again.
+        failures = SendFailures(client)
+        await failures.load()
+        failures.record(1, forbidden=False)
+        failures.record(1, forbidden=True)
+        failures.record(2, forbidden=True)
+        removed = await failures.flush()
+        after = await ds.get_send_failures()
+        remaining = await ds.get_subbed_channels(NotificationType.all)
+
+        await ds.stop()
+        return saved, removed, after, remaining
+
+    saved, removed, after, remaining = asyncio.run(run())
+    assert saved == {1: 1, 2: 1}
+    assert removed == 1
+    assert after == {1: 1}
+    assert set(remaining) == {1, 3}
+
+
+def test_channels_that_recover_while_flushing_are_kept(monkeypatch):
+    monkeypatch.setattr(config, "NOTIF_MAX_FORBIDDEN", 1)
+    removed_ids = []
+
+    class FakeDataStore:
+        def __init__(self):
+            self.failures = None
+
+        async def set_send_failures(self, _):
+            # A send to channel 1 works while this is being written.
+            self.failures.record(1, forbidden=False)
+
+        async def remove_subbed_channels(self, channel_ids):
+            removed_ids.extend(channel_ids)
+            # Overlapping flush got to channel 2 first.
+            self.failures._counts.pop(2, None)  # pylint: disable=protected-access
+            return len(removed_ids)
+
+    async def run():
+        ds = FakeDataStore()
+        failures = ds.failures = SendFailures(SimpleNamespace(ds=ds))
+        failures.record(1, forbidden=True)
+        failures.record(2, forbidden=True)
+        return await failures.flush()
+
+    assert asyncio.run(run()) == 1
+    assert removed_ids == ["2"]
@@ -0,0 +1,25 @@
+import asyncio
+
+from spacexlaunchbot.utils import SingleFlight
+
+
+def test_singleflight_coalesces_concurrent_calls():
+    calls = 0
+
+    async def fetch() -> int:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return calls
+
+    async def run():
+        flight = SingleFlight()
+        results = await asyncio.gather(*(flight.do("key", fetch) for _ in range(5)))
+        # Once the first call has finished the next one is made again.
+        results.append(await flight.do("key", fetch))
+        return flight, results
+
+    flight, results = asyncio.run(run())
+    assert results == [1, 1, 1, 1, 1, 2]
+    assert flight.executed == 2
+    assert flight.coalesced == 4
@@ -0,0 +1,182 @@
+import asyncio
+import pickle
+import sqlite3
+
+import pytest
+
+from spacexlaunchbot.notifications import NotificationType
+from spacexlaunchbot.storage import SQLiteDataStore, SubscriptionOptions
+from spacexlaunchbot.storage.base import _SubscriptionIndex
+
+
+def test_subscription_index_buckets_by_type():
+    index = _SubscriptionIndex()
+    index.add(1, SubscriptionOptions(NotificationType.all, "", 0))
+    index.add(2, SubscriptionOptions(NotificationType.schedule, "", 0))
+    index.add(3, SubscriptionOptions(NotificationType.launch, "@here", 0))
+
+    assert set(index.subscribed_to(NotificationType.schedule)) == {1, 2}
+    assert set(index.subscribed_to(NotificationType.launch)) == {1, 3}
+    assert index.subscribed_to(NotificationType.launch)[3].launch_mentions == "@here"
+    assert len(index) == 3
+
+
+def test_subscription_options_allow_only_their_mentions():
+    opts = SubscriptionOptions(NotificationType.all, "<@1> <@!2> <@&3> hi", 0)
+    allowed = opts.launch_allowed_mentions.to_dict()
+
+    assert allowed == {"users": [1, 2], "roles": [3], "parse": []}
+    assert SubscriptionOptions(
+        NotificationType.all, "@here", 0
+    ).launch_allowed_mentions.everyone
+    assert opts == SubscriptionOptions(NotificationType.all, "<@1> <@!2> <@&3> hi", 0)
+
+
+def test_subscription_index_replaces_and_removes():
+    index = _SubscriptionIndex()
+    index.add(1, SubscriptionOptions(NotificationType.schedule, "", 0))
+    index.add(1, SubscriptionOptions(NotificationType.launch, "", 0))
+    assert set(index.subscribed_to(NotificationType.schedule)) == set()
+    assert set(index.subscribed_to(NotificationType.launch)) == {1}
+
+    index.remove(1)
+    index.remove(2)
+    assert len(index) == 0
+
+
+def test_sqlite_datastore_subscriptions(tmp_path):
+    db_path = str(tmp_path / "slb.sqlite")
+    pickle_path = str(tmp_path / "slb.pkl")
+
+    async def add_and_remove():
+        ds = SQLiteDataStore(db_path, pickle_path)
+        await ds.start()
+        assert await ds.add_subbed_channel("1", "a", "10", NotificationType.all, None)
+        assert not await ds.add_subbed_channel(
+            "1", "a", "10", NotificationType.all, None
+        )
+        assert await ds.add_subbed_channel(
+            "2", "b", "10", NotificationType.launch, "@here", [60, 10]
+        )
+        assert await ds.add_subbed_channel(
+            "3", "c", "20", NotificationType.schedule, None
+        )
+        assert await ds.remove_subbed_channels(["3", "4"]) == 1
+        assert await ds.add_subbed_channel(
+            "5", "e", "10", NotificationType.launch, None, webhook=(50, "token")
+        )
+        assert await ds.add_subbed_channel(
+            "6", "f", "10", NotificationType.launch, None, webhook=(60, "token")
+        )
+        assert await ds.remove_webhook("6")
+        assert not await ds.remove_webhook("6")
+        ds.register_metric("add", "10")
+        await ds.stop()
+
+    async def reload():
+        ds = SQLiteDataStore(db_path, pickle_path)
+        await ds.start()
+        channels = await ds.get_subbed_channels(NotificationType.launch)
+        count = await ds.subbed_channels_count()
+        async with ds.db.execute("select count(*) from metrics;") as cursor:
+            metrics = (await cursor.fetchone())[0]
+        await ds.stop()
+        return channels, count, metrics
+
+    asyncio.run(add_and_remove())
+    channels, count, metrics = asyncio.run(reload())
+
+    assert count == 4
+    assert metrics == 1
+    assert channels == {
+        1: SubscriptionOptions(NotificationType.all, "", 10),
+        2: SubscriptionOptions(NotificationType.launch, "@here", 10, (60, 10)),
+        5: SubscriptionOptions(NotificationType.launch, "", 10, webhook=(50, "token")),
+        6: SubscriptionOptions(NotificationType.launch, "", 10),
+    }
+
+
+def test_sqlite_datastore_counts(tmp_path):
+    async def counts():
+        ds = SQLiteDataStore(":memory:", str(tmp_path / "slb.pkl"))
+        await ds.start()
+        assert await ds.day_old_counts() == (0, 0)
+        await ds.add_subbed_channel("1", "a", "10", NotificationType.all, None)
+        assert await ds.update_counts(5)
+        result = await ds.day_old_counts()
+        await ds.stop()
+        return result
+
+    assert asyncio.run(counts()) == (5, 1)
+
+
+def test_sqlite_datastore_writes_are_atomic(tmp_path):
+    async def run():
+        ds = SQLiteDataStore(":memory:", str(tmp_path / "slb.pkl"))
+        await ds.start()
+        # The same channel twice, so adding its deliveries fails.
+        with pytest.raises(sqlite3.IntegrityError):
+            await ds.add_notification(
+                NotificationType.all, {"content": "Hi"}, [(1, 10, ""), (1, 10, "")]
+            )
+        # Writes from other coroutines at the same time aren't caught up in it.
+        await asyncio.gather(
+            ds.add_notification(NotificationType.all, {"content": "Hi"}, [(1, 10, "")]),
+            ds.add_subbed_channel("1", "a", "10", NotificationType.all, None),
+            ds.update_counts(1),
+        )
+        async with ds.db.execute("select count(*) from notifications;") as cursor:
+            notifications = (await cursor.fetchone())[0]
+        await ds.stop()
+        return notifications
+
+    assert asyncio.run(run()) == 1
+
+
+def test_sqlite_datastore_totals_shard_guild_counts(tmp_path):
+    async def counts():
+        ds = SQLiteDataStore(":memory:", str(tmp_path / "slb.pkl"))
+        await ds.start()
+        assert await ds.total_guild_count(4) == 0
+        await ds.set_shard_guild_counts({0: 5, 1: 3})
+        await ds.set_shard_guild_counts({2: 4, 1: 0})
+        # Left over from running with more shards.
+        await ds.set_shard_guild_counts({4: 10})
+        result = await ds.total_guild_count(4)
+        await ds.stop()
+        return result
+
+    assert asyncio.run(counts()) == 9
+
+
+def test_sqlite_datastore_notification_task_vars(tmp_path):
+    db_path = str(tmp_path / "slb.sqlite")
+    pickle_path = tmp_path / "slb.pkl"
+    with open(pickle_path, "wb") as f_out:
+        pickle.dump(
+            {
+                "_launch_embed_for_current_schedule_sent": True,
+                "_previous_schedule_embed_dict": {"title": "Old"},
+            },
+            f_out,
+        )
+
+    async def get_and_set():
+        ds = SQLiteDataStore(db_path, str(pickle_path))
+        await ds.start()
+        imported = await ds.get_notification_task_vars()
+        await ds.set_notification_task_vars(False, {"title": "New"})
+        await ds.stop()
+        return imported
+
+    async def reload():
+        ds = SQLiteDataStore(db_path, str(pickle_path))
+        await ds.start()
+        result = await ds.get_notification_task_vars()
+        await ds.stop()
+        return result
+
+    assert asyncio.run(get_and_set()) == (True, {"title": "Old"})
+    # Only imported once.
+    assert not pickle_path.exists()
+    assert asyncio.run(reload()) == (False, {"title": "New"})
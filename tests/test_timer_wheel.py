@@ -0,0 +1,62 @@
+import random
+
+from spacexlaunchbot.utils import TimerWheel
+
+
+def test_timer_wheel_fires_each_timer_on_its_tick():
+    rng = random.Random(0)
+    wheel = TimerWheel(0, tick=1, slots=8, levels=3)
+    # Includes timers further off than the largest wheel reaches (8 ** 3).
+    expiries = {key: rng.randrange(1, 2000) for key in range(500)}
+    for key, when in expiries.items():
+        wheel.schedule(key, when, key)
+    assert len(wheel) == 500
+
+    for key in range(0, 500, 5):
+        assert wheel.cancel(key)
+        del expiries[key]
+    # Rescheduling replaces the old timer.
+    wheel.schedule(1, 1000.5, 1)
+    expiries[1] = 1001
+
+    fired = {}
+    for now in range(1, 2001):
+        for key in wheel.advance(now):
+            fired[key] = now
+    assert fired == expiries
+    assert len(wheel) == 0
+
+
+def test_timer_wheel_past_timers_fire_on_next_tick():
+    wheel = TimerWheel(100, tick=0.5)
+    wheel.advance(110)
+    wheel.schedule("a", 50, "a")
+    assert "a" in wheel
+    assert wheel.next_due_at == 110.5
+    assert wheel.advance(110.4) == []
+    assert wheel.advance(110.5) == ["a"]
+
+
+def test_timer_wheel_skips_to_the_next_timer():
+    rng = random.Random(1)
+    wheel = TimerWheel(0, tick=1, slots=8, levels=3)
+    assert wheel.next_due_at == float("inf")
+    expiries = {key: rng.randrange(1, 2000) for key in range(50)}
+    for key, when in expiries.items():
+        wheel.schedule(key, when, key)
+
+    fired = {}
+    now = 0
+    while len(wheel):
+        # Never later than the first timer still to expire.
+        assert wheel.next_due_at <= min(
+            when for key, when in expiries.items() if key not in fired
+        )
+        now = wheel.next_due_at
+        for key in wheel.advance(now):
+            fired[key] = now
+    assert fired == expiries
+    # Jumping straight to the time gives the same result as every tick.
+    wheel.schedule("a", 5000, "a")
+    assert wheel.advance(4999) == []
+    assert wheel.advance(6000) == ["a"]
@@ -0,0 +1,70 @@
+import asyncio
+
+import discord
+import pytest
+from aiohttp import web
+
+from spacexlaunchbot import config
+from spacexlaunchbot.apis import webhooks
+from spacexlaunchbot.notifications import PreparedMessage
+
+
+def test_webhook_executions_and_errors(monkeypatch):
+    executions = []
+
+    async def handle(request):
+        webhook_id = request.match_info["webhook_id"]
+        executions.append(
+            (webhook_id, request.match_info["token"], await request.json())
+        )
+        if webhook_id == "404":
+            return web.json_response(
+                {"message": "Unknown Webhook", "code": 10015}, status=404
+            )
+        if webhook_id == "429":
+            return web.json_response({"retry_after": 1}, status=429)
+        return web.Response(status=204)
+
+    async def run():
+        app = web.Application()
+        app.router.add_post("/webhooks/{webhook_id}/{token}", handle)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        monkeypatch.setattr(config, "DISCORD_API_URL", f"http://127.0.0.1:{port}")
+
+        hello = PreparedMessage("Hello").body("", None)
+        try:
+            await webhooks.execute(
+                (1, "token"),
+                PreparedMessage(discord.Embed(title="Launch")).body(
+                    "<@&2>",
+                    discord.AllowedMentions(everyone=False, users=False, roles=True),
+                ),
+            )
+            await webhooks.execute((1, "token"), hello)
+            with pytest.raises(discord.NotFound):
+                await webhooks.execute((404, "token"), hello)
+            with pytest.raises(discord.HTTPException) as ex:
+                await webhooks.execute((429, "token"), hello)
+            assert ex.value.status == 429
+        finally:
+            await webhooks.close_session()
+            await runner.cleanup()
+
+    asyncio.run(run())
+    assert executions[:2] == [
+        (
+            "1",
+            "token",
+            {
+                "embeds": [{"flags": 0, "title": "Launch", "type": "rich"}],
+                "content": "<@&2>",
+                "allowed_mentions": {"parse": ["roles"], "replied_user": True},
+            },
+        ),
+        ("1", "token", {"content": "Hello"}),
+    ]
+    assert len(executions) == 4